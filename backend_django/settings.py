@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "cdv_api.middleware.MetricasMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -109,9 +110,10 @@ if ENV == "PROD":
         "legacy": SQLITE_DB,
     }
 else:
+    # um dict por alias: o Django completa (e nos testes renomeia) cada um no próprio lugar
     DATABASES = {
-        "default": SQLITE_DB,
-        "legacy": SQLITE_DB,
+        "default": dict(SQLITE_DB),
+        "legacy": dict(SQLITE_DB),
     }
 
 # ------------------ Arquivos estáticos ------------------
@@ -137,6 +139,60 @@ USE_I18N = True
 USE_TZ = True
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# ------------------ Sincronização offline ------------------
+# Quantas coletas do lote NDJSON são aplicadas por transação
+SINCRONIZACAO_ITENS_POR_TRANSACAO = int(os.getenv("SINCRONIZACAO_ITENS_POR_TRANSACAO", "25"))
+
+# ------------------ Exportação Excel ------------------
+# Acima deste tamanho o arquivo temporário do relatório vai para o disco
+EXPORTACAO_SPOOL_MAX_BYTES = int(os.getenv("EXPORTACAO_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+# Arquivos gerados pelo worker de exportações (manage.py processar_exportacoes)
+EXPORTACOES_DIR = Path(os.getenv("EXPORTACOES_DIR", BASE_DIR / "exportacoes"))
+# Job "processando" há mais que isso (segundos) é considerado travado e volta para a fila
+EXPORTACAO_TIMEOUT_PROCESSANDO = int(os.getenv("EXPORTACAO_TIMEOUT_PROCESSANDO", "1800"))
+
+# ------------------ Cache ------------------
+# Em arquivo para ser compartilhado entre os workers do gunicorn
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / ".cache")),
+        "TIMEOUT": 300,
+    }
+}
+
+# Seções do dashboard; a chave já muda a cada gravação (geração por estação)
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "3600"))
+
+# ------------------ Clima ------------------
+# Endpoint de previsão do Open-Meteo (configurável para testes / espelho)
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Clima atual por estação: fresco por CLIMA_CACHE_TTL segundos e, depois disso,
+# ainda servido por até CLIMA_CACHE_STALE segundos enquanto é atualizado em segundo plano
+CLIMA_CACHE_TTL = int(os.getenv("CLIMA_CACHE_TTL", "600"))
+CLIMA_CACHE_STALE = int(os.getenv("CLIMA_CACHE_STALE", "1800"))
+# Travas em arquivo (uma por estação) para só um worker revalidar o clima de cada vez
+CLIMA_TRAVAS_DIR = Path(os.getenv("CLIMA_TRAVAS_DIR", BASE_DIR / ".clima_travas"))
+
+# ------------------ Degradação ------------------
+# Últimas N leituras por circuito avaliadas e faixa normal da relação (%)
+DEGRADACAO_JANELA = int(os.getenv("DEGRADACAO_JANELA", "3"))
+DEGRADACAO_LIMITE_INFERIOR = float(os.getenv("DEGRADACAO_LIMITE_INFERIOR", "60"))
+DEGRADACAO_LIMITE_SUPERIOR = float(os.getenv("DEGRADACAO_LIMITE_SUPERIOR", "80"))
+# Inclinação mínima (% por leitura) para considerar a tendência; 0 = qualquer
+DEGRADACAO_INCLINACAO_MINIMA = float(os.getenv("DEGRADACAO_INCLINACAO_MINIMA", "0"))
+# Pontos mais recentes por circuito no gráfico de tendência do dashboard
+DEGRADACAO_PONTOS_GRAFICO = int(os.getenv("DEGRADACAO_PONTOS_GRAFICO", "30"))
+
+# ------------------ Métricas ------------------
+# Histogramas por view (tempo, SQL, tamanho) de cada worker, somados em /metrics
+METRICAS_DIR = Path(os.getenv("METRICAS_DIR", BASE_DIR / ".metricas"))
+# Intervalo mínimo (s) entre gravações do snapshot de cada worker
+METRICAS_INTERVALO = float(os.getenv("METRICAS_INTERVALO", "5"))
+# Requisições mais lentas que isso (s) são registradas no log
+METRICAS_LENTA_SEGUNDOS = float(os.getenv("METRICAS_LENTA_SEGUNDOS", "2"))
+
 # ------------------ Proxy / HTTPS ------------------
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
@@ -1,6 +1,57 @@
 from django.contrib import admin
 from .models import Estacao, Transmissor, Receptor
+from .servicos.cache_dashboard import marcar_estacoes_alteradas
+from .servicos.leituras_atuais import recalcular_leitura_atual
 
-admin.site.register(Estacao)
-admin.site.register(Transmissor)
-admin.site.register(Receptor)
\ No newline at end of file
+
+class LeituraAtualAdminMixin:
+    """Mantém leituras atuais e geração de dados das estações coerentes com edições e remoções pelo admin."""
+    campo_num = None
+
+    def _chave(self, obj):
+        return (obj.estacao_id, obj.num_circuito, getattr(obj, self.campo_num))
+
+    def _recalcular(self, chaves):
+        chaves = [chave for chave in chaves if chave]
+        for chave in chaves:
+            recalcular_leitura_atual(self.model, *chave)
+        marcar_estacoes_alteradas(estacao_id for estacao_id, _, _ in chaves)
+
+    def save_model(self, request, obj, form, change):
+        chave_antiga = None
+        if change:
+            chave_antiga = (
+                self.model.objects.filter(pk=obj.pk)
+                .values_list("estacao_id", "num_circuito", self.campo_num)
+                .first()
+            )
+        super().save_model(request, obj, form, change)
+        self._recalcular({chave_antiga, self._chave(obj)})
+
+    def delete_model(self, request, obj):
+        chave = self._chave(obj)
+        super().delete_model(request, obj)
+        self._recalcular({chave})
+
+    def delete_queryset(self, request, queryset):
+        chaves = set(queryset.values_list("estacao_id", "num_circuito", self.campo_num))
+        super().delete_queryset(request, queryset)
+        self._recalcular(chaves)
+
+
+@admin.register(Transmissor)
+class TransmissorAdmin(LeituraAtualAdminMixin, admin.ModelAdmin):
+    campo_num = "num_transmissor"
+
+
+@admin.register(Receptor)
+class ReceptorAdmin(LeituraAtualAdminMixin, admin.ModelAdmin):
+    campo_num = "num_receptor"
+
+
+@admin.register(Estacao)
+class EstacaoAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        # o nome aparece nas seções do dashboard e no radar: invalida os caches da estação
+        super().save_model(request, obj, form, change)
+        marcar_estacoes_alteradas([obj.id])
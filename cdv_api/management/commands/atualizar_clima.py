@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cdv_api.servicos.clima import atualizar_cache_clima_lote
+
+
+class Command(BaseCommand):
+    help = "Busca clima atual e horário de todas as estações em uma única chamada ao Open-Meteo e grava no cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--estacao",
+            action="append",
+            default=[],
+            help="Nome da estação a atualizar (pode repetir). Sem este parâmetro, atualiza todas.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            resultado = atualizar_cache_clima_lote(options["estacao"] or None)
+        except Exception as e:
+            raise CommandError(f"Falha ao buscar clima: {e}")
+
+        for nome, dados in resultado.items():
+            atual = dados["atual"]
+            temperatura = f"{atual['temperatura']:.1f} °C" if atual else "sem temperatura"
+            self.stdout.write(f"{nome}: {temperatura}")
+
+        self.stdout.write(self.style.SUCCESS(f"Clima atualizado para {len(resultado)} estação(ões)."))
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from cdv_api.servicos.benchmark import CENARIOS, executar_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede tempo, consultas e pico de memória das principais views com histórico "
+        "sintético de vários tamanhos e grava um relatório JSON. Roda num banco de "
+        "teste descartável, criado e destruído pelo comando."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanhos",
+            type=int,
+            nargs="+",
+            default=[30, 365, 1095],
+            help="Tamanhos do histórico em dias (padrão: 30 365 1095).",
+        )
+        parser.add_argument("--repeticoes", type=int, default=3, help="Execuções medidas por cenário (padrão: 3).")
+        parser.add_argument("--coletas-por-dia", type=int, default=1, help="Coletas por estação em cada dia (padrão: 1).")
+        parser.add_argument(
+            "--cenario",
+            action="append",
+            choices=CENARIOS,
+            default=[],
+            help="Cenário a medir (pode repetir). Sem este parâmetro, mede todos.",
+        )
+        parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (padrão: 42).")
+        parser.add_argument("--saida", default="benchmark.json", help="Arquivo do relatório (padrão: benchmark.json).")
+
+    def handle(self, *args, **options):
+        if min(options["tamanhos"]) < 1 or options["repeticoes"] < 1:
+            raise CommandError("--tamanhos e --repeticoes devem ser >= 1.")
+
+        setup_test_environment()
+        nome_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        # cache em memória e estáticos sem manifest: mede a aplicação, não o ambiente
+        ajustes = override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+            SECURE_SSL_REDIRECT=False,
+        )
+
+        try:
+            with ajustes:
+                relatorio = executar_benchmark(
+                    options["tamanhos"],
+                    repeticoes=options["repeticoes"],
+                    coletas_por_dia=options["coletas_por_dia"],
+                    semente=options["semente"],
+                    cenarios=options["cenario"] or None,
+                    saida=options["saida"],
+                )
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        for resultado in relatorio["resultados"]:
+            self.stdout.write(self.style.NOTICE(
+                f"{resultado['dias']} dias: {resultado['receptores']} RX, {resultado['transmissores']} TX"
+            ))
+            for cenario, medida in resultado["cenarios"].items():
+                self.stdout.write(
+                    f"  {cenario:<22} {medida['tempo_s'] * 1000:9.1f} ms  "
+                    f"{medida['consultas']:4d} consultas  {medida['pico_memoria_kb']:10.1f} KB"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['saida']}."))
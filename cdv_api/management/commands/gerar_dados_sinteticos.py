@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cdv_api.servicos.dados_sinteticos import carregar_circuitos_por_estacao, gerar_historico
+
+
+class Command(BaseCommand):
+    help = "Gera histórico sintético de TX/RX (com temperatura) para as estações de circuitos_por_estacao.js."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=365, help="Dias de histórico até hoje (padrão: 365).")
+        parser.add_argument("--coletas-por-dia", type=int, default=1, help="Coletas por estação em cada dia (padrão: 1).")
+        parser.add_argument("--rxs", type=int, default=2, help="RX por circuito (padrão: 2).")
+        parser.add_argument(
+            "--estacao",
+            action="append",
+            default=[],
+            help="Nome da estação a gerar (pode repetir). Sem este parâmetro, gera todas.",
+        )
+        parser.add_argument("--semente", type=int, default=None, help="Semente aleatória (resultados reproduzíveis).")
+
+    def handle(self, *args, **options):
+        nomes = options["estacao"]
+        if nomes:
+            faltando = [n for n in nomes if n not in carregar_circuitos_por_estacao()]
+            if faltando:
+                raise CommandError(f"Estação(ões) fora do mapa de circuitos: {', '.join(faltando)}")
+
+        if options["dias"] < 1 or not 1 <= options["coletas_por_dia"] <= 100:
+            raise CommandError("--dias deve ser >= 1 e --coletas-por-dia entre 1 e 100.")
+
+        total = gerar_historico(
+            dias=options["dias"],
+            coletas_por_dia=options["coletas_por_dia"],
+            rxs_por_circuito=options["rxs"],
+            estacoes=nomes or None,
+            semente=options["semente"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Gerados {total['transmissores']} TX e {total['receptores']} RX em {total['estacoes']} estação(ões)."
+        ))
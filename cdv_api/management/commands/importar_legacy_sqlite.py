@@ -1,6 +1,28 @@
-from django.apps import apps
-from django.core.management.base import BaseCommand
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Greatest
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.servicos.cache_dashboard import marcar_estacoes_alteradas
+from cdv_api.servicos.importacao_legacy import (
+    ORIGEM,
+    DESTINO,
+    rotulo,
+    modelos_importacao,
+    campos_copiados,
+    ler_lotes,
+    gravar_lote,
+    resetar_sequencias,
+    ler_checkpoint,
+    gravar_checkpoint,
+    sincronizar_modelo,
+)
+from cdv_api.servicos.leituras_atuais import reconstruir_leituras_atuais
 
 
 class Command(BaseCommand):
@@ -17,82 +39,173 @@ class Command(BaseCommand):
             action="store_true",
             help="Inclui usuários e grupos do Django auth.",
         )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=2000,
+            help="Registros lidos e gravados por transação (padrão: 2000).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continua a partir do último PK importado de cada modelo (arquivo de checkpoint).",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Transfere só linhas novas ou alteradas desde a última sincronização (hash por linha).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Com --incremental: só relata inserções, atualizações e conflitos, sem gravar.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=str(settings.BASE_DIR / ".importacao_legacy.json"),
+            help="Arquivo de checkpoint (padrão: .importacao_legacy.json na raiz do projeto).",
+        )
 
     def handle(self, *args, **options):
-        limpar = options["limpar"]
-        incluir_auth = options["incluir_auth"]
+        lote = options["lote"]
+        caminho_checkpoint = options["checkpoint"]
+
+        if lote < 1:
+            raise CommandError("--lote deve ser >= 1.")
+        if options["resume"] and options["limpar"]:
+            raise CommandError("--resume e --limpar não podem ser usados juntos.")
 
-        # Ordem segura por dependência
-        modelos_base = [
-            ("cdv_api", "Estacao"),
-            ("cdv_api", "Transmissor"),
-            ("cdv_api", "Receptor"),
-        ]
+        if options["dry_run"] and not options["incremental"]:
+            raise CommandError("--dry-run só é suportado com --incremental.")
+        if options["incremental"] and (options["resume"] or options["limpar"]):
+            raise CommandError("--incremental não pode ser usado com --resume ou --limpar.")
 
-        modelos_auth = [
-            ("auth", "Group"),
-            ("auth", "User"),
-        ]
+        modelos = modelos_importacao(options["incluir_auth"])
 
-        modelos = list(modelos_base)
-        if incluir_auth:
-            modelos = modelos_auth + modelos
+        if options["incremental"]:
+            self.sincronizar(modelos, lote, options["dry_run"])
+            return
+
+        checkpoint = ler_checkpoint(caminho_checkpoint) if options["resume"] else {}
 
         self.stdout.write(self.style.NOTICE("Iniciando importação do SQLite legado para PostgreSQL..."))
 
         # Verifica existência de dados no legado
-        for app_label, model_name in modelos:
-            Model = apps.get_model(app_label, model_name)
-            total_legacy = Model.objects.using("legacy").count()
-            self.stdout.write(f"[legacy] {app_label}.{model_name}: {total_legacy} registro(s)")
+        for Model in modelos:
+            total_legacy = Model._default_manager.using(ORIGEM).count()
+            self.stdout.write(f"[legacy] {rotulo(Model)}: {total_legacy} registro(s)")
+
+        if options["limpar"]:
+            # estações recriadas voltariam à geração 0: guarda a maior para seguir dela
+            # (chaves de cache e ETags antigas usam (id, geração))
+            checkpoint["geracao_anterior"] = (
+                Estacao.objects.using(DESTINO).aggregate(m=Max("geracao_dados"))["m"] or 0
+            )
+            gravar_checkpoint(caminho_checkpoint, checkpoint)
 
-        if limpar:
             self.stdout.write(self.style.WARNING("Limpando dados atuais do PostgreSQL..."))
             # Ordem inversa por dependência
-            for app_label, model_name in reversed(modelos):
-                Model = apps.get_model(app_label, model_name)
-                deleted, _ = Model.objects.using("default").all().delete()
-                self.stdout.write(f"[default] {app_label}.{model_name}: {deleted} registro(s) removido(s)")
-
-        with transaction.atomic(using="default"):
-            for app_label, model_name in modelos:
-                Model = apps.get_model(app_label, model_name)
-                objetos_legacy = list(Model.objects.using("legacy").all())
-
-                if not objetos_legacy:
-                    self.stdout.write(self.style.WARNING(f"Nenhum dado em {app_label}.{model_name} no legado."))
-                    continue
-
-                campos_concretos = [
-                    f for f in Model._meta.concrete_fields
-                    if not f.auto_created and not f.primary_key
-                ]
-
-                criados = 0
-                atualizados = 0
-
-                for obj in objetos_legacy:
-                    pk = obj.pk
-                    defaults = {}
-
-                    for campo in campos_concretos:
-                        valor = getattr(obj, campo.attname)
-                        defaults[campo.attname] = valor
-
-                    novo_obj, created = Model.objects.using("default").update_or_create(
-                        pk=pk,
-                        defaults=defaults
-                    )
-
-                    if created:
-                        criados += 1
-                    else:
-                        atualizados += 1
+            for Model in reversed(modelos):
+                deleted, _ = Model._default_manager.using(DESTINO).all().delete()
+                self.stdout.write(f"[default] {rotulo(Model)}: {deleted} registro(s) removido(s)")
+
+        inicio_total = time.perf_counter()
+
+        for Model in modelos:
+            chave = rotulo(Model)
+            apos_pk = checkpoint.get(chave)
+            campos = campos_copiados(Model)
 
+            if apos_pk is not None:
+                self.stdout.write(f"{chave}: retomando após PK {apos_pk}")
+
+            inicio = time.perf_counter()
+            importados = 0
+
+            # cada lote é uma transação: uma falha perde no máximo o lote atual
+            for objetos in ler_lotes(Model, campos, apos_pk, lote):
+                with transaction.atomic(using=DESTINO):
+                    gravar_lote(Model, objetos)
+
+                importados += len(objetos)
+                checkpoint[chave] = objetos[-1].pk
+                gravar_checkpoint(caminho_checkpoint, checkpoint)
+
+                decorrido = time.perf_counter() - inicio
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f"{app_label}.{model_name}: {criados} criado(s), {atualizados} atualizado(s)"
-                    )
+                    f"  {chave}: {importados} registro(s) ({importados / decorrido:,.0f}/s)"
                 )
 
-        self.stdout.write(self.style.SUCCESS("Importação concluída com sucesso."))
\ No newline at end of file
+            if not importados:
+                self.stdout.write(self.style.WARNING(f"Nenhum dado novo em {chave} no legado."))
+                continue
+
+            decorrido = time.perf_counter() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f"{chave}: {importados} registro(s) em {decorrido:.1f}s ({importados / decorrido:,.0f}/s)"
+            ))
+
+        resetar_sequencias(modelos)
+
+        # leituras atuais e cache do dashboard refletem o histórico importado
+        with transaction.atomic(using=DESTINO):
+            reconstruir_leituras_atuais(Transmissor)
+            reconstruir_leituras_atuais(Receptor)
+            geracao_anterior = checkpoint.get("geracao_anterior", 0)
+            if geracao_anterior:
+                Estacao.objects.using(DESTINO).update(
+                    geracao_dados=Greatest(F("geracao_dados"), Value(geracao_anterior))
+                )
+            marcar_estacoes_alteradas(Estacao.objects.values_list("id", flat=True))
+
+        if os.path.exists(caminho_checkpoint):
+            os.remove(caminho_checkpoint)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída com sucesso em {time.perf_counter() - inicio_total:.1f}s."
+        ))
+
+    def sincronizar(self, modelos, lote, dry_run):
+        titulo = "Simulando" if dry_run else "Iniciando"
+        self.stdout.write(self.style.NOTICE(f"{titulo} sincronização incremental do SQLite legado..."))
+
+        inicio_total = time.perf_counter()
+        estacoes_leituras = set()
+        total_conflitos = 0
+
+        for Model in modelos:
+            inicio = time.perf_counter()
+            resultado = sincronizar_modelo(Model, campos_copiados(Model), lote, aplicar=not dry_run)
+
+            if Model in (Transmissor, Receptor):
+                estacoes_leituras |= resultado["estacao_ids"]
+            total_conflitos += resultado["conflitos"]
+
+            self.stdout.write(
+                f"{resultado['modelo']}: {resultado['lidas']} lida(s), "
+                f"{resultado['insercoes']} inserção(ões), {resultado['atualizacoes']} atualização(ões), "
+                f"{resultado['conflitos']} conflito(s), {resultado['inalteradas']} inalterada(s), "
+                f"{resultado['ja_sincronizadas']} já igual(is) no destino "
+                f"[marca d'água: {resultado['marca_dagua']}] em {time.perf_counter() - inicio:.1f}s"
+            )
+            for conflito in resultado["amostras_conflitos"]:
+                self.stdout.write(self.style.WARNING(f"  conflito PK {conflito['pk']}: {conflito['motivo']}"))
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS("Dry-run concluído: nada foi gravado."))
+            return
+
+        resetar_sequencias(modelos)
+
+        if estacoes_leituras:
+            ids = sorted(estacoes_leituras)
+            with transaction.atomic(using=DESTINO):
+                reconstruir_leituras_atuais(Transmissor, ids)
+                reconstruir_leituras_atuais(Receptor, ids)
+                marcar_estacoes_alteradas(ids)
+
+        estilo = self.style.WARNING if total_conflitos else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"Sincronização concluída em {time.perf_counter() - inicio_total:.1f}s "
+            f"({total_conflitos} conflito(s) não aplicados)."
+        ))
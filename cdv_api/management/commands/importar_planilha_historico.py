@@ -0,0 +1,62 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cdv_api.servicos.importacao_planilhas import FORMATOS, importar_planilha
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa leituras históricas de TX/RX de uma planilha CSV, XLSX ou Parquet "
+        "(uma linha por coleta; colunas estacao, num_circuito, data e num_transmissor/num_receptor)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help=f"Planilha a importar ({', '.join(FORMATOS)}).")
+        parser.add_argument("--lote", type=int, default=5000, help="Registros gravados por transação (padrão: 5000).")
+        parser.add_argument("--dry-run", action="store_true", help="Só valida e relata as rejeições, sem gravar.")
+        parser.add_argument(
+            "--rejeitadas",
+            default=None,
+            help="Grava o relatório de linhas rejeitadas neste CSV (linha, tipo, motivo).",
+        )
+
+    def handle(self, *args, **options):
+        caminho = options["arquivo"]
+        if not os.path.exists(caminho):
+            raise CommandError(f"Arquivo não encontrado: {caminho}")
+        if options["lote"] < 1:
+            raise CommandError("--lote deve ser >= 1.")
+
+        inicio = time.perf_counter()
+        try:
+            with open(caminho, "rb") as arquivo:
+                resultado = importar_planilha(arquivo, caminho, lote=options["lote"], aplicar=not options["dry_run"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        decorrido = time.perf_counter() - inicio
+
+        rejeicoes = resultado["rejeicoes"]
+        if options["rejeitadas"]:
+            with open(options["rejeitadas"], "w", newline="", encoding="utf-8") as saida:
+                escritor = csv.DictWriter(saida, fieldnames=["linha", "tipo", "motivo"])
+                escritor.writeheader()
+                escritor.writerows(rejeicoes)
+        else:
+            for rejeicao in rejeicoes[:20]:
+                self.stdout.write(self.style.WARNING(
+                    f"  linha {rejeicao['linha']} ({rejeicao['tipo']}): {rejeicao['motivo']}"
+                ))
+            if len(rejeicoes) > 20:
+                self.stdout.write(self.style.WARNING(
+                    f"  ... e mais {len(rejeicoes) - 20} (use --rejeitadas para o relatório completo)"
+                ))
+
+        total = resultado["transmissores"] + resultado["receptores"]
+        acao = "validados" if options["dry_run"] else "importados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['transmissores']} TX e {resultado['receptores']} RX {acao}, "
+            f"{len(rejeicoes)} rejeição(ões), em {decorrido:.1f}s ({total / decorrido:,.0f} registros/s)."
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cdv_api.servicos.exportacao_jobs import processar_pendentes, limpar_exportacoes_antigas
+
+
+class Command(BaseCommand):
+    help = "Worker local das exportações Excel: processa os jobs pendentes da fila."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--uma-vez",
+            action="store_true",
+            help="Processa o que estiver pendente e encerra (útil em cron).",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2.0,
+            help="Segundos entre verificações da fila (padrão: 2).",
+        )
+        parser.add_argument(
+            "--limpar-dias",
+            type=int,
+            default=None,
+            help="Remove jobs e arquivos com mais de N dias antes de processar.",
+        )
+
+    def handle(self, *args, **options):
+        if options["limpar_dias"] is not None:
+            removidos = limpar_exportacoes_antigas(options["limpar_dias"])
+            self.stdout.write(f"Exportações antigas removidas: {removidos}")
+
+        self.stdout.write(self.style.NOTICE("Worker de exportações iniciado."))
+
+        while True:
+            processadas = processar_pendentes()
+            if processadas:
+                self.stdout.write(self.style.SUCCESS(f"{processadas} exportação(ões) concluída(s)."))
+
+            if options["uma_vez"]:
+                break
+
+            time.sleep(options["intervalo"])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.servicos.cache_dashboard import marcar_estacoes_alteradas
+from cdv_api.servicos.leituras_atuais import reconstruir_leituras_atuais
+
+
+class Command(BaseCommand):
+    help = "Reconstrói as tabelas de leitura atual (último registro por TX/RX) a partir do histórico."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--estacao",
+            action="append",
+            default=[],
+            help="Nome da estação a reconstruir (pode repetir). Sem este parâmetro, reconstrói todas.",
+        )
+
+    def handle(self, *args, **options):
+        nomes = options["estacao"]
+        estacao_ids = None
+
+        if nomes:
+            estacoes = list(Estacao.objects.filter(nome__in=nomes))
+            encontradas = {e.nome for e in estacoes}
+            faltando = [n for n in nomes if n not in encontradas]
+            if faltando:
+                raise CommandError(f"Estação(ões) não encontrada(s): {', '.join(faltando)}")
+            estacao_ids = [e.id for e in estacoes]
+
+        with transaction.atomic():
+            total_tx = reconstruir_leituras_atuais(Transmissor, estacao_ids)
+            total_rx = reconstruir_leituras_atuais(Receptor, estacao_ids)
+            marcar_estacoes_alteradas(estacao_ids or Estacao.objects.values_list("id", flat=True))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Leituras atuais reconstruídas: {total_tx} TX, {total_rx} RX."
+        ))
@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cdv_api.servicos.reimportacao_excel import reimportar_excel
+
+
+class Command(BaseCommand):
+    help = (
+        "Reimporta uma planilha gerada por gerar_excel_estacao e corrigida fora do sistema, "
+        "gravando só as leituras que mudaram."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Pasta .xlsx no layout da exportação por estação.")
+        parser.add_argument("--dry-run", action="store_true", help="Só compara e lista as alterações, sem gravar.")
+
+    def handle(self, *args, **options):
+        caminho = options["arquivo"]
+        if not os.path.exists(caminho):
+            raise CommandError(f"Arquivo não encontrado: {caminho}")
+
+        inicio = time.perf_counter()
+        try:
+            with open(caminho, "rb") as arquivo:
+                resultado = reimportar_excel(arquivo, aplicar=not options["dry_run"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        decorrido = time.perf_counter() - inicio
+
+        for alteracao in resultado["alteracoes"]:
+            campos = ", ".join(f"{campo}: {antes} -> {depois}" for campo, (antes, depois) in alteracao["campos"].items())
+            self.stdout.write(f"  {alteracao['aba']} linha {alteracao['linha']} ({alteracao['tipo']}): {campos}")
+        for rejeicao in resultado["rejeicoes"]:
+            self.stdout.write(self.style.WARNING(
+                f"  {rejeicao['aba']} linha {rejeicao['linha']} ({rejeicao['tipo']}): {rejeicao['motivo']}"
+            ))
+
+        acao = "com alterações" if options["dry_run"] else "atualizados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['abas']} aba(s), {resultado['linhas']} linha(s): "
+            f"{resultado['transmissores']} TX e {resultado['receptores']} RX {acao}, "
+            f"{resultado['inalteradas']} inalterada(s), {len(resultado['rejeicoes'])} rejeição(ões), "
+            f"em {decorrido:.1f}s."
+        ))
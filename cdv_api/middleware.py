@@ -0,0 +1,64 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from cdv_api.servicos.metricas import registrar_requisicao
+
+logger = logging.getLogger(__name__)
+
+
+class ContadorSQL:
+    """execute_wrapper do Django: conta as consultas e soma o tempo gasto no banco."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _tamanho_resposta(response):
+    if response.streaming:
+        tamanho = response.get("Content-Length")
+        return int(tamanho) if tamanho else None
+    return len(response.content)
+
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição (tempo, consultas SQL, tempo no banco, tamanho da
+    resposta) por view e acumula nos histogramas servidos em /metrics.
+    Requisições acima de METRICAS_LENTA_SEGUNDOS também vão para o log.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = ContadorSQL()
+        inicio = time.perf_counter()
+
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+
+        duracao = time.perf_counter() - inicio
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "nao_resolvida"
+
+        registrar_requisicao(view, duracao, contador.consultas, contador.tempo, _tamanho_resposta(response))
+
+        if duracao >= settings.METRICAS_LENTA_SEGUNDOS:
+            logger.warning(
+                "Requisição lenta: view=%s %.3fs consultas=%s sql=%.3fs status=%s",
+                view, duracao, contador.consultas, contador.tempo, response.status_code,
+            )
+
+        return response
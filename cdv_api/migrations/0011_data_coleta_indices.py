@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:09
+
+from django.db import migrations, models
+from django.utils import timezone
+
+TAMANHO_LOTE = 2000
+
+
+def preencher_data_coleta(apps, schema_editor):
+    # Backfill em lotes por faixa de id para não carregar o histórico inteiro na memória
+    for nome_modelo in ("Transmissor", "Receptor"):
+        Model = apps.get_model("cdv_api", nome_modelo)
+        ultimo_id = 0
+
+        while True:
+            lote = list(
+                Model.objects.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .only("id", "data_manutencao")[:TAMANHO_LOTE]
+            )
+            if not lote:
+                break
+
+            for obj in lote:
+                dt = obj.data_manutencao
+                if dt is None:
+                    obj.data_coleta = None
+                elif timezone.is_aware(dt):
+                    obj.data_coleta = timezone.localdate(dt)
+                else:
+                    obj.data_coleta = dt.date()
+
+            Model.objects.bulk_update(lote, ["data_coleta"])
+            ultimo_id = lote[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdv_api', '0010_alter_baselinecdv_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receptor',
+            name='data_coleta',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='transmissor',
+            name='data_coleta',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_data_coleta, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='receptor',
+            index=models.Index(fields=['estacao', 'data_coleta', 'num_circuito', 'num_receptor', 'horario_coleta'], name='rx_coleta_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receptor',
+            index=models.Index(fields=['estacao', 'num_circuito', 'num_receptor', '-data_manutencao', '-horario_coleta', '-id'], name='rx_ultima_leitura_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transmissor',
+            index=models.Index(fields=['estacao', 'data_coleta', 'num_circuito', 'num_transmissor', 'horario_coleta'], name='tx_coleta_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transmissor',
+            index=models.Index(fields=['estacao', 'num_circuito', 'num_transmissor', '-data_manutencao', '-horario_coleta', '-id'], name='tx_ultima_leitura_idx'),
+        ),
+    ]
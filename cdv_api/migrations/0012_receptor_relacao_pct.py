@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:10
+
+from django.db import migrations, models
+
+TAMANHO_LOTE = 2000
+
+
+def _relacao_para_float(relacao_str):
+    if not relacao_str:
+        return None
+
+    try:
+        return float(str(relacao_str).replace("%", "").replace(",", ".").strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def preencher_relacao_pct(apps, schema_editor):
+    # Backfill em lotes por faixa de id: memória constante mesmo com tabelas grandes
+    Receptor = apps.get_model("cdv_api", "Receptor")
+    ultimo_id = 0
+
+    while True:
+        lote = list(
+            Receptor.objects.filter(id__gt=ultimo_id)
+            .order_by("id")
+            .only("id", "relacao")[:TAMANHO_LOTE]
+        )
+        if not lote:
+            break
+
+        for obj in lote:
+            obj.relacao_pct = _relacao_para_float(obj.relacao)
+
+        Receptor.objects.bulk_update(lote, ["relacao_pct"])
+        ultimo_id = lote[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdv_api', '0011_data_coleta_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receptor',
+            name='relacao_pct',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_relacao_pct, migrations.RunPython.noop),
+    ]
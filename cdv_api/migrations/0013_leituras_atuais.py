@@ -0,0 +1,94 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+TAMANHO_LOTE = 2000
+
+
+def popular_leituras_atuais(apps, schema_editor):
+    # Percorre o histórico ordenado em streaming e guarda a primeira linha de cada grupo
+    agora = timezone.now()
+
+    for nome_hist, nome_atual, campo_num, campo_fk in (
+        ("Transmissor", "LeituraAtualTransmissor", "num_transmissor", "transmissor"),
+        ("Receptor", "LeituraAtualReceptor", "num_receptor", "receptor"),
+    ):
+        Historico = apps.get_model("cdv_api", nome_hist)
+        Atual = apps.get_model("cdv_api", nome_atual)
+
+        linhas = (
+            Historico.objects
+            .order_by("estacao_id", "num_circuito", campo_num, "-data_manutencao", "-horario_coleta", "-id")
+            .values_list("id", "estacao_id", "num_circuito", campo_num, "data_manutencao", "horario_coleta")
+            .iterator(chunk_size=TAMANHO_LOTE)
+        )
+
+        lote = []
+        chave_anterior = None
+
+        for pk, estacao_id, num_circuito, num, data_manutencao, horario_coleta in linhas:
+            chave = (estacao_id, num_circuito, num)
+            if chave == chave_anterior:
+                continue
+            chave_anterior = chave
+
+            lote.append(Atual(
+                estacao_id=estacao_id,
+                num_circuito=num_circuito,
+                **{campo_num: num, f"{campo_fk}_id": pk},
+                data_manutencao=data_manutencao,
+                horario_coleta=horario_coleta,
+                atualizado_em=agora,
+            ))
+
+            if len(lote) >= TAMANHO_LOTE:
+                Atual.objects.bulk_create(lote)
+                lote = []
+
+        if lote:
+            Atual.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdv_api', '0012_receptor_relacao_pct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeituraAtualReceptor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_circuito', models.CharField(max_length=50)),
+                ('num_receptor', models.CharField(max_length=50)),
+                ('data_manutencao', models.DateTimeField()),
+                ('horario_coleta', models.TimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('estacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receptores_atuais', to='cdv_api.estacao')),
+                ('receptor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leitura_atual', to='cdv_api.receptor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('estacao', 'num_circuito', 'num_receptor'), name='unique_leitura_atual_rx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeituraAtualTransmissor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_circuito', models.CharField(max_length=50)),
+                ('num_transmissor', models.CharField(max_length=50)),
+                ('data_manutencao', models.DateTimeField()),
+                ('horario_coleta', models.TimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('estacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transmissores_atuais', to='cdv_api.estacao')),
+                ('transmissor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leitura_atual', to='cdv_api.transmissor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('estacao', 'num_circuito', 'num_transmissor'), name='unique_leitura_atual_tx')],
+            },
+        ),
+        migrations.RunPython(popular_leituras_atuais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdv_api', '0013_leituras_atuais'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColetaSincronizada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_cliente', models.CharField(max_length=100, unique=True)),
+                ('data_coleta', models.DateField()),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('recebido_em', models.DateTimeField(auto_now_add=True)),
+                ('estacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coletas_sincronizadas', to='cdv_api.estacao')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdv_api', '0015_exportacaoexcel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estacao',
+            name='geracao_dados',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
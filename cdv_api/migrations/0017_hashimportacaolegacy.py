@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdv_api', '0016_estacao_geracao_dados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashImportacaoLegacy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=100)),
+                ('objeto_id', models.BigIntegerField()),
+                ('hash', models.CharField(max_length=32)),
+                ('sincronizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'objeto_id'), name='unique_hash_importacao_legacy')],
+            },
+        ),
+    ]
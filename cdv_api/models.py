@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from cdv_api.utils import relacao_para_float
+
 
 # Definindo as opções para o tipo de manutenção
 TIPO_MANUTENCAO_CHOICES = [
@@ -9,8 +12,19 @@ TIPO_MANUTENCAO_CHOICES = [
     ('checklist', 'Checklist'),
 ] 
 
+
+def data_local(valor):
+    """Dia local (TIME_ZONE) de um data_manutencao, usado para preencher data_coleta."""
+    if valor is None:
+        return None
+    if timezone.is_aware(valor):
+        return timezone.localdate(valor)
+    return valor.date()
+
 class Estacao(models.Model):
     nome = models.CharField(max_length=100, unique=True)
+    # incrementado a cada gravação de TX/RX da estação (chave do cache do dashboard)
+    geracao_dados = models.PositiveBigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.nome
@@ -27,6 +41,27 @@ class Transmissor(models.Model):
     horario_coleta = models.TimeField(null=True, blank=True)
     temp_celsius = models.FloatField(null=True, blank=True)
     tipo_manutencao = models.CharField(max_length=20, choices=TIPO_MANUTENCAO_CHOICES)
+    # Dia local da coleta, derivado de data_manutencao (evita TruncDate / __date nas consultas)
+    data_coleta = models.DateField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["estacao", "data_coleta", "num_circuito", "num_transmissor", "horario_coleta"],
+                name="tx_coleta_dia_idx",
+            ),
+            models.Index(
+                fields=["estacao", "num_circuito", "num_transmissor", "-data_manutencao", "-horario_coleta", "-id"],
+                name="tx_ultima_leitura_idx",
+            ),
+        ]
+
+    def preencher_campos_derivados(self):
+        self.data_coleta = data_local(self.data_manutencao)
+
+    def save(self, *args, **kwargs):
+        self.preencher_campos_derivados()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Transmissor {self.num_transmissor} (Circuito {self.num_circuito}) da Estação {self.estacao.nome}"
@@ -39,15 +74,155 @@ class Receptor(models.Model):
     iav = models.FloatField(null=True, blank=True)
     ith = models.FloatField(null=True, blank=True)
     relacao = models.CharField(max_length=100, blank=True, null=True)
+    # Relação em % como número, derivada de `relacao` ("72.35%" -> 72.35) para filtros e agregações no banco
+    relacao_pct = models.FloatField(null=True, blank=True, editable=False)
     data_manutencao = models.DateTimeField(default=timezone.now)
     horario_coleta = models.TimeField(null=True, blank=True)
     temp_celsius = models.FloatField(null=True, blank=True)
     tipo_manutencao = models.CharField(max_length=20, choices=TIPO_MANUTENCAO_CHOICES)
+    # Dia local da coleta, derivado de data_manutencao (evita TruncDate / __date nas consultas)
+    data_coleta = models.DateField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["estacao", "data_coleta", "num_circuito", "num_receptor", "horario_coleta"],
+                name="rx_coleta_dia_idx",
+            ),
+            models.Index(
+                fields=["estacao", "num_circuito", "num_receptor", "-data_manutencao", "-horario_coleta", "-id"],
+                name="rx_ultima_leitura_idx",
+            ),
+        ]
+
+    def preencher_campos_derivados(self):
+        self.data_coleta = data_local(self.data_manutencao)
+        self.relacao_pct = relacao_para_float(self.relacao)
+
+    def save(self, *args, **kwargs):
+        self.preencher_campos_derivados()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Receptor {self.num_receptor} (Circuito {self.num_circuito}) da Estação {self.estacao.nome}"
 
 
+class LeituraAtualTransmissor(models.Model):
+    """Última leitura de cada TX (estação, circuito, TX), mantida a cada gravação."""
+    estacao = models.ForeignKey(Estacao, on_delete=models.CASCADE, related_name='transmissores_atuais')
+    num_circuito = models.CharField(max_length=50)
+    num_transmissor = models.CharField(max_length=50)
+    transmissor = models.OneToOneField(Transmissor, on_delete=models.CASCADE, related_name='leitura_atual')
+    data_manutencao = models.DateTimeField()
+    horario_coleta = models.TimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["estacao", "num_circuito", "num_transmissor"],
+                name="unique_leitura_atual_tx"
+            )
+        ]
+
+    def __str__(self):
+        return f"Leitura atual TX {self.num_transmissor} (Circuito {self.num_circuito}) da Estação {self.estacao.nome}"
+
+
+class LeituraAtualReceptor(models.Model):
+    """Última leitura de cada RX (estação, circuito, RX), mantida a cada gravação."""
+    estacao = models.ForeignKey(Estacao, on_delete=models.CASCADE, related_name='receptores_atuais')
+    num_circuito = models.CharField(max_length=50)
+    num_receptor = models.CharField(max_length=50)
+    receptor = models.OneToOneField(Receptor, on_delete=models.CASCADE, related_name='leitura_atual')
+    data_manutencao = models.DateTimeField()
+    horario_coleta = models.TimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["estacao", "num_circuito", "num_receptor"],
+                name="unique_leitura_atual_rx"
+            )
+        ]
+
+    def __str__(self):
+        return f"Leitura atual RX {self.num_receptor} (Circuito {self.num_circuito}) da Estação {self.estacao.nome}"
+
+
+class ColetaSincronizada(models.Model):
+    """Coleta recebida pela sincronização em lote, registrada pelo id gerado no tablet (idempotência)."""
+    id_cliente = models.CharField(max_length=100, unique=True)
+    estacao = models.ForeignKey(Estacao, on_delete=models.CASCADE, related_name='coletas_sincronizadas')
+    data_coleta = models.DateField()
+    resultado = models.JSONField(default=dict, blank=True)
+    recebido_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Coleta {self.id_cliente} ({self.estacao.nome} - {self.data_coleta})"
+
+
+STATUS_EXPORTACAO_CHOICES = [
+    ('pendente', 'Pendente'),
+    ('processando', 'Processando'),
+    ('concluido', 'Concluído'),
+    ('erro', 'Erro'),
+]
+
+class ExportacaoExcel(models.Model):
+    """Job de exportação Excel processado pelo worker local (manage.py processar_exportacoes)."""
+    # Hash dos filtros normalizados + versão dos dados: pedidos iguais reaproveitam o mesmo arquivo
+    chave = models.CharField(max_length=64, db_index=True)
+    filtros = models.JSONField(default=dict)
+    versao_dados = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=STATUS_EXPORTACAO_CHOICES, default='pendente', db_index=True)
+    linhas_total = models.PositiveIntegerField(default=0)
+    linhas_escritas = models.PositiveIntegerField(default=0)
+    nome_arquivo = models.CharField(max_length=200, blank=True)
+    arquivo = models.CharField(max_length=255, blank=True)
+    erro = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='exportacoes_excel'
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+
+    @property
+    def progresso(self):
+        if self.status == 'concluido':
+            return 100
+        if not self.linhas_total:
+            return 0
+        return min(99, int(self.linhas_escritas * 100 / self.linhas_total))
+
+    def __str__(self):
+        return f"Exportação {self.pk} ({self.status})"
+
+
+class HashImportacaoLegacy(models.Model):
+    """
+    Hash do conteúdo de cada linha já sincronizada do banco legado (importar_legacy_sqlite
+    --incremental). O maior objeto_id de cada modelo é a marca d'água da última sincronização.
+    """
+    modelo = models.CharField(max_length=100)
+    objeto_id = models.BigIntegerField()
+    hash = models.CharField(max_length=32)
+    sincronizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["modelo", "objeto_id"], name="unique_hash_importacao_legacy")
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id}"
+
+
 from django.db import models
 
 class BaselineCDV(models.Model):
@@ -0,0 +1,196 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.servicos.dados_sinteticos import carregar_circuitos_por_estacao, gerar_historico
+
+CENARIOS = ("salvar_dados_cdv", "dashboard_manutencao", "radar_saude", "historico_circuito", "gerar_excel_estacao")
+PAINEIS = ("mapa", "contagens", "relacao", "degradacao", "ultimos")
+
+
+def _resposta(resposta):
+    # consome respostas em streaming (Excel) para medir a geração completa
+    if resposta.streaming:
+        b"".join(resposta.streaming_content)
+    return resposta
+
+
+class Cenarios:
+    """Requisições medidas, feitas com o test Client sobre a estação com mais circuitos."""
+
+    def __init__(self, client, estacao, circuito):
+        self.client = client
+        self.estacao = estacao
+        self.circuito = circuito
+        self.envios = 0
+
+    def salvar_dados_cdv(self):
+        # horário diferente a cada envio: sempre grava uma coleta nova do dia
+        self.envios += 1
+        horario = f"23:{self.envios % 60:02d}"
+        circuitos = carregar_circuitos_por_estacao()[self.estacao.nome]
+        payload = {
+            "estacao": self.estacao.nome,
+            "transmissores": [
+                {"num_circuito": c, "num_transmissor": "1", "vout": 12, "pout": 5, "tap": "2",
+                 "tipo_transmissor": "Padrão", "tipo_manutencao": "preventiva",
+                 "horario_coleta": horario, "temp_celsius": 24}
+                for c in circuitos
+            ],
+            "receptores": [
+                {"num_circuito": c, "num_receptor": str(rx), "iav": 10, "ith": 7,
+                 "tipo_manutencao": "preventiva", "horario_coleta": horario, "temp_celsius": 24}
+                for c in circuitos for rx in (1, 2)
+            ],
+        }
+        sessao = self.client.session
+        sessao.pop("cdv_last_post", None)
+        sessao.save()
+        return self.client.post("/salvar_dados_cdv/", json.dumps(payload), content_type="application/json")
+
+    def dashboard_manutencao(self):
+        # esqueleto + todos os painéis, como o navegador carrega a página
+        resposta = self.client.get("/dashboard/")
+        for painel in PAINEIS:
+            self.client.get(f"/dashboard/painel/{painel}/")
+        return resposta
+
+    def radar_saude(self):
+        return self.client.get("/radar-saude/")
+
+    def historico_circuito(self):
+        inicio = (timezone.localdate() - datetime.timedelta(days=366)).isoformat()
+        return self.client.get("/historico_circuito/", {
+            "circuito": self.circuito,
+            "rx": 1,
+            "estacao_id": self.estacao.id,
+            "inicio": inicio,
+            "max_pontos": 500,
+        })
+
+    def gerar_excel_estacao(self):
+        return _resposta(self.client.get("/gerar_excel/", {"estacao_id": self.estacao.id}))
+
+
+def medir(funcao, repeticoes):
+    """
+    Tempo de parede (mediana e mínimo), número de consultas e pico de memória.
+
+    O cache é limpo antes de cada execução (medição a frio). O pico de memória
+    vem de uma execução extra com tracemalloc, para não distorcer os tempos.
+    """
+    tempos = []
+    consultas = []
+    status = None
+
+    for _ in range(repeticoes):
+        cache.clear()
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            resposta = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        consultas.append(len(capturadas.captured_queries))
+        status = resposta.status_code
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "status": status,
+        "tempo_s": round(statistics.median(tempos), 4),
+        "tempo_min_s": round(min(tempos), 4),
+        "consultas": max(consultas),
+        "pico_memoria_kb": round(pico / 1024, 1),
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar_benchmark(tamanhos, repeticoes=3, coletas_por_dia=1, semente=None, cenarios=None, saida=None):
+    """
+    Mede os cenários para cada tamanho de histórico (em dias), do menor para o maior.
+
+    O histórico cresce de forma incremental: a cada tamanho só os dias que
+    faltam são gerados (mais antigos), sem apagar o que já existe. Deve rodar
+    num banco descartável (ver o comando benchmark_desempenho).
+    """
+    usuario = get_user_model().objects.create_superuser("benchmark", password=None)
+    client = Client(enable_csrf_checks=False)
+    client.force_login(usuario)
+
+    hoje = timezone.localdate()
+    gerados = 0
+    roteiro = None
+    resultados = []
+
+    for dias in sorted(set(tamanhos)):
+        inicio_geracao = time.perf_counter()
+        if dias > gerados:
+            gerar_historico(
+                dias=dias - gerados,
+                coletas_por_dia=coletas_por_dia,
+                fim=hoje - datetime.timedelta(days=gerados),
+                semente=None if semente is None else semente + dias,
+            )
+            gerados = dias
+        geracao_s = time.perf_counter() - inicio_geracao
+
+        if roteiro is None:
+            mapa = carregar_circuitos_por_estacao()
+            nome = max(mapa, key=lambda n: len(mapa[n]))
+            roteiro = Cenarios(client, Estacao.objects.get(nome=nome), mapa[nome][0])
+
+        medidas = {}
+        for cenario in cenarios or CENARIOS:
+            medidas[cenario] = medir(getattr(roteiro, cenario), repeticoes)
+
+        resultados.append({
+            "dias": dias,
+            "transmissores": Transmissor.objects.count(),
+            "receptores": Receptor.objects.count(),
+            "geracao_s": round(geracao_s, 2),
+            "cenarios": medidas,
+        })
+
+    relatorio = {
+        "gerado_em": timezone.now().isoformat(),
+        "commit": _commit_atual(),
+        "banco": connection.vendor,
+        "python": platform.python_version(),
+        "repeticoes": repeticoes,
+        "coletas_por_dia": coletas_por_dia,
+        "resultados": resultados,
+    }
+
+    if saida:
+        with open(saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+    return relatorio
+
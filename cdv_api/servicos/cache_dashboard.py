@@ -0,0 +1,55 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from cdv_api.models import Estacao
+
+
+def marcar_estacoes_alteradas(estacao_ids):
+    """
+    Incrementa a geração de dados das estações (UPDATE atômico no banco).
+
+    Deve ser chamada em toda gravação de TX/RX, na mesma transação, para que
+    as entradas de cache que dependem dessas estações deixem de ser usadas.
+    """
+    ids = {estacao_id for estacao_id in estacao_ids if estacao_id}
+    if ids:
+        Estacao.objects.filter(id__in=ids).update(geracao_dados=F("geracao_dados") + 1)
+
+
+def geracoes_estacoes(estacao_ids=None):
+    estacoes = Estacao.objects.order_by("id")
+    if estacao_ids is not None:
+        estacoes = estacoes.filter(id__in=estacao_ids)
+    return list(estacoes.values_list("id", "geracao_dados"))
+
+
+def versao_dados(filtros, geracoes):
+    """Hash estável de (filtros, gerações): muda a cada gravação nas estações envolvidas."""
+    bruto = json.dumps({"filtros": filtros, "geracoes": geracoes}, sort_keys=True, default=str)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def chave_cache(secao, filtros, geracoes):
+    return f"dashboard:{secao}:{versao_dados(filtros, geracoes)}"
+
+
+def obter_ou_calcular(secao, filtros, estacao_ids, calcular):
+    """
+    Devolve a seção do dashboard do cache ou calcula e grava.
+
+    A chave combina os filtros normalizados com a geração das estações
+    envolvidas (`estacao_ids`; None = todas): gravar numa estação só invalida
+    as seções que dependem dela.
+    """
+    chave = chave_cache(secao, filtros, geracoes_estacoes(estacao_ids))
+
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular()
+        cache.set(chave, dados, timeout=settings.DASHBOARD_CACHE_TTL)
+
+    return dados
@@ -1,16 +1,24 @@
 import os
+import time
 import logging
+import threading
 import unicodedata
 import datetime
 
 import requests
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
+from cdv_api.servicos.consultas import ORDEM_MAIS_RECENTE
+
 logger = logging.getLogger(__name__)
 
 logger.info("WEATHERAPI_KEY carregada: %s", bool(os.getenv("WEATHERAPI_KEY")))
 
 TIMEOUT_API = 5
+# Open-Meteo + fallback WeatherAPI, com folga
+TRAVA_REVALIDACAO_EXPIRADA = TIMEOUT_API * 3
 
 # Coordenadas por estação
 COORDENADAS_ESTACOES = {
@@ -45,41 +53,67 @@ def normalizar_nome_estacao(nome):
     return nome.title()
 
 
+# mesmas coordenadas indexadas pelo nome normalizado (sem acentos), que é o que chega na busca
+COORDENADAS_NORMALIZADAS = {
+    normalizar_nome_estacao(nome): coords for nome, coords in COORDENADAS_ESTACOES.items()
+}
+
+
 def obter_coordenadas(estacao_nome):
     nome = normalizar_nome_estacao(estacao_nome)
-    return COORDENADAS_ESTACOES.get(nome)
+    return COORDENADAS_NORMALIZADAS.get(nome)
 
 
-def obter_clima_open_meteo(estacao_nome):
-    coords = obter_coordenadas(estacao_nome)
-    if not coords:
-        raise ValueError(f"Coordenadas não encontradas para a estação: {estacao_nome}")
+def obter_clima_open_meteo_lote(estacoes_nomes=None):
+    """
+    Busca clima atual + horário de hoje de várias estações em uma única chamada.
+
+    O Open-Meteo aceita listas de latitude/longitude separadas por vírgula e
+    devolve uma lista de respostas na mesma ordem. Retorna
+    {nome_normalizado: {"atual": {...}, "horario": {...}}}.
+    """
+    nomes = [normalizar_nome_estacao(n) for n in (estacoes_nomes or COORDENADAS_ESTACOES)]
+    nomes = [n for n in dict.fromkeys(nomes) if n in COORDENADAS_NORMALIZADAS]
+    if not nomes:
+        raise ValueError("Nenhuma estação com coordenadas cadastradas.")
 
-    url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": coords["lat"],
-        "longitude": coords["lon"],
+        "latitude": ",".join(str(COORDENADAS_NORMALIZADAS[n]["lat"]) for n in nomes),
+        "longitude": ",".join(str(COORDENADAS_NORMALIZADAS[n]["lon"]) for n in nomes),
         "current": "temperature_2m,relative_humidity_2m",
+        "hourly": "temperature_2m,relative_humidity_2m",
         "timezone": "America/Sao_Paulo",
+        "forecast_days": 1,
     }
 
-    resp = requests.get(url, params=params, timeout=TIMEOUT_API)
+    resp = requests.get(settings.OPEN_METEO_URL, params=params, timeout=TIMEOUT_API)
     resp.raise_for_status()
     data = resp.json()
 
-    current = data.get("current", {})
-    temperatura = current.get("temperature_2m")
-    umidade = current.get("relative_humidity_2m")
-
-    if temperatura is None:
-        raise ValueError("Open-Meteo não retornou temperatura.")
+    # com uma única coordenada a API devolve um objeto, não uma lista
+    respostas = data if isinstance(data, list) else [data]
+    if len(respostas) != len(nomes):
+        raise ValueError("Open-Meteo devolveu quantidade de estações diferente da solicitada.")
+
+    coletado_em = timezone.now()
+    resultado = {}
+
+    for nome, item in zip(nomes, respostas):
+        current = item.get("current", {})
+        temperatura = current.get("temperature_2m")
+
+        resultado[nome] = {
+            "atual": None if temperatura is None else {
+                "temperatura": float(temperatura),
+                "umidade": current.get("relative_humidity_2m"),
+                "fonte": "open-meteo",
+                "coletado_em": coletado_em,
+                "tentativa": "principal",
+            },
+            "horario": item.get("hourly", {}),
+        }
 
-    return {
-        "temperatura": float(temperatura),
-        "umidade": umidade,
-        "fonte": "open-meteo",
-        "coletado_em": timezone.now(),
-    }
+    return resultado
 
 
 def obter_clima_weatherapi(estacao_nome):
@@ -136,13 +170,13 @@ def obter_ultima_temperatura_salva(estacao_nome):
 
     ultimo_tx = (
         Transmissor.objects.filter(estacao=estacao, temp_celsius__isnull=False)
-        .order_by("-data_manutencao", "-horario_coleta", "-id")
+        .order_by(*ORDEM_MAIS_RECENTE)
         .first()
     )
 
     ultimo_rx = (
         Receptor.objects.filter(estacao=estacao, temp_celsius__isnull=False)
-        .order_by("-data_manutencao", "-horario_coleta", "-id")
+        .order_by(*ORDEM_MAIS_RECENTE)
         .first()
     )
 
@@ -174,13 +208,53 @@ def obter_ultima_temperatura_salva(estacao_nome):
     }
 
 
-def obter_temperatura_estacao(estacao_nome):    
-    erros = []
+# Cache do clima atual:
+# L1 em memória do processo (acerto em microssegundos) na frente do cache
+# do Django (compartilhado entre workers). Cada entrada guarda até quando
+# está fresca; vencida, ainda é servida dentro da janela de "stale" enquanto
+# uma thread busca o valor novo.
+_cache_local = {}
+_cache_local_lock = threading.Lock()
+
+
+def _chave_cache_clima(estacao_nome):
+    return f"clima:atual:{normalizar_nome_estacao(estacao_nome).replace(' ', '_')}"
+
+
+def _ler_cache_clima(chave):
+    agora = time.time()
+
+    entrada = _cache_local.get(chave)
+    if entrada and entrada["expira_em"] > agora:
+        return entrada
 
+    entrada = cache.get(chave)
+    if entrada:
+        with _cache_local_lock:
+            _cache_local[chave] = entrada
+    return entrada
+
+
+def _gravar_cache_clima(chave, dados):
+    entrada = {
+        "dados": dados,
+        "expira_em": time.time() + settings.CLIMA_CACHE_TTL,
+    }
+    cache.set(chave, entrada, timeout=settings.CLIMA_CACHE_TTL + settings.CLIMA_CACHE_STALE)
+    with _cache_local_lock:
+        _cache_local[chave] = entrada
+    return entrada
+
+
+def _buscar_clima_apis(estacao_nome, erros):
     try:
-        resultado = obter_clima_open_meteo(estacao_nome)
-        resultado["tentativa"] = "principal"
-        return resultado
+        # uma chamada traz (e grava no cache) todas as estações de uma vez
+        atual = atualizar_cache_clima_lote()[normalizar_nome_estacao(estacao_nome)]["atual"]
+        if atual is None:
+            raise ValueError("Open-Meteo não retornou temperatura.")
+        return dict(atual)
+    except KeyError:
+        erros.append(f"Open-Meteo: Coordenadas não encontradas para a estação: {estacao_nome}")
     except Exception as e:
         erros.append(f"Open-Meteo: {e}")
 
@@ -191,6 +265,84 @@ def obter_temperatura_estacao(estacao_nome):
     except Exception as e:
         erros.append(f"WeatherAPI: {e}")
 
+    return None
+
+
+def _trava_revalidacao(chave):
+    return os.path.join(settings.CLIMA_TRAVAS_DIR, chave.replace(":", "_") + ".lock")
+
+
+def _adquirir_trava(caminho):
+    """
+    Trava entre workers com O_CREAT|O_EXCL (o cache.add do FileBasedCache não é
+    atômico). A de um worker que morreu revalidando expira e é removida.
+    """
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    try:
+        os.close(os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+
+    try:
+        if time.time() - os.path.getmtime(caminho) > TRAVA_REVALIDACAO_EXPIRADA:
+            os.remove(caminho)
+    except OSError:
+        pass
+    return False
+
+
+def _revalidar_clima(estacao_nome, chave, trava):
+    try:
+        resultado = _buscar_clima_apis(estacao_nome, [])
+        if resultado:
+            _gravar_cache_clima(chave, resultado)
+    finally:
+        try:
+            os.remove(trava)
+        except FileNotFoundError:
+            pass
+
+
+def _agendar_revalidacao(estacao_nome, chave):
+    # só o worker que cria o arquivo da trava dispara a atualização da estação
+    trava = _trava_revalidacao(chave)
+    if not _adquirir_trava(trava):
+        return
+    threading.Thread(
+        target=_revalidar_clima,
+        args=(estacao_nome, chave, trava),
+        daemon=True,
+    ).start()
+
+
+def limpar_cache_clima(estacao_nome=None):
+    with _cache_local_lock:
+        if estacao_nome is None:
+            chaves = list(_cache_local)
+            _cache_local.clear()
+        else:
+            chaves = [_chave_cache_clima(estacao_nome)]
+            _cache_local.pop(chaves[0], None)
+    cache.delete_many(chaves)
+
+
+def obter_temperatura_estacao(estacao_nome):
+    chave = _chave_cache_clima(estacao_nome)
+    entrada = _ler_cache_clima(chave)
+
+    if entrada:
+        if entrada["expira_em"] <= time.time():
+            _agendar_revalidacao(estacao_nome, chave)
+        return dict(entrada["dados"])
+
+    erros = []
+
+    resultado = _buscar_clima_apis(estacao_nome, erros)
+    if resultado:
+        _gravar_cache_clima(chave, resultado)
+        return dict(resultado)
+
     fallback = obter_ultima_temperatura_salva(estacao_nome)
     if fallback:
         fallback["tentativa"] = "fallback_banco"
@@ -199,6 +351,65 @@ def obter_temperatura_estacao(estacao_nome):
 
     raise Exception("Não foi possível obter a temperatura. " + " | ".join(erros))
 
+
+def _chave_cache_horario(estacao_nome, data_str):
+    return f"clima:horario:{normalizar_nome_estacao(estacao_nome).replace(' ', '_')}:{data_str}"
+
+
+def _temperatura_na_hora(hourly, data_str, hora_ref):
+    times = hourly.get("time", [])
+    temps = hourly.get("temperature_2m", [])
+    hums = hourly.get("relative_humidity_2m", [])
+
+    alvo = f"{data_str}T{hora_ref.hour:02d}:00"
+
+    idx = times.index(alvo) if alvo in times else -1
+
+    if idx == -1:
+        # tenta hora anterior/posterior
+        h = hora_ref.hour
+        alternativas = []
+        if h > 0:
+            alternativas.append(f"{data_str}T{h-1:02d}:00")
+        if h < 23:
+            alternativas.append(f"{data_str}T{h+1:02d}:00")
+
+        for alt in alternativas:
+            if alt in times:
+                idx = times.index(alt)
+                break
+
+    if idx == -1:
+        raise ValueError("Open-Meteo não encontrou temperatura para o horário informado.")
+
+    temperatura = temps[idx] if idx < len(temps) else None
+    umidade = hums[idx] if idx < len(hums) else None
+
+    if temperatura is None:
+        raise ValueError("Open-Meteo não retornou temperatura horária.")
+
+    return {
+        "temperatura": float(temperatura),
+        "umidade": umidade,
+        "fonte": "open-meteo-horario",
+        "coletado_em": timezone.now(),
+    }
+
+
+def atualizar_cache_clima_lote(estacoes_nomes=None):
+    """Uma chamada ao Open-Meteo para todas as estações, gravando atual e horário no cache."""
+    resultado = obter_clima_open_meteo_lote(estacoes_nomes)
+    hoje = timezone.localdate().isoformat()
+
+    for nome, dados in resultado.items():
+        if dados["atual"]:
+            _gravar_cache_clima(_chave_cache_clima(nome), dados["atual"])
+        if dados["horario"].get("time"):
+            cache.set(_chave_cache_horario(nome, hoje), dados["horario"], timeout=24 * 60 * 60)
+
+    return resultado
+
+
 def obter_temperatura_open_meteo_horaria(estacao_nome, data_str, hora_str):
     coords = obter_coordenadas(estacao_nome)
     if not coords:
@@ -215,10 +426,13 @@ def obter_temperatura_open_meteo_horaria(estacao_nome, data_str, hora_str):
         raise ValueError("Hora inválida. Use o formato HH:MM.")
 
     hoje = timezone.localdate()
-    hora_alvo = f"{hora_ref.hour:02d}:00"
 
     if data_ref == hoje:
-        url = "https://api.open-meteo.com/v1/forecast"
+        hourly = cache.get(_chave_cache_horario(estacao_nome, data_str))
+        if hourly:
+            return _temperatura_na_hora(hourly, data_str, hora_ref)
+
+        url = settings.OPEN_METEO_URL
         params = {
             "latitude": coords["lat"],
             "longitude": coords["lon"],
@@ -241,44 +455,7 @@ def obter_temperatura_open_meteo_horaria(estacao_nome, data_str, hora_str):
     resp.raise_for_status()
     data = resp.json()
 
-    hourly = data.get("hourly", {})
-    times = hourly.get("time", [])
-    temps = hourly.get("temperature_2m", [])
-    hums = hourly.get("relative_humidity_2m", [])
-
-    alvo = f"{data_str}T{hora_alvo}"
-
-    idx = times.index(alvo) if alvo in times else -1
-
-    if idx == -1:
-        # tenta hora anterior/posterior
-        h = hora_ref.hour
-        alternativas = []
-        if h > 0:
-            alternativas.append(f"{data_str}T{h-1:02d}:00")
-        if h < 23:
-            alternativas.append(f"{data_str}T{h+1:02d}:00")
-
-        for alt in alternativas:
-            if alt in times:
-                idx = times.index(alt)
-                break
-
-    if idx == -1:
-        raise ValueError("Open-Meteo não encontrou temperatura para o horário informado.")
-
-    temperatura = temps[idx] if idx < len(temps) else None
-    umidade = hums[idx] if idx < len(hums) else None
-
-    if temperatura is None:
-        raise ValueError("Open-Meteo não retornou temperatura horária.")
-
-    return {
-        "temperatura": float(temperatura),
-        "umidade": umidade,
-        "fonte": "open-meteo-horario",
-        "coletado_em": timezone.now(),
-    }
+    return _temperatura_na_hora(data.get("hourly", {}), data_str, hora_ref)
 
 
 def obter_temperatura_por_horario(estacao_nome, data_str, hora_str):
@@ -0,0 +1,42 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+# horário nulo conta como o mais antigo do dia, como em leituras_atuais._ordem;
+# sem nulls_last o PostgreSQL ordenaria DESC NULLS FIRST (e o SQLite, NULLS LAST)
+ORDEM_MAIS_RECENTE = (
+    F("data_manutencao").desc(),
+    F("horario_coleta").desc(nulls_last=True),
+    F("id").desc(),
+)
+
+
+def ultimas_por_grupo(queryset, particao, n, ordem=ORDEM_MAIS_RECENTE):
+    """
+    Filtra o queryset para as `n` linhas mais recentes de cada grupo (`particao`).
+
+    Usa ROW_NUMBER() OVER (PARTITION BY ... ORDER BY ...) no banco, então só
+    O(grupos x n) linhas saem do banco, qualquer que seja o tamanho do histórico.
+    Funciona no PostgreSQL e no SQLite (>= 3.25). A posição (1 = mais recente)
+    fica disponível como `posicao_no_grupo`.
+    """
+    return (
+        queryset
+        .annotate(posicao_no_grupo=Window(
+            expression=RowNumber(),
+            partition_by=[F(campo) for campo in particao],
+            order_by=list(ordem),
+        ))
+        .filter(posicao_no_grupo__lte=n)
+    )
+
+
+def ultima_por_grupo(queryset, particao, ordem=ORDEM_MAIS_RECENTE):
+    """
+    Linha mais recente de cada grupo, como queryset comum do mesmo modelo.
+
+    Substitui o .distinct(*campos) (só PostgreSQL): o ROW_NUMBER() vira uma
+    subconsulta em `pk__in`, e o resultado ainda aceita count/values/annotate.
+    """
+    return queryset.model.objects.filter(
+        pk__in=ultimas_por_grupo(queryset, particao, 1, ordem).values("pk")
+    )
@@ -0,0 +1,154 @@
+import datetime
+import json
+import math
+import re
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.servicos.cache_dashboard import marcar_estacoes_alteradas
+from cdv_api.servicos.leituras_atuais import reconstruir_leituras_atuais
+
+ARQUIVO_CIRCUITOS = settings.BASE_DIR / "static" / "js" / "circuitos_por_estacao.js"
+
+
+def carregar_circuitos_por_estacao(caminho=ARQUIVO_CIRCUITOS):
+    """Lê o mapa estação -> circuitos do JS usado no formulário de coleta."""
+    with open(caminho, encoding="utf-8") as arquivo:
+        texto = arquivo.read()
+    objeto = re.search(r"\{.*\}", texto, re.S).group(0)
+    # o JS aceita vírgula antes de ] e }; o JSON não
+    objeto = re.sub(r",\s*([\]}])", r"\1", objeto)
+    return json.loads(objeto)
+
+
+def _temperaturas(momentos, rng):
+    """Temperatura (°C) com ciclo anual (verão em janeiro), ciclo diário e ruído."""
+    dia_ano = np.array([m.timetuple().tm_yday for m in momentos], dtype=float)
+    hora = np.array([m.hour + m.minute / 60 for m in momentos], dtype=float)
+    anual = 4.5 * np.cos(2 * math.pi * (dia_ano - 20) / 365.25)
+    diario = 4.0 * np.sin(2 * math.pi * (hora - 9) / 24)
+    return np.round(21 + anual + diario + rng.normal(0, 1.2, len(momentos)), 1)
+
+
+def _momentos_coleta(dias, coletas_por_dia, fim, rng):
+    """Instantes das coletas: `coletas_por_dia` horários aleatórios (07h-18h) em cada dia."""
+    momentos = []
+    for d in range(dias, 0, -1):
+        dia = fim - datetime.timedelta(days=d - 1)
+        minutos = np.sort(rng.choice(np.arange(7 * 60, 18 * 60, 5), coletas_por_dia, replace=False))
+        for minuto in minutos:
+            hora = datetime.time(int(minuto) // 60, int(minuto) % 60)
+            momentos.append(timezone.make_aware(datetime.datetime.combine(dia, hora)))
+    return momentos
+
+
+def _leituras_estacao(estacao, circuitos, momentos, temperaturas, rxs_por_circuito, rng):
+    """
+    Monta os TX/RX de todas as coletas de uma estação.
+
+    Cada RX tem uma relação base (62-78%) que deriva lentamente (passeio
+    aleatório), reage à temperatura e, em ~10% dos RX, degrada na reta final.
+    """
+    n = len(momentos)
+    transmissores = []
+    receptores = []
+
+    for circuito in circuitos:
+        vout = np.round(rng.normal(12.0, 0.4, n), 2)
+        pout = np.round(rng.normal(5.0, 0.25, n), 2)
+        tap = str(rng.integers(1, 5))
+
+        for i, momento in enumerate(momentos):
+            transmissores.append(Transmissor(
+                estacao=estacao,
+                num_circuito=circuito,
+                num_transmissor="1",
+                vout=float(vout[i]),
+                pout=float(pout[i]),
+                tap=tap,
+                tipo_transmissor="Padrão",
+                data_manutencao=momento,
+                horario_coleta=timezone.localtime(momento).time(),
+                temp_celsius=float(temperaturas[i]),
+                tipo_manutencao="preventiva",
+                data_coleta=timezone.localdate(momento),
+            ))
+
+        for rx in range(1, rxs_por_circuito + 1):
+            relacao = rng.uniform(62, 78) + np.cumsum(rng.normal(0, 0.15, n))
+            relacao += 0.12 * (temperaturas - 21)
+            if rng.random() < 0.1:
+                queda = min(n, int(rng.integers(5, 30)))
+                sentido = -1 if rng.random() < 0.7 else 1
+                relacao[-queda:] += sentido * np.linspace(0, rng.uniform(10, 25), queda)
+            relacao = np.clip(relacao + rng.normal(0, 0.4, n), 30, 105)
+
+            iav = np.round(rng.normal(10.0, 0.3, n), 2)
+            ith = np.round(iav * relacao / 100, 3)
+
+            for i, momento in enumerate(momentos):
+                rel_str = f"{(ith[i] / iav[i]) * 100:.2f}%"
+                receptores.append(Receptor(
+                    estacao=estacao,
+                    num_circuito=circuito,
+                    num_receptor=str(rx),
+                    iav=float(iav[i]),
+                    ith=float(ith[i]),
+                    relacao=rel_str,
+                    relacao_pct=float(rel_str[:-1]),
+                    data_manutencao=momento,
+                    horario_coleta=timezone.localtime(momento).time(),
+                    temp_celsius=float(temperaturas[i]),
+                    tipo_manutencao="preventiva",
+                    data_coleta=timezone.localdate(momento),
+                ))
+
+    return transmissores, receptores
+
+
+def gerar_historico(dias=365, coletas_por_dia=1, rxs_por_circuito=2, estacoes=None,
+                    fim=None, semente=None, lote=5000):
+    """
+    Gera histórico sintético de TX/RX para as estações do mapa de circuitos.
+
+    Cria as estações que faltarem, grava as leituras com bulk_create (uma
+    estação por vez) e reconstrói as leituras atuais no final. Retorna as
+    quantidades gravadas.
+    """
+    rng = np.random.default_rng(semente)
+    fim = fim or timezone.localdate()
+
+    mapa = carregar_circuitos_por_estacao()
+    if estacoes:
+        mapa = {nome: circuitos for nome, circuitos in mapa.items() if nome in estacoes}
+
+    momentos = _momentos_coleta(dias, coletas_por_dia, fim, rng)
+    total_tx = total_rx = 0
+    estacao_ids = []
+
+    for nome, circuitos in mapa.items():
+        estacao, _ = Estacao.objects.get_or_create(nome=nome)
+        estacao_ids.append(estacao.id)
+
+        temperaturas = _temperaturas(momentos, rng)
+        transmissores, receptores = _leituras_estacao(
+            estacao, circuitos, momentos, temperaturas, rxs_por_circuito, rng
+        )
+
+        with transaction.atomic():
+            Transmissor.objects.bulk_create(transmissores, batch_size=lote)
+            Receptor.objects.bulk_create(receptores, batch_size=lote)
+
+        total_tx += len(transmissores)
+        total_rx += len(receptores)
+
+    with transaction.atomic():
+        reconstruir_leituras_atuais(Transmissor, estacao_ids)
+        reconstruir_leituras_atuais(Receptor, estacao_ids)
+        marcar_estacoes_alteradas(estacao_ids)
+
+    return {"estacoes": len(estacao_ids), "transmissores": total_tx, "receptores": total_rx}
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models.functions import Trim, Upper
+
+from cdv_api.servicos.consultas import ultimas_por_grupo
+
+
+def parametros_degradacao(janela=None, limite_inferior=None, limite_superior=None, inclinacao_minima=None):
+    return {
+        "janela": janela or settings.DEGRADACAO_JANELA,
+        "limite_inferior": settings.DEGRADACAO_LIMITE_INFERIOR if limite_inferior is None else limite_inferior,
+        "limite_superior": settings.DEGRADACAO_LIMITE_SUPERIOR if limite_superior is None else limite_superior,
+        "inclinacao_minima": settings.DEGRADACAO_INCLINACAO_MINIMA if inclinacao_minima is None else inclinacao_minima,
+    }
+
+
+def carregar_leituras(receptores_queryset, janela, por_estacao=False):
+    """
+    Carrega as relações (%) em colunas, da leitura mais recente para a mais antiga
+    dentro de cada circuito. A ordem vem do banco e é preservada pelo agrupamento.
+
+    Só as últimas `janela` leituras de cada circuito saem do banco (o agrupamento
+    por nome normalizado escolhe entre elas).
+    """
+    particao = ["num_circuito"]
+    ordem = ["num_circuito", "-data_manutencao", "-id"]
+    colunas = ["num_circuito", "relacao_pct"]
+    if por_estacao:
+        particao.insert(0, "estacao_id")
+        ordem.insert(0, "estacao_id")
+        colunas.insert(0, "estacao_id")
+
+    consulta = (
+        ultimas_por_grupo(
+            receptores_queryset.filter(relacao_pct__isnull=False),
+            particao,
+            janela,
+            ordem=("-data_manutencao", "-id"),
+        )
+        .order_by(*ordem)
+        .values_list(*colunas)
+    )
+
+    df = pd.DataFrame.from_records(consulta.iterator(chunk_size=5000), columns=colunas)
+
+    # poucos circuitos distintos: normaliza cada nome uma vez só
+    normalizados = {c: (c or "").strip().upper() for c in df["num_circuito"].unique()}
+    df["circuito"] = df["num_circuito"].map(normalizados)
+    return df
+
+
+def avaliar_janelas(df, chaves, janela, limite_inferior, limite_superior, inclinacao_minima=0):
+    """
+    Avalia de uma vez todas as janelas (últimas `janela` leituras por grupo).
+
+    Monta uma matriz grupos x janela em ordem cronológica e calcula, por linha,
+    queda/subida contínua, inclinação (mínimos quadrados, % por leitura) e saída
+    da faixa. Retorna um DataFrame só com os grupos degradados.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=[*chaves, "valores", "inclinacao", "negativa"])
+
+    grupos = df.groupby(chaves, sort=False)
+    posicao = grupos.cumcount().to_numpy()
+    recentes = posicao < janela
+
+    codigos = grupos.ngroup().to_numpy()[recentes]
+    posicao = posicao[recentes]
+    valores = df["relacao_pct"].to_numpy(dtype=float)[recentes]
+
+    n_grupos = grupos.ngroups
+    matriz = np.full((n_grupos, janela), np.nan)
+    # posição 0 é a mais recente -> última coluna da matriz
+    matriz[codigos, janela - 1 - posicao] = valores
+
+    completos = ~np.isnan(matriz).any(axis=1)
+
+    diferencas = np.diff(matriz, axis=1)
+    em_queda = (diferencas < 0).all(axis=1)
+    em_subida = (diferencas > 0).all(axis=1)
+
+    x = np.arange(janela) - (janela - 1) / 2
+    inclinacao = (matriz - matriz.mean(axis=1, keepdims=True)) @ x / (x @ x) if janela > 1 else np.zeros(n_grupos)
+    inclinacao_ok = np.abs(inclinacao) >= inclinacao_minima
+
+    ultima = matriz[:, -1]
+    negativa = completos & em_queda & (ultima < limite_inferior) & inclinacao_ok
+    positiva = completos & em_subida & (ultima > limite_superior) & inclinacao_ok & ~negativa
+
+    degradados = np.flatnonzero(negativa | positiva)
+
+    # ngroup() numera os grupos na ordem de grupos.size() (sort=False)
+    resultado = grupos.size().index.to_frame(index=False).iloc[degradados].reset_index(drop=True)
+    resultado["valores"] = list(matriz[degradados])
+    resultado["inclinacao"] = inclinacao[degradados]
+    resultado["negativa"] = negativa[degradados]
+    return resultado
+
+
+def detectar_degradacao_faixa(receptores_queryset, qtd_leituras=None, **limites):
+    """
+    Detecta degradação quando a tendência sai da faixa normal.
+
+    Regras (janela e limites configuráveis, padrão 3 leituras / 60% / 80%):
+    - usa as últimas `janela` leituras por circuito
+    - se estiver em queda contínua e a última < limite inferior -> degradação negativa
+    - se estiver em subida contínua e a última > limite superior -> degradação positiva
+    """
+    parametros = parametros_degradacao(janela=qtd_leituras, **limites)
+    degradados = avaliar_janelas(
+        carregar_leituras(receptores_queryset, parametros["janela"]),
+        ["circuito"],
+        **parametros,
+    )
+
+    circuitos_degradados = []
+
+    for circuito, valores, inclinacao, negativa in degradados[["circuito", "valores", "inclinacao", "negativa"]].itertuples(index=False):
+        valores = [float(v) for v in valores]
+        ultima = valores[-1]
+
+        circuitos_degradados.append({
+            "circuito": circuito,
+            "leituras": [round(v, 2) for v in valores],
+            "variacao_total": round(ultima - valores[0], 2),
+            "ultima_relacao": round(ultima, 2),
+            "inclinacao": round(float(inclinacao), 2),
+            "tipo_degradacao": "Negativa" if negativa else "Positiva",
+            "status": (
+                f"Abaixo de {parametros['limite_inferior']:g}%" if negativa
+                else f"Acima de {parametros['limite_superior']:g}%"
+            ),
+        })
+
+    circuitos_degradados.sort(
+        key=lambda x: (
+            x["tipo_degradacao"] != "Negativa",
+            x["ultima_relacao"]
+        )
+    )
+
+    return circuitos_degradados
+
+
+def contar_degradacoes_por_estacao(receptores_queryset, qtd_leituras=None, **limites):
+    """Mesmas regras, agrupando por (estação, circuito). Retorna {estacao_id: qtd_circuitos_degradados}."""
+    parametros = parametros_degradacao(janela=qtd_leituras, **limites)
+    degradados = avaliar_janelas(
+        carregar_leituras(receptores_queryset, parametros["janela"], por_estacao=True),
+        ["estacao_id", "circuito"],
+        **parametros,
+    )
+    return {int(k): int(v) for k, v in degradados["estacao_id"].value_counts().items()}
+
+
+def series_tendencia(receptores_queryset, circuitos, pontos=None):
+    """
+    Séries do gráfico de tendência dos circuitos informados (nomes normalizados),
+    numa única consulta: as últimas `pontos` leituras de cada circuito, em ordem
+    cronológica. Retorna {circuito: [(data_manutencao, horario_coleta, relacao_pct), ...]}.
+    """
+    pontos = pontos or settings.DEGRADACAO_PONTOS_GRAFICO
+    circuitos = [c for c in circuitos if c]
+    if not circuitos:
+        return {}
+
+    consulta = (
+        ultimas_por_grupo(
+            receptores_queryset
+            .filter(relacao_pct__isnull=False)
+            .annotate(circuito_normalizado=Upper(Trim("num_circuito")))
+            .filter(circuito_normalizado__in=circuitos),
+            ["circuito_normalizado"],
+            pontos,
+        )
+        .order_by("circuito_normalizado", "data_manutencao", "horario_coleta", "id")
+        .values_list("circuito_normalizado", "data_manutencao", "horario_coleta", "relacao_pct")
+    )
+
+    series = {}
+    for circuito, data_manutencao, horario_coleta, relacao in consulta:
+        series.setdefault(circuito, []).append((data_manutencao, horario_coleta, relacao))
+    return series
@@ -0,0 +1,386 @@
+import datetime
+
+from django.db.models import Max, Min
+from django.db.models.functions import Length
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule, FormulaRule
+from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.utils import safe_int
+
+TAMANHO_LOTE = 2000
+LARGURA_MAXIMA = 30
+
+TITULO_ESTACAO = "ESTAÇÃO: "
+TITULO_TX = "TRANSMISSORES (TX)"
+TITULO_RX = "RECEPTORES (RX)"
+
+HEADERS_TX = [
+    "Estação", "Circuito", "TX", "VOUT", "POUT", "TAP", "Tipo TX",
+    "Tipo Manutenção", "Data", "Horário Coleta", "Temp. (Celsius)"
+]
+HEADERS_RX = [
+    "Estação", "Circuito", "RX", "IAV", "ITH", "Relação", "Tipo Manutenção",
+    "Data", "Horário Coleta", "Temp. (Celsius)"
+]
+
+# Coluna (1-based) da relação no bloco RX
+COL_RELACAO_RX = 6
+
+CAMPOS_TX = [
+    "num_circuito", "num_transmissor", "vout", "pout", "tap", "tipo_transmissor",
+    "tipo_manutencao", "data_manutencao", "horario_coleta", "temp_celsius",
+]
+CAMPOS_RX = [
+    "num_circuito", "num_receptor", "iav", "ith", "relacao_pct", "tipo_manutencao",
+    "data_manutencao", "horario_coleta", "temp_celsius",
+]
+
+TIPOS_MANUTENCAO = {"preventiva", "corretiva", "checklist"}
+
+
+# =========================
+# FILTROS
+# =========================
+
+def _norm_tipo(val):
+    if not val:
+        return None
+    v = val.strip().lower()
+    if v.startswith("prevent"):
+        return "preventiva"
+    if v.startswith("corret"):
+        return "corretiva"
+    if v.startswith("check"):
+        return "checklist"
+    return None
+
+
+def _parse_date(s):
+    try:
+        return datetime.datetime.strptime(s, "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+
+def normalizar_filtros_exportacao(params):
+    """Filtros do relatório a partir de request.GET (ou dict equivalente), já normalizados."""
+    estacao_txt = (params.get("estacao_id") or "").strip()
+    data_inicio_str = params.get("data_inicio")
+    data_fim_str = params.get("data_fim")
+
+    return {
+        "estacao_id": safe_int(estacao_txt) if estacao_txt else None,
+        "estacao_invalida": bool(estacao_txt) and safe_int(estacao_txt) is None,
+        "circuito_filtro": (params.get("circuito_filtro") or "").strip(),
+        "data_inicio": _parse_date(data_inicio_str) if data_inicio_str else None,
+        "data_fim": _parse_date(data_fim_str) if data_fim_str else None,
+        "tipo_manutencao": _norm_tipo(params.get("tipo_manutencao")),
+    }
+
+
+def estacoes_da_exportacao(filtros):
+    if filtros["estacao_invalida"]:
+        return Estacao.objects.none()
+    if filtros["estacao_id"]:
+        return Estacao.objects.filter(id=filtros["estacao_id"]).order_by("nome")
+    return Estacao.objects.all().order_by("nome")
+
+
+def nome_arquivo_exportacao(filtros, estacoes):
+    if filtros["estacao_id"] or filtros["estacao_invalida"]:
+        estacao = estacoes.first()
+        return f"dados_estacao_{estacao.nome}.xlsx" if estacao else "dados_estacao.xlsx"
+    return "dados_todas_estacoes.xlsx"
+
+
+def _filtrar(qs, filtros):
+    if filtros["circuito_filtro"]:
+        qs = qs.filter(num_circuito__icontains=filtros["circuito_filtro"])
+
+    if filtros["tipo_manutencao"] in TIPOS_MANUTENCAO:
+        qs = qs.filter(tipo_manutencao=filtros["tipo_manutencao"])
+
+    if filtros["data_inicio"]:
+        qs = qs.filter(data_coleta__gte=filtros["data_inicio"])
+
+    if filtros["data_fim"]:
+        qs = qs.filter(data_coleta__lte=filtros["data_fim"])
+
+    return qs.exclude(temp_celsius__isnull=True)
+
+
+def querysets_da_estacao(estacao, filtros):
+    transmissores = _filtrar(Transmissor.objects.filter(estacao=estacao), filtros)
+    receptores = _filtrar(Receptor.objects.filter(estacao=estacao), filtros)
+    return transmissores, receptores
+
+
+def querysets_da_exportacao(estacoes, filtros):
+    transmissores = _filtrar(Transmissor.objects.filter(estacao__in=estacoes), filtros)
+    receptores = _filtrar(Receptor.objects.filter(estacao__in=estacoes), filtros)
+    return transmissores, receptores
+
+
+def filtros_como_parametros(filtros):
+    """Forma serializável (mesmas chaves de request.GET) dos filtros normalizados."""
+    return {
+        "estacao_id": str(filtros["estacao_id"]) if filtros["estacao_id"] else "",
+        "circuito_filtro": filtros["circuito_filtro"],
+        "data_inicio": filtros["data_inicio"].isoformat() if filtros["data_inicio"] else "",
+        "data_fim": filtros["data_fim"].isoformat() if filtros["data_fim"] else "",
+        "tipo_manutencao": filtros["tipo_manutencao"] or "",
+    }
+
+
+# =========================
+# ESCRITA (write-only)
+# =========================
+
+def sanitize_sheet_title(title):
+    invalid = ['\\', '/', '*', '?', ':', '[', ']']
+    for ch in invalid:
+        title = title.replace(ch, "-")
+    return title[:31]
+
+
+def _largura_texto(valor):
+    return len(str(valor)) if valor is not None else 0
+
+
+def _larguras_por_agregado(qs, colunas):
+    """
+    Largura máxima de cada coluna calculada no banco (Max(Length) / Min / Max),
+    porque no modo write-only as larguras precisam ser gravadas antes das linhas.
+
+    colunas: {indice_coluna: (campo, tipo)} com tipo "texto" ou "numero".
+    """
+    agregados = {}
+    for idx, (campo, tipo) in colunas.items():
+        if tipo == "texto":
+            agregados[f"c{idx}"] = Max(Length(campo))
+        else:
+            agregados[f"c{idx}_min"] = Min(campo)
+            agregados[f"c{idx}_max"] = Max(campo)
+
+    resultado = qs.aggregate(**agregados)
+
+    larguras = {}
+    for idx, (campo, tipo) in colunas.items():
+        if tipo == "texto":
+            larguras[idx] = resultado[f"c{idx}"] or 0
+            continue
+
+        larguras[idx] = max(
+            _largura_texto(resultado[f"c{idx}_min"]),
+            _largura_texto(resultado[f"c{idx}_max"]),
+        )
+
+    return larguras
+
+
+def _calcular_larguras(estacao, transmissores, receptores, tem_tx, tem_rx):
+    larguras = {1: max(len(TITULO_ESTACAO + estacao.nome), len(estacao.nome))}
+
+    def juntar(idx, valor):
+        larguras[idx] = max(larguras.get(idx, 0), valor)
+
+    if tem_tx:
+        juntar(1, len(TITULO_TX))
+        for idx, header in enumerate(HEADERS_TX, start=1):
+            juntar(idx, len(header))
+        for idx, valor in _larguras_por_agregado(transmissores, {
+            2: ("num_circuito", "texto"),
+            3: ("num_transmissor", "texto"),
+            4: ("vout", "numero"),
+            5: ("pout", "numero"),
+            6: ("tap", "texto"),
+            7: ("tipo_transmissor", "texto"),
+            8: ("tipo_manutencao", "texto"),
+            11: ("temp_celsius", "numero"),
+        }).items():
+            juntar(idx, valor)
+        juntar(9, len("dd/mm/YYYY"))
+        juntar(10, len("HH:MM"))
+
+    if tem_rx:
+        juntar(1, len(TITULO_RX))
+        for idx, header in enumerate(HEADERS_RX, start=1):
+            juntar(idx, len(header))
+        for idx, valor in _larguras_por_agregado(receptores, {
+            2: ("num_circuito", "texto"),
+            3: ("num_receptor", "texto"),
+            4: ("iav", "numero"),
+            5: ("ith", "numero"),
+            7: ("tipo_manutencao", "texto"),
+            10: ("temp_celsius", "numero"),
+        }).items():
+            juntar(idx, valor)
+        juntar(8, len("dd/mm/YYYY"))
+        juntar(9, len("HH:MM"))
+
+    return {idx: min(valor + 2, LARGURA_MAXIMA) for idx, valor in larguras.items()}
+
+
+def _celula(ws, valor, number_format=None):
+    if valor is None or number_format is None:
+        return valor
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.number_format = number_format
+    return cell
+
+
+def _data_hora(data_manutencao, horario_coleta):
+    dt = timezone.localtime(data_manutencao) if data_manutencao else None
+    data_fmt = dt.strftime("%d/%m/%Y") if dt else "-"
+    hora_fmt = horario_coleta.strftime("%H:%M") if horario_coleta else "-"
+    return data_fmt, hora_fmt
+
+
+def aplicar_formatacao_relacao(ws, linha_inicio, linha_fim, col_idx=COL_RELACAO_RX):
+    if linha_fim < linha_inicio:
+        return
+
+    col_rel = get_column_letter(col_idx)
+    intervalo = f"{col_rel}{linha_inicio}:{col_rel}{linha_fim}"
+    fill_red = PatternFill(start_color="FFFFC7CE", end_color="FFFFC7CE", fill_type="solid")
+    font_red = Font(color="FF9C0006")
+    fill_green = PatternFill(start_color="FFC6EFCE", end_color="FFC6EFCE", fill_type="solid")
+    font_green = Font(color="FF006100")
+
+    ws.conditional_formatting.add(
+        intervalo,
+        CellIsRule(operator="lessThan", formula=["0.6"], fill=fill_red, font=font_red)
+    )
+    ws.conditional_formatting.add(
+        intervalo,
+        CellIsRule(operator="greaterThan", formula=["0.8"], fill=fill_red, font=font_red)
+    )
+    ws.conditional_formatting.add(
+        intervalo,
+        FormulaRule(
+            formula=[f"AND({col_rel}{linha_inicio}>=0.6,{col_rel}{linha_inicio}<=0.8)"],
+            fill=fill_green,
+            font=font_green,
+        )
+    )
+
+
+def _escrever_aba(wb, estacao, transmissores, receptores, tem_tx, tem_rx, progresso=None):
+    ws = wb.create_sheet(title=sanitize_sheet_title(estacao.nome))
+
+    for idx, largura in _calcular_larguras(estacao, transmissores, receptores, tem_tx, tem_rx).items():
+        ws.column_dimensions[get_column_letter(idx)].width = largura
+
+    ws.append([f"{TITULO_ESTACAO}{estacao.nome}"])
+    ws.append([])
+    linha_atual = 3
+    linhas_escritas = 0
+
+    if tem_tx:
+        ws.append([TITULO_TX])
+        ws.append(HEADERS_TX)
+        linha_atual += 2
+
+        linhas = (
+            transmissores
+            .order_by("data_manutencao", "horario_coleta", "id")
+            .values_list(*CAMPOS_TX)
+            .iterator(chunk_size=TAMANHO_LOTE)
+        )
+        for (num_circuito, num_tx, vout, pout, tap, tipo_tx, tipo_manut,
+             data_manutencao, horario_coleta, temp) in linhas:
+            data_fmt, hora_fmt = _data_hora(data_manutencao, horario_coleta)
+            ws.append([
+                estacao.nome,
+                num_circuito,
+                safe_int(num_tx),
+                vout,
+                pout,
+                safe_int(tap),
+                tipo_tx,
+                tipo_manut,
+                data_fmt,
+                hora_fmt,
+                _celula(ws, temp, "0.0"),
+            ])
+            linha_atual += 1
+            linhas_escritas += 1
+            if progresso and linhas_escritas % TAMANHO_LOTE == 0:
+                progresso(TAMANHO_LOTE)
+
+    if tem_rx:
+        if tem_tx:
+            ws.append([])
+            ws.append([])
+            linha_atual += 2
+
+        ws.append([TITULO_RX])
+        ws.append(HEADERS_RX)
+        linha_atual += 2
+        linha_inicio_rx = linha_atual
+
+        linhas = (
+            receptores
+            .order_by("data_manutencao", "horario_coleta", "id")
+            .values_list(*CAMPOS_RX)
+            .iterator(chunk_size=TAMANHO_LOTE)
+        )
+        for (num_circuito, num_rx, iav, ith, relacao_pct, tipo_manut,
+             data_manutencao, horario_coleta, temp) in linhas:
+            data_fmt, hora_fmt = _data_hora(data_manutencao, horario_coleta)
+            rel_excel = relacao_pct / 100.0 if relacao_pct is not None else None
+            ws.append([
+                estacao.nome,
+                num_circuito,
+                safe_int(num_rx),
+                iav,
+                ith,
+                _celula(ws, rel_excel, "0.00%"),
+                tipo_manut,
+                data_fmt,
+                hora_fmt,
+                _celula(ws, temp, "0.0"),
+            ])
+            linha_atual += 1
+            linhas_escritas += 1
+            if progresso and linhas_escritas % TAMANHO_LOTE == 0:
+                progresso(TAMANHO_LOTE)
+
+        aplicar_formatacao_relacao(ws, linha_inicio_rx, linha_atual - 1)
+
+    if progresso:
+        progresso(linhas_escritas % TAMANHO_LOTE)
+
+
+def escrever_excel_estacoes(estacoes, filtros, destino, progresso=None):
+    """
+    Gera o relatório em modo write-only direto em `destino` (arquivo ou file-like).
+
+    As linhas vêm de querysets .iterator() e vão para o disco conforme são
+    escritas, então a memória fica estável independente do volume.
+    `progresso(n)` é chamado a cada lote de linhas escritas.
+    Retorna a quantidade de abas criadas (0 = nenhum dado para os filtros).
+    """
+    wb = Workbook(write_only=True)
+    total_abas_criadas = 0
+
+    for estacao in estacoes:
+        transmissores, receptores = querysets_da_estacao(estacao, filtros)
+        tem_tx = transmissores.exists()
+        tem_rx = receptores.exists()
+
+        if not tem_tx and not tem_rx:
+            continue
+
+        _escrever_aba(wb, estacao, transmissores, receptores, tem_tx, tem_rx, progresso)
+        total_abas_criadas += 1
+
+    if total_abas_criadas:
+        wb.save(destino)
+
+    return total_abas_criadas
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from cdv_api.models import ExportacaoExcel
+from cdv_api.servicos.cache_dashboard import geracoes_estacoes
+from cdv_api.servicos.exportacao import (
+    normalizar_filtros_exportacao,
+    estacoes_da_exportacao,
+    nome_arquivo_exportacao,
+    querysets_da_exportacao,
+    filtros_como_parametros,
+    escrever_excel_estacoes,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_ATIVOS = ("pendente", "processando", "concluido")
+
+
+def diretorio_exportacoes():
+    caminho = Path(settings.EXPORTACOES_DIR)
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def caminho_arquivo(exportacao):
+    return Path(settings.EXPORTACOES_DIR) / exportacao.arquivo if exportacao.arquivo else None
+
+
+def versao_dados_exportacao(estacoes, filtros):
+    """
+    Carimbo da versão dos dados cobertos pelos filtros e total de linhas.
+
+    Usa a geração de dados das estações, incrementada a cada gravação de
+    TX/RX (inclusive edições pelo admin).
+    """
+    transmissores, receptores = querysets_da_exportacao(estacoes, filtros)
+    total = transmissores.count() + receptores.count()
+
+    geracoes = geracoes_estacoes(list(estacoes.values_list("id", flat=True)))
+    versao = "|".join(f"{estacao_id}:{geracao}" for estacao_id, geracao in geracoes)
+    return versao, total
+
+
+def chave_exportacao(parametros, versao):
+    bruto = json.dumps({"filtros": parametros, "versao": versao}, sort_keys=True)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def liberar_exportacoes_travadas():
+    """
+    Devolve para a fila os jobs em "processando" há mais de
+    EXPORTACAO_TIMEOUT_PROCESSANDO segundos (worker morto depois de reservar).
+    """
+    limite = timezone.now() - timedelta(seconds=settings.EXPORTACAO_TIMEOUT_PROCESSANDO)
+    return ExportacaoExcel.objects.filter(status="processando", iniciado_em__lt=limite).update(
+        status="pendente",
+        iniciado_em=None,
+        linhas_escritas=0,
+    )
+
+
+def solicitar_exportacao(params, usuario=None):
+    """
+    Registra (ou reaproveita) um job de exportação para os filtros informados.
+
+    Se já existe um job com a mesma chave (filtros + versão dos dados)
+    concluído e com arquivo em disco, ou ainda na fila, ele é devolvido
+    sem gerar nada de novo. Jobs travados em "processando" voltam antes
+    para a fila, para não serem devolvidos para sempre.
+    """
+    filtros = normalizar_filtros_exportacao(params)
+    estacoes = estacoes_da_exportacao(filtros)
+
+    if not estacoes.exists():
+        raise ValueError("Estação selecionada não foi encontrada.")
+
+    versao, total_linhas = versao_dados_exportacao(estacoes, filtros)
+    if total_linhas == 0:
+        raise ValueError("Nenhum dado encontrado para os filtros selecionados.")
+
+    parametros = filtros_como_parametros(filtros)
+    chave = chave_exportacao(parametros, versao)
+    liberar_exportacoes_travadas()
+
+    for existente in ExportacaoExcel.objects.filter(chave=chave, status__in=STATUS_ATIVOS):
+        if existente.status != "concluido":
+            return existente
+        caminho = caminho_arquivo(existente)
+        if caminho and caminho.exists():
+            return existente
+
+    return ExportacaoExcel.objects.create(
+        chave=chave,
+        filtros=parametros,
+        versao_dados=versao,
+        linhas_total=total_linhas,
+        nome_arquivo=nome_arquivo_exportacao(filtros, estacoes),
+        solicitado_por=usuario if usuario and usuario.is_authenticated else None,
+    )
+
+
+def _reservar(exportacao):
+    # UPDATE condicional: só um worker consegue passar o job de pendente para processando
+    return ExportacaoExcel.objects.filter(pk=exportacao.pk, status="pendente").update(
+        status="processando",
+        iniciado_em=timezone.now(),
+    ) == 1
+
+
+def processar_exportacao(exportacao):
+    if not _reservar(exportacao):
+        return False
+
+    destino = diretorio_exportacoes() / f"{exportacao.chave}.xlsx"
+    # por processo: um worker lento e o que reassumiu o job não disputam o mesmo arquivo
+    temporario = destino.with_suffix(f".{os.getpid()}.tmp")
+
+    def progresso(linhas):
+        ExportacaoExcel.objects.filter(pk=exportacao.pk).update(
+            linhas_escritas=F("linhas_escritas") + linhas
+        )
+
+    try:
+        if not destino.exists():
+            filtros = normalizar_filtros_exportacao(exportacao.filtros)
+            estacoes = estacoes_da_exportacao(filtros)
+
+            with open(temporario, "wb") as arquivo:
+                escrever_excel_estacoes(estacoes, filtros, arquivo, progresso=progresso)
+            os.replace(temporario, destino)
+
+        ExportacaoExcel.objects.filter(pk=exportacao.pk).update(
+            status="concluido",
+            arquivo=destino.name,
+            linhas_escritas=F("linhas_total"),
+            concluido_em=timezone.now(),
+        )
+        return True
+    except Exception as e:
+        logger.exception("Erro ao gerar exportação %s", exportacao.pk)
+        if temporario.exists():
+            temporario.unlink()
+        ExportacaoExcel.objects.filter(pk=exportacao.pk).update(
+            status="erro",
+            erro=str(e),
+            concluido_em=timezone.now(),
+        )
+        return False
+
+
+def processar_pendentes(limite=None):
+    liberar_exportacoes_travadas()
+    processadas = 0
+    pendentes = ExportacaoExcel.objects.filter(status="pendente").order_by("criado_em")
+
+    for exportacao in pendentes[:limite] if limite else pendentes:
+        if processar_exportacao(exportacao):
+            processadas += 1
+
+    return processadas
+
+
+def limpar_exportacoes_antigas(dias):
+    """Remove jobs e arquivos mais antigos que `dias`; arquivos ainda usados por jobs recentes ficam."""
+    limite = timezone.now() - timedelta(days=dias)
+    antigas = ExportacaoExcel.objects.filter(criado_em__lt=limite)
+    arquivos = set(antigas.exclude(arquivo="").values_list("arquivo", flat=True))
+    em_uso = set(
+        ExportacaoExcel.objects.filter(criado_em__gte=limite, arquivo__in=arquivos)
+        .values_list("arquivo", flat=True)
+    )
+
+    removidos, _ = antigas.delete()
+
+    for nome in arquivos - em_uso:
+        caminho = Path(settings.EXPORTACOES_DIR) / nome
+        if caminho.exists():
+            caminho.unlink()
+
+    return removidos
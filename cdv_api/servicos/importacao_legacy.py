@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+from cdv_api.models import HashImportacaoLegacy
+
+ORIGEM = "legacy"
+DESTINO = "default"
+
+# Ordem segura por dependência
+MODELOS_BASE = [
+    ("cdv_api", "Estacao"),
+    ("cdv_api", "BaselineCDV"),
+    ("cdv_api", "Transmissor"),
+    ("cdv_api", "Receptor"),
+]
+
+MODELOS_AUTH = [
+    ("auth", "Group"),
+    ("auth", "User"),
+]
+
+
+def rotulo(Model):
+    return f"{Model._meta.app_label}.{Model.__name__}"
+
+
+def modelos_importacao(incluir_auth=False):
+    modelos = (MODELOS_AUTH if incluir_auth else []) + MODELOS_BASE
+    return [apps.get_model(app_label, model_name) for app_label, model_name in modelos]
+
+
+def campos_copiados(Model):
+    """
+    Campos concretos presentes na tabela do banco legado (attname).
+
+    Campos não editáveis ficam de fora: os derivados (relacao_pct, data_coleta),
+    que bancos legados antigos nem têm, são recalculados na importação; os
+    controlados pelo destino (geracao_dados, auto_now) não são dados do legado.
+    """
+    with connections[ORIGEM].cursor() as cursor:
+        colunas = {
+            c.name for c in connections[ORIGEM].introspection.get_table_description(cursor, Model._meta.db_table)
+        }
+    return [
+        f.attname for f in Model._meta.concrete_fields
+        if f.column in colunas and (f.editable or f.primary_key)
+    ]
+
+
+def _instanciar(Model, valores):
+    obj = Model(**valores)
+    if hasattr(obj, "preencher_campos_derivados"):
+        obj.preencher_campos_derivados()
+    return obj
+
+
+def ler_lotes(Model, campos, apos_pk=None, lote=2000):
+    """
+    Lê o modelo do banco legado em ordem de PK, em lotes de `lote` instâncias,
+    sem carregar a tabela inteira (iterator com chunk_size).
+    """
+    consulta = Model._default_manager.using(ORIGEM).order_by("pk")
+    if apos_pk is not None:
+        consulta = consulta.filter(pk__gt=apos_pk)
+
+    objetos = []
+    for valores in consulta.values(*campos).iterator(chunk_size=lote):
+        objetos.append(_instanciar(Model, valores))
+
+        if len(objetos) >= lote:
+            yield objetos
+            objetos = []
+
+    if objetos:
+        yield objetos
+
+
+def gravar_lote(Model, objetos):
+    """Upsert do lote por PK (INSERT ... ON CONFLICT DO UPDATE) em uma única instrução."""
+    pk = Model._meta.pk
+    campos_atualizacao = [
+        f.name for f in Model._meta.concrete_fields
+        if not f.primary_key and f.name != "geracao_dados" and not getattr(f, "auto_now_add", False)
+    ]
+    Model._default_manager.using(DESTINO).bulk_create(
+        objetos,
+        batch_size=len(objetos),
+        update_conflicts=True,
+        unique_fields=[pk.name],
+        update_fields=campos_atualizacao,
+    )
+
+
+def resetar_sequencias(modelos):
+    """Alinha as sequências de PK do destino com os IDs importados (no SQLite não há nada a fazer)."""
+    conexao = connections[DESTINO]
+    comandos = conexao.ops.sequence_reset_sql(no_style(), modelos)
+    if comandos:
+        with conexao.cursor() as cursor:
+            for sql in comandos:
+                cursor.execute(sql)
+
+
+def ler_checkpoint(caminho):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_checkpoint(caminho, checkpoint):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(checkpoint, arquivo)
+    os.replace(temporario, caminho)
+
+
+# =========================
+# SINCRONIZAÇÃO INCREMENTAL
+# =========================
+
+def hash_linha(valores):
+    """Hash estável do conteúdo de uma linha (valores na ordem de `campos`)."""
+    bruto = json.dumps(list(valores), default=str, separators=(",", ":"))
+    return hashlib.blake2b(bruto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def marca_dagua(Model):
+    return HashImportacaoLegacy.objects.filter(modelo=rotulo(Model)).aggregate(m=Max("objeto_id"))["m"]
+
+
+def sincronizar_modelo(Model, campos, lote=2000, aplicar=True, max_conflitos=20):
+    """
+    Sincroniza só as linhas novas ou alteradas de um modelo, comparando o hash
+    do conteúdo no legado com o hash gravado na última sincronização.
+
+    Para cada linha do legado:
+    - hash igual ao gravado: inalterada (nada é escrito);
+    - destino já igual ao legado: só registra o hash;
+    - sem hash gravado e PK livre no destino: inserção;
+    - com hash gravado e destino ainda igual ao que foi sincronizado: atualização;
+    - caso contrário (destino alterado/criado/apagado por fora): conflito,
+      reportado e não gravado.
+
+    Com aplicar=False (dry-run) só conta. Retorna as contagens, amostras de
+    conflitos e as estações tocadas (para TX/RX).
+    """
+    chave = rotulo(Model)
+    nome_pk = Model._meta.pk.attname
+    posicao_pk = campos.index(nome_pk)
+    tem_estacao = "estacao_id" in campos
+    limite = marca_dagua(Model)
+
+    resultado = {
+        "modelo": chave,
+        "marca_dagua": limite,
+        "lidas": 0,
+        "inalteradas": 0,
+        "insercoes": 0,
+        "atualizacoes": 0,
+        "ja_sincronizadas": 0,
+        "conflitos": 0,
+        "amostras_conflitos": [],
+        "estacao_ids": set(),
+    }
+
+    consulta = Model._default_manager.using(ORIGEM).order_by("pk").values_list(*campos)
+    linhas = []
+
+    def processar(linhas):
+        pks = [linha[posicao_pk] for linha in linhas]
+        hashes = [hash_linha(linha) for linha in linhas]
+
+        # acima da marca d'água não há hash gravado: dispensa a consulta
+        conhecidos = {}
+        if limite is not None and pks[0] <= limite:
+            conhecidos = dict(
+                HashImportacaoLegacy.objects
+                .filter(modelo=chave, objeto_id__gte=pks[0], objeto_id__lte=pks[-1])
+                .values_list("objeto_id", "hash")
+            )
+
+        candidatas = [
+            (linha, h) for linha, h in zip(linhas, hashes)
+            if conhecidos.get(linha[posicao_pk]) != h
+        ]
+        resultado["inalteradas"] += len(linhas) - len(candidatas)
+        if not candidatas:
+            return
+
+        no_destino = {
+            valores[posicao_pk]: hash_linha(valores)
+            for valores in Model._default_manager.using(DESTINO)
+            .filter(pk__in=[linha[posicao_pk] for linha, _ in candidatas])
+            .values_list(*campos)
+        }
+
+        gravar = []
+        registrar = []
+        for linha, h in candidatas:
+            pk = linha[posicao_pk]
+            anterior = conhecidos.get(pk)
+            destino = no_destino.get(pk)
+
+            if destino == h:
+                resultado["ja_sincronizadas"] += 1
+            elif anterior is None and destino is None:
+                resultado["insercoes"] += 1
+            elif anterior is not None and destino == anterior:
+                resultado["atualizacoes"] += 1
+            else:
+                resultado["conflitos"] += 1
+                if len(resultado["amostras_conflitos"]) < max_conflitos:
+                    if anterior is None:
+                        motivo = "PK já existe no destino com outro conteúdo"
+                    elif destino is None:
+                        motivo = "removido no destino"
+                    else:
+                        motivo = "alterado no legado e no destino"
+                    resultado["amostras_conflitos"].append({"pk": pk, "motivo": motivo})
+                continue
+
+            registrar.append(HashImportacaoLegacy(modelo=chave, objeto_id=pk, hash=h))
+            if destino != h:
+                gravar.append(_instanciar(Model, dict(zip(campos, linha))))
+                if tem_estacao:
+                    resultado["estacao_ids"].add(linha[campos.index("estacao_id")])
+
+        if not aplicar:
+            return
+
+        with transaction.atomic(using=DESTINO):
+            if gravar:
+                gravar_lote(Model, gravar)
+            if registrar:
+                HashImportacaoLegacy.objects.bulk_create(
+                    registrar,
+                    batch_size=len(registrar),
+                    update_conflicts=True,
+                    unique_fields=["modelo", "objeto_id"],
+                    update_fields=["hash", "sincronizado_em"],
+                )
+
+    for linha in consulta.iterator(chunk_size=lote):
+        linhas.append(linha)
+        if len(linhas) >= lote:
+            processar(linhas)
+            resultado["lidas"] += len(linhas)
+            linhas = []
+
+    if linhas:
+        processar(linhas)
+        resultado["lidas"] += len(linhas)
+
+    return resultado
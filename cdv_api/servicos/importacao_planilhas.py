@@ -0,0 +1,354 @@
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from openpyxl import load_workbook
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.servicos.cache_dashboard import marcar_estacoes_alteradas
+from cdv_api.servicos.leituras_atuais import reconstruir_leituras_atuais
+from cdv_api.utils import _norm_manutencao
+
+FORMATOS = (".csv", ".xlsx", ".parquet")
+
+# coluna interna -> nomes aceitos no cabeçalho (já normalizados)
+COLUNAS = {
+    "estacao": ("estacao", "nome_estacao"),
+    "num_circuito": ("num_circuito", "circuito"),
+    "num_transmissor": ("num_transmissor", "transmissor", "tx"),
+    "num_receptor": ("num_receptor", "receptor", "rx"),
+    "data": ("data_manutencao", "data", "data_coleta"),
+    "horario_coleta": ("horario_coleta", "horario", "hora"),
+    "vout": ("vout",),
+    "pout": ("pout",),
+    "tap": ("tap",),
+    "tipo_transmissor": ("tipo_transmissor", "tipo_tx"),
+    "iav": ("iav",),
+    "ith": ("ith",),
+    "relacao": ("relacao", "relacao_pct"),
+    "temp_celsius": ("temp_celsius", "temperatura", "temperatura_local"),
+    "tipo_manutencao": ("tipo_manutencao", "manutencao"),
+}
+OBRIGATORIAS = ("estacao", "num_circuito", "data")
+
+
+def normalizar_nome(valor):
+    """'Relação (%)' -> 'relacao', 'Chácara Klabin' -> 'chacara_klabin'."""
+    texto = unicodedata.normalize("NFKD", str(valor)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+
+# =========================
+# LEITURA
+# =========================
+
+def _ler_csv(arquivo):
+    amostra = arquivo.read(4096)
+    if isinstance(amostra, bytes):
+        amostra = amostra.decode("utf-8-sig", errors="ignore")
+    arquivo.seek(0)
+    separador = ";" if amostra.count(";") > amostra.count(",") else ","
+    return pd.read_csv(arquivo, sep=separador, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+
+def _ler_xlsx(arquivo):
+    # read-only: as linhas são lidas em streaming, sem montar a planilha inteira
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return pd.DataFrame()
+        return pd.DataFrame.from_records(list(linhas), columns=[c if c is not None else "" for c in cabecalho])
+    finally:
+        wb.close()
+
+
+def _ler_parquet(arquivo):
+    try:
+        return pd.read_parquet(arquivo)
+    except ImportError:
+        raise ValueError("Leitura de Parquet requer o pacote pyarrow (pip install pyarrow).")
+
+
+def ler_planilha(arquivo, nome):
+    """Lê CSV (separador ; ou , detectado), XLSX (primeira aba) ou Parquet num DataFrame."""
+    extensao = os.path.splitext(nome)[1].lower()
+    leitores = {".csv": _ler_csv, ".xlsx": _ler_xlsx, ".parquet": _ler_parquet}
+    if extensao not in leitores:
+        raise ValueError(f"Formato não suportado: {extensao or nome}. Use {', '.join(FORMATOS)}.")
+    return leitores[extensao](arquivo)
+
+
+# =========================
+# NORMALIZAÇÃO (vetorizada)
+# =========================
+
+def _texto(serie):
+    return serie.where(serie.notna(), "").astype(str).str.strip().replace({"nan": "", "None": "", "NaT": ""})
+
+
+def _numero(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texto = _texto(serie).str.replace("%", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def _datas(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.tz_localize(None) if serie.dt.tz is not None else serie
+    texto = _texto(serie)
+    datas = pd.to_datetime(texto, format="ISO8601", errors="coerce")
+    for formato in ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y"):
+        faltando = datas.isna() & (texto != "")
+        if not faltando.any():
+            break
+        datas[faltando] = pd.to_datetime(texto[faltando], format=formato, errors="coerce")
+    return datas
+
+
+def _horarios(serie):
+    texto = _texto(serie)
+    # "08:30" -> "08:30:00"; objetos time do Excel já vêm como "08:30:00"
+    texto = texto.where(texto.str.len() != 5, texto + ":00")
+    return pd.to_timedelta(texto.where(texto != "", None), errors="coerce")
+
+
+def _renomear_colunas(df):
+    por_nome = {}
+    for interna, aceitos in COLUNAS.items():
+        for aceito in aceitos:
+            por_nome.setdefault(aceito, interna)
+
+    renomear = {}
+    for coluna in df.columns:
+        interna = por_nome.get(normalizar_nome(coluna))
+        if interna and interna not in renomear.values():
+            renomear[coluna] = interna
+
+    df = df[list(renomear)].rename(columns=renomear)
+
+    faltando = [c for c in OBRIGATORIAS if c not in df.columns]
+    if "num_transmissor" not in df.columns and "num_receptor" not in df.columns:
+        faltando.append("num_transmissor ou num_receptor")
+    if faltando:
+        raise ValueError(f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}.")
+
+    for coluna in COLUNAS:
+        if coluna not in df.columns:
+            df[coluna] = None
+    return df
+
+
+def preparar_leituras(df):
+    """
+    Valida e normaliza a planilha de uma vez (por coluna, não por linha).
+
+    Cada linha pode ter um TX, um RX ou os dois. Retorna (tx, rx, rejeicoes):
+    DataFrames prontos para gravação e a lista {linha, tipo, motivo} do que
+    ficou de fora (linha = número da linha no arquivo, contando o cabeçalho).
+    """
+    df = _renomear_colunas(df.reset_index(drop=True))
+    linha = pd.Series(df.index + 2, index=df.index)
+    motivo = pd.Series("", index=df.index)
+
+    def rejeitar(mascara, texto):
+        mascara = mascara & (motivo == "")
+        motivo[mascara] = texto if isinstance(texto, str) else texto[mascara]
+
+    # estação por nome normalizado (acentos, caixa e hífens não importam)
+    estacoes = {normalizar_nome(nome): id_ for id_, nome in Estacao.objects.values_list("id", "nome")}
+    nome_estacao = _texto(df["estacao"])
+    estacao_id = nome_estacao.map(lambda n: estacoes.get(normalizar_nome(n)) if n else None)
+    rejeitar(nome_estacao == "", "estação ausente")
+    rejeitar(estacao_id.isna(), "estação desconhecida: " + nome_estacao)
+
+    circuito = _texto(df["num_circuito"])
+    rejeitar(circuito == "", "circuito ausente")
+
+    datas = _datas(df["data"])
+    horarios = _horarios(df["horario_coleta"])
+    rejeitar(datas.isna(), "data inválida")
+
+    # com horário informado, o momento da coleta é dia + horário
+    momento = datas.where(horarios.isna(), datas.dt.normalize() + horarios)
+    momento = momento.dt.tz_localize(settings.TIME_ZONE, ambiguous="NaT", nonexistent="shift_forward")
+    rejeitar(horarios.isna() & (_texto(df["horario_coleta"]) != ""), "horário inválido")
+    rejeitar(momento.isna(), "horário inexistente no fuso local")
+
+    # números de TX/RX vindos do Excel como 1.0 -> "1"
+    num_tx = _texto(df["num_transmissor"]).str.replace(r"\.0$", "", regex=True)
+    num_rx = _texto(df["num_receptor"]).str.replace(r"\.0$", "", regex=True)
+    rejeitar((num_tx == "") & (num_rx == ""), "linha sem TX nem RX")
+
+    tipo_manutencao = _texto(df["tipo_manutencao"])
+    tipo_manutencao = tipo_manutencao.map({v: _norm_manutencao(v) for v in tipo_manutencao.unique()})
+
+    base = pd.DataFrame({
+        "linha": linha,
+        "estacao_id": estacao_id,
+        "num_circuito": circuito,
+        "data_manutencao": momento,
+        "horario_coleta": horarios,
+        "temp_celsius": _numero(df["temp_celsius"]),
+        "tipo_manutencao": tipo_manutencao,
+    })
+
+    validas = motivo == ""
+    base = base[validas].astype({"estacao_id": "int64"})
+    rejeicoes = [
+        {"linha": int(l), "tipo": "linha", "motivo": m}
+        for l, m in zip(linha[~validas], motivo[~validas])
+    ]
+
+    # colunas de TX e RX montadas para todas as linhas; o join mantém só as válidas
+    tx = base.join(pd.DataFrame({
+        "num_transmissor": num_tx,
+        "vout": _numero(df["vout"]),
+        "pout": _numero(df["pout"]),
+        "tap": _texto(df["tap"]).str.replace(r"\.0$", "", regex=True),
+        "tipo_transmissor": _texto(df["tipo_transmissor"]),
+    }), how="inner")
+    tx = tx[tx["num_transmissor"] != ""]
+
+    # relação como no formulário: ITH/IAV quando houver, senão a coluna de relação
+    iav = _numero(df["iav"])
+    ith = _numero(df["ith"])
+    relacao = (ith / iav * 100).where((iav != 0) & iav.notna() & ith.notna(), _numero(df["relacao"]))
+    rx = base.join(pd.DataFrame({
+        "num_receptor": num_rx,
+        "iav": iav,
+        "ith": ith,
+        "relacao_pct": relacao.round(2),
+    }), how="inner")
+    rx = rx[rx["num_receptor"] != ""]
+    sem_relacao = rx["relacao_pct"].isna()
+    rejeicoes += [{"linha": int(l), "tipo": "RX", "motivo": "relação ausente (IAV/ITH ou relação)"} for l in rx.loc[sem_relacao, "linha"]]
+    rx = rx[~sem_relacao]
+
+    tx, rejeitadas_tx = _remover_duplicadas(tx, Transmissor, "num_transmissor")
+    rx, rejeitadas_rx = _remover_duplicadas(rx, Receptor, "num_receptor")
+    rejeicoes += [{"linha": int(l), "tipo": "TX", "motivo": m} for l, m in rejeitadas_tx]
+    rejeicoes += [{"linha": int(l), "tipo": "RX", "motivo": m} for l, m in rejeitadas_rx]
+
+    rejeicoes.sort(key=lambda r: r["linha"])
+    return tx, rx, rejeicoes
+
+
+def _remover_duplicadas(df, model, campo_num):
+    """Tira repetições dentro do arquivo e leituras que já estão no banco (reimportação segura)."""
+    chave = ["estacao_id", "num_circuito", campo_num, "data_manutencao"]
+    if df.empty:
+        return df, []
+
+    # a mesma leitura repetida em várias linhas (ex.: TX ao lado de cada RX) vale
+    # uma vez; só é rejeitada a repetição com valores diferentes da primeira
+    valores = [c for c in df.columns if c != "linha"]
+    identicas = df.duplicated(valores)
+    df = df[~identicas]
+    repetidas = df.duplicated(chave)
+    rejeitadas = [(l, "duplicada no arquivo com outros valores") for l in df.loc[repetidas, "linha"]]
+    df = df[~repetidas]
+
+    existentes = pd.DataFrame.from_records(
+        model.objects.filter(
+            estacao_id__in=df["estacao_id"].unique().tolist(),
+            data_manutencao__range=(df["data_manutencao"].min(), df["data_manutencao"].max()),
+        ).values_list(*chave),
+        columns=chave,
+    )
+    if existentes.empty:
+        return df, rejeitadas
+
+    existentes["data_manutencao"] = pd.to_datetime(existentes["data_manutencao"], utc=True).astype("datetime64[ns, UTC]")
+    chaves_df = df[chave].assign(data_manutencao=df["data_manutencao"].dt.tz_convert("UTC").astype("datetime64[ns, UTC]"))
+    no_banco = chaves_df.merge(existentes.drop_duplicates(), on=chave, how="left", indicator=True)["_merge"].eq("both").to_numpy()
+
+    rejeitadas += [(l, "já existe no banco") for l in df.loc[no_banco, "linha"]]
+    return df[~no_banco], rejeitadas
+
+
+# =========================
+# GRAVAÇÃO
+# =========================
+
+def _opcional(valor):
+    return None if pd.isna(valor) else valor
+
+
+def _objetos(model, df):
+    momentos = df["data_manutencao"].dt.tz_convert(settings.TIME_ZONE)
+    datas_coleta = momentos.dt.date.to_numpy()
+    horarios = np.where(df["horario_coleta"].notna(), momentos.dt.time, None)
+    instantes = [momento.to_pydatetime() for momento in momentos]
+
+    comuns = zip(
+        df["estacao_id"].tolist(), df["num_circuito"], instantes, horarios, datas_coleta,
+        df["temp_celsius"], df["tipo_manutencao"],
+    )
+
+    if model is Transmissor:
+        for (estacao_id, circuito, momento, hora, dia, temp, tipo), num, vout, pout, tap, tipo_tx in zip(
+            comuns, df["num_transmissor"], df["vout"], df["pout"], df["tap"], df["tipo_transmissor"]
+        ):
+            yield Transmissor(
+                estacao_id=estacao_id, num_circuito=circuito, num_transmissor=num,
+                vout=_opcional(vout), pout=_opcional(pout), tap=tap, tipo_transmissor=tipo_tx,
+                data_manutencao=momento, horario_coleta=hora, data_coleta=dia,
+                temp_celsius=_opcional(temp), tipo_manutencao=tipo,
+            )
+    else:
+        for (estacao_id, circuito, momento, hora, dia, temp, tipo), num, iav, ith, relacao in zip(
+            comuns, df["num_receptor"], df["iav"], df["ith"], df["relacao_pct"]
+        ):
+            yield Receptor(
+                estacao_id=estacao_id, num_circuito=circuito, num_receptor=num,
+                iav=_opcional(iav), ith=_opcional(ith),
+                relacao=f"{relacao:.2f}%", relacao_pct=float(relacao),
+                data_manutencao=momento, horario_coleta=hora, data_coleta=dia,
+                temp_celsius=_opcional(temp), tipo_manutencao=tipo,
+            )
+
+
+def _gravar(model, df, lote):
+    objetos = []
+    for obj in _objetos(model, df):
+        objetos.append(obj)
+        if len(objetos) >= lote:
+            with transaction.atomic():
+                model.objects.bulk_create(objetos)
+            objetos = []
+    if objetos:
+        with transaction.atomic():
+            model.objects.bulk_create(objetos)
+
+
+def importar_planilha(arquivo, nome, lote=5000, aplicar=True):
+    """
+    Importa leituras históricas de uma planilha: lê, valida em lote e grava
+    com bulk_create em transações de `lote` linhas. No fim, reconstrói as
+    leituras atuais das estações tocadas. Com aplicar=False só valida.
+    """
+    tx, rx, rejeicoes = preparar_leituras(ler_planilha(arquivo, nome))
+
+    if aplicar:
+        _gravar(Transmissor, tx, lote)
+        _gravar(Receptor, rx, lote)
+
+        estacao_ids = sorted({int(i) for i in pd.concat([tx["estacao_id"], rx["estacao_id"]]).unique()})
+        if estacao_ids:
+            with transaction.atomic():
+                reconstruir_leituras_atuais(Transmissor, estacao_ids)
+                reconstruir_leituras_atuais(Receptor, estacao_ids)
+                marcar_estacoes_alteradas(estacao_ids)
+
+    return {
+        "transmissores": len(tx),
+        "receptores": len(rx),
+        "rejeicoes": rejeicoes,
+    }
@@ -0,0 +1,145 @@
+import datetime
+import logging
+
+from django.utils import timezone
+
+from cdv_api.models import Transmissor, Receptor
+from cdv_api.servicos.cache_dashboard import marcar_estacoes_alteradas
+from cdv_api.servicos.leituras_atuais import atualizar_leituras_atuais
+from cdv_api.utils import safe_float, _norm_manutencao, _pick_temp, relacao_para_float
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_ATUALIZACAO_TX = ["vout", "pout", "tap", "tipo_transmissor", "tipo_manutencao", "temp_celsius"]
+CAMPOS_ATUALIZACAO_RX = ["iav", "ith", "relacao", "relacao_pct", "tipo_manutencao", "temp_celsius"]
+
+
+def _texto(valor):
+    return str(valor) if valor is not None else None
+
+
+def _hora_coleta(model, valor):
+    if valor is None:
+        return None
+    return model._meta.get_field("horario_coleta").to_python(valor)
+
+
+def _preencher_tx(obj, tx, temp):
+    if temp is not None:
+        obj.temp_celsius = temp
+    obj.vout = safe_float(tx.get("vout"))
+    obj.pout = safe_float(tx.get("pout"))
+    obj.tap = tx.get("tap")
+    obj.tipo_transmissor = tx.get("tipo_transmissor")
+    obj.tipo_manutencao = _norm_manutencao(tx.get("tipo_manutencao"))
+
+
+def _preencher_rx(obj, rx, temp):
+    iav = safe_float(rx.get("iav"))
+    ith = safe_float(rx.get("ith"))
+
+    if iav and ith and iav != 0:
+        rel_str = f"{(ith / iav) * 100:.2f}%"
+    else:
+        rel = safe_float(rx.get("relacao"))
+        rel_str = f"{rel:.2f}%" if rel is not None else None
+
+    if temp is not None:
+        obj.temp_celsius = temp
+    obj.iav = iav
+    obj.ith = ith
+    obj.relacao = rel_str
+    obj.relacao_pct = relacao_para_float(rel_str)
+    obj.tipo_manutencao = _norm_manutencao(rx.get("tipo_manutencao"))
+
+
+def _upsert_do_dia(model, campo_num, estacao, dia, itens, preencher, campos_atualizacao, momento_coleta=None):
+    """
+    Grava os itens do payload em lote.
+
+    Busca uma única vez os registros do dia da estação, casa em memória por
+    (circuito, número do TX/RX, horário da coleta) e grava com bulk_create /
+    bulk_update. Itens repetidos no mesmo payload atualizam o mesmo registro,
+    como acontecia no fluxo linha a linha. A leitura atual de cada TX/RX
+    tocado é atualizada em seguida, na mesma transação.
+    """
+    existentes = {}
+    for obj in model.objects.filter(estacao=estacao, data_coleta=dia).order_by("id"):
+        chave = (obj.num_circuito, getattr(obj, campo_num), obj.horario_coleta)
+        existentes[chave] = obj
+
+    novos = []
+    alterados = {}
+
+    for item in itens:
+        num_circ = _texto(item.get("num_circuito"))
+        num = _texto(item.get(campo_num))
+        hora = _hora_coleta(model, item.get("horario_coleta"))
+        temp = _pick_temp(item)
+
+        chave = (num_circ, num, hora)
+        obj = existentes.get(chave)
+
+        if obj is None:
+            obj = model(estacao=estacao, num_circuito=num_circ, horario_coleta=hora)
+            setattr(obj, campo_num, num)
+            if momento_coleta is not None:
+                obj.data_manutencao = momento_coleta(hora)
+            existentes[chave] = obj
+            novos.append(obj)
+        elif obj.pk is not None:
+            alterados[obj.pk] = obj
+
+        preencher(obj, item, temp)
+
+    if novos:
+        for obj in novos:
+            obj.preencher_campos_derivados()
+        model.objects.bulk_create(novos)
+    alterados = list(alterados.values())
+    if alterados:
+        model.objects.bulk_update(alterados, campos_atualizacao)
+
+    atualizar_leituras_atuais(model, estacao, novos + alterados)
+
+    return len(novos), len(alterados)
+
+
+def salvar_coleta_estacao(estacao, transmissores_data, receptores_data, dia=None):
+    """
+    Grava uma coleta (TX + RX) de uma estação com número constante de queries.
+
+    `dia` permite gravar coletas de dias anteriores (sincronização offline);
+    nesse caso data_manutencao dos novos registros vira dia + horário da coleta.
+    Deve ser chamada dentro de transaction.atomic().
+    """
+    hoje = timezone.localdate()
+    dia = dia or hoje
+
+    momento_coleta = None
+    if dia != hoje:
+        def momento_coleta(hora):
+            return timezone.make_aware(datetime.datetime.combine(dia, hora or datetime.time.min))
+
+    tx_criados, tx_atualizados = _upsert_do_dia(
+        Transmissor, "num_transmissor", estacao, dia,
+        transmissores_data, _preencher_tx, CAMPOS_ATUALIZACAO_TX, momento_coleta,
+    )
+    rx_criados, rx_atualizados = _upsert_do_dia(
+        Receptor, "num_receptor", estacao, dia,
+        receptores_data, _preencher_rx, CAMPOS_ATUALIZACAO_RX, momento_coleta,
+    )
+
+    marcar_estacoes_alteradas([estacao.id])
+
+    logger.info(
+        "[COLETA] Estação=%s TX criados=%s atualizados=%s RX criados=%s atualizados=%s",
+        estacao.nome, tx_criados, tx_atualizados, rx_criados, rx_atualizados,
+    )
+
+    return {
+        "tx_criados": tx_criados,
+        "tx_atualizados": tx_atualizados,
+        "rx_criados": rx_criados,
+        "rx_atualizados": rx_atualizados,
+    }
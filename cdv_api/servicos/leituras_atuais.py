@@ -0,0 +1,146 @@
+import datetime
+
+from django.utils import timezone
+
+from cdv_api.models import (
+    Transmissor,
+    Receptor,
+    LeituraAtualTransmissor,
+    LeituraAtualReceptor,
+)
+from cdv_api.servicos.consultas import ORDEM_MAIS_RECENTE, ultimas_por_grupo
+
+TAMANHO_LOTE = 2000
+
+# modelo de histórico -> (modelo de leitura atual, campo do número do TX/RX, FK para o histórico)
+LEITURAS_ATUAIS = {
+    Transmissor: (LeituraAtualTransmissor, "num_transmissor", "transmissor"),
+    Receptor: (LeituraAtualReceptor, "num_receptor", "receptor"),
+}
+
+
+def _ordem(data_manutencao, horario_coleta, pk):
+    return (data_manutencao, horario_coleta or datetime.time.min, pk)
+
+
+def _apontar(atual, campo_fk, obj, agora):
+    setattr(atual, f"{campo_fk}_id", obj.pk)
+    atual.data_manutencao = obj.data_manutencao
+    atual.horario_coleta = obj.horario_coleta
+    atual.atualizado_em = agora
+
+
+def atualizar_leituras_atuais(model, estacao, objetos):
+    """
+    Atualiza a leitura atual de cada (circuito, TX/RX) tocado por uma gravação.
+
+    Uma leitura da estação + bulk_create/bulk_update, independente do tamanho
+    do lote. Deve rodar na mesma transação que gravou os objetos.
+    """
+    model_atual, campo_num, campo_fk = LEITURAS_ATUAIS[model]
+    objetos = [obj for obj in objetos if obj.pk is not None]
+    if not objetos:
+        return
+
+    atuais = {
+        (a.num_circuito, getattr(a, campo_num)): a
+        for a in model_atual.objects.filter(estacao=estacao)
+    }
+
+    agora = timezone.now()
+    novos = []
+    alterados = {}
+
+    for obj in objetos:
+        chave = (obj.num_circuito, getattr(obj, campo_num))
+        atual = atuais.get(chave)
+
+        if atual is None:
+            atual = model_atual(estacao=estacao, num_circuito=chave[0])
+            setattr(atual, campo_num, chave[1])
+            atuais[chave] = atual
+            novos.append(atual)
+        elif (
+            getattr(atual, f"{campo_fk}_id") != obj.pk
+            and _ordem(atual.data_manutencao, atual.horario_coleta, getattr(atual, f"{campo_fk}_id"))
+            > _ordem(obj.data_manutencao, obj.horario_coleta, obj.pk)
+        ):
+            continue
+        elif atual.pk is not None:
+            alterados[atual.pk] = atual
+
+        _apontar(atual, campo_fk, obj, agora)
+
+    if novos:
+        model_atual.objects.bulk_create(novos)
+    if alterados:
+        model_atual.objects.bulk_update(
+            list(alterados.values()),
+            [campo_fk, "data_manutencao", "horario_coleta", "atualizado_em"],
+        )
+
+
+def recalcular_leitura_atual(model, estacao_id, num_circuito, num):
+    """Recalcula uma única chave a partir do histórico (edições/remoções pelo admin)."""
+    model_atual, campo_num, campo_fk = LEITURAS_ATUAIS[model]
+    filtro = {"estacao_id": estacao_id, "num_circuito": num_circuito, campo_num: num}
+
+    ultimo = model.objects.filter(**filtro).order_by(*ORDEM_MAIS_RECENTE).first()
+    if ultimo is None:
+        model_atual.objects.filter(**filtro).delete()
+        return None
+
+    atual, _ = model_atual.objects.update_or_create(
+        **filtro,
+        defaults={
+            campo_fk: ultimo,
+            "data_manutencao": ultimo.data_manutencao,
+            "horario_coleta": ultimo.horario_coleta,
+        },
+    )
+    return atual
+
+
+def reconstruir_leituras_atuais(model, estacao_ids=None):
+    """Reconstrói a tabela de leituras atuais de um modelo a partir do histórico completo."""
+    model_atual, campo_num, campo_fk = LEITURAS_ATUAIS[model]
+
+    historico = model.objects.all()
+    atuais_existentes = model_atual.objects.all()
+    if estacao_ids:
+        historico = historico.filter(estacao_id__in=estacao_ids)
+        atuais_existentes = atuais_existentes.filter(estacao_id__in=estacao_ids)
+
+    atuais_existentes.delete()
+
+    # uma linha por (estação, circuito, TX/RX): o histórico não sai inteiro do banco
+    linhas = (
+        ultimas_por_grupo(historico, ["estacao_id", "num_circuito", campo_num], 1)
+        .values_list("id", "estacao_id", "num_circuito", campo_num, "data_manutencao", "horario_coleta")
+        .iterator(chunk_size=TAMANHO_LOTE)
+    )
+
+    agora = timezone.now()
+    lote = []
+    total = 0
+
+    for pk, estacao_id, num_circuito, num, data_manutencao, horario_coleta in linhas:
+        lote.append(model_atual(
+            estacao_id=estacao_id,
+            num_circuito=num_circuito,
+            **{campo_num: num, f"{campo_fk}_id": pk},
+            data_manutencao=data_manutencao,
+            horario_coleta=horario_coleta,
+            atualizado_em=agora,
+        ))
+
+        if len(lote) >= TAMANHO_LOTE:
+            model_atual.objects.bulk_create(lote)
+            total += len(lote)
+            lote = []
+
+    if lote:
+        model_atual.objects.bulk_create(lote)
+        total += len(lote)
+
+    return total
@@ -0,0 +1,232 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+
+# nome -> (ajuda, limites dos buckets)
+HISTOGRAMAS = {
+    "cdv_requisicao_duracao_segundos": (
+        "Tempo de parede da requisição por view.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    ),
+    "cdv_requisicao_consultas_sql": (
+        "Consultas SQL executadas por requisição.",
+        (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+    ),
+    "cdv_requisicao_sql_segundos": (
+        "Tempo total gasto no banco por requisição.",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    "cdv_resposta_bytes": (
+        "Tamanho do corpo da resposta (quando conhecido).",
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    ),
+}
+
+# snapshots de processos encerrados são somados aqui (ver compactar_snapshots)
+ARQUIVO_TOTAIS = "totais.json"
+ARQUIVO_TRAVA = "compactacao.lock"
+TRAVA_EXPIRADA_SEGUNDOS = 60
+
+_trava = threading.Lock()
+# (métrica, view) -> [contagem por bucket..., +Inf, soma]
+_local = {}
+_ultima_gravacao = 0.0
+_processo = None
+
+
+def _observar(metrica, view, valor):
+    limites = HISTOGRAMAS[metrica][1]
+    serie = _local.get((metrica, view))
+    if serie is None:
+        serie = _local[(metrica, view)] = [0] * (len(limites) + 1) + [0.0]
+    serie[bisect_left(limites, valor)] += 1
+    serie[-1] += valor
+
+
+def registrar_requisicao(view, duracao, consultas, tempo_sql, tamanho=None):
+    """Acumula as medidas de uma requisição nos histogramas deste processo."""
+    with _trava:
+        _observar("cdv_requisicao_duracao_segundos", view, duracao)
+        _observar("cdv_requisicao_consultas_sql", view, consultas)
+        _observar("cdv_requisicao_sql_segundos", view, tempo_sql)
+        if tamanho is not None:
+            _observar("cdv_resposta_bytes", view, tamanho)
+    gravar_snapshot()
+
+
+def _arquivo_processo():
+    # pid + uuid: um PID reaproveitado pelo sistema não sobrescreve o snapshot
+    # de um worker antigo (o uuid é refeito depois de um fork)
+    global _processo
+    pid = os.getpid()
+    if _processo is None or _processo[0] != pid:
+        _processo = (pid, uuid.uuid4().hex)
+    return os.path.join(settings.METRICAS_DIR, f"{pid}-{_processo[1]}.json")
+
+
+def _gravar_json(caminho, dados):
+    descritor, temporario = tempfile.mkstemp(dir=settings.METRICAS_DIR, suffix=".tmp")
+    with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, caminho)
+
+
+def gravar_snapshot(forcar=False):
+    """
+    Grava os histogramas deste processo em METRICAS_DIR/<pid>.json.
+
+    Cada worker do gunicorn só escreve o próprio arquivo (troca atômica com
+    os.replace), no máximo a cada METRICAS_INTERVALO segundos.
+    """
+    global _ultima_gravacao
+
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_gravacao < settings.METRICAS_INTERVALO:
+        return
+
+    with _trava:
+        _ultima_gravacao = agora
+        dados = [[metrica, view, serie] for (metrica, view), serie in _local.items()]
+
+    os.makedirs(settings.METRICAS_DIR, exist_ok=True)
+    _gravar_json(_arquivo_processo(), dados)
+
+
+def _ler_snapshot(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return []
+
+
+def _somar(total, dados):
+    for metrica, view, serie in dados:
+        if metrica not in HISTOGRAMAS or len(serie) != len(HISTOGRAMAS[metrica][1]) + 2:
+            continue
+        acumulado = total.get((metrica, view))
+        if acumulado is None:
+            total[(metrica, view)] = list(serie)
+        else:
+            total[(metrica, view)] = [a + b for a, b in zip(acumulado, serie)]
+    return total
+
+
+def _pid_do_snapshot(nome):
+    # "<pid>-<uuid>.json" (ou "<pid>.json" de versões anteriores)
+    prefixo = nome[:-len(".json")].split("-", 1)[0]
+    return int(prefixo) if nome.endswith(".json") and prefixo.isdigit() else None
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def compactar_snapshots():
+    """
+    Soma os snapshots de processos já encerrados em totais.json e apaga os
+    arquivos deles, para METRICAS_DIR não crescer a cada reciclagem de worker.
+
+    Só em POSIX (os.kill(pid, 0) para saber se o processo existe) e com uma
+    trava em arquivo: se outro processo já está compactando, não faz nada.
+    Retorna quantos snapshots foram compactados.
+    """
+    diretorio = settings.METRICAS_DIR
+    if os.name != "posix" or not os.path.isdir(diretorio):
+        return 0
+
+    encerrados = [
+        nome for nome in os.listdir(diretorio)
+        if (pid := _pid_do_snapshot(nome)) is not None and pid != os.getpid() and not _processo_vivo(pid)
+    ]
+    if not encerrados:
+        return 0
+
+    trava = os.path.join(diretorio, ARQUIVO_TRAVA)
+    try:
+        descritor = os.open(trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # trava de um processo que morreu no meio da compactação
+        try:
+            if time.time() - os.path.getmtime(trava) > TRAVA_EXPIRADA_SEGUNDOS:
+                os.remove(trava)
+        except OSError:
+            pass
+        return 0
+
+    try:
+        caminho_totais = os.path.join(diretorio, ARQUIVO_TOTAIS)
+        total = _somar({}, _ler_snapshot(caminho_totais))
+        for nome in encerrados:
+            _somar(total, _ler_snapshot(os.path.join(diretorio, nome)))
+
+        _gravar_json(caminho_totais, [[metrica, view, serie] for (metrica, view), serie in total.items()])
+        for nome in encerrados:
+            os.remove(os.path.join(diretorio, nome))
+    finally:
+        os.close(descritor)
+        os.remove(trava)
+
+    return len(encerrados)
+
+
+def agregar():
+    """Soma os snapshots de todos os processos (os encerrados já compactados em totais.json)."""
+    total = {}
+    if not os.path.isdir(settings.METRICAS_DIR):
+        return total
+
+    compactar_snapshots()
+
+    for nome in os.listdir(settings.METRICAS_DIR):
+        if nome.endswith(".json"):
+            _somar(total, _ler_snapshot(os.path.join(settings.METRICAS_DIR, nome)))
+
+    return total
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def formatar_prometheus(total):
+    """Formato texto de exposição do Prometheus (histogramas cumulativos)."""
+    linhas = []
+    for metrica, (ajuda, limites) in HISTOGRAMAS.items():
+        linhas.append(f"# HELP {metrica} {ajuda}")
+        linhas.append(f"# TYPE {metrica} histogram")
+
+        for (nome, view), serie in sorted(total.items()):
+            if nome != metrica:
+                continue
+            view = _rotulo(view)
+            acumulado = 0
+            for limite, contagem in zip((*limites, "+Inf"), serie[:-1]):
+                acumulado += contagem
+                linhas.append(f'{metrica}_bucket{{view="{view}",le="{limite}"}} {acumulado}')
+            linhas.append(f'{metrica}_sum{{view="{view}"}} {serie[-1]:.6f}')
+            linhas.append(f'{metrica}_count{{view="{view}"}} {acumulado}')
+
+    return "\n".join(linhas) + "\n"
+
+
+def limpar_metricas():
+    """Zera os histogramas deste processo e apaga os snapshots gravados."""
+    with _trava:
+        _local.clear()
+    if os.path.isdir(settings.METRICAS_DIR):
+        for nome in os.listdir(settings.METRICAS_DIR):
+            if nome.endswith(".json"):
+                os.remove(os.path.join(settings.METRICAS_DIR, nome))
@@ -0,0 +1,337 @@
+import datetime
+import math
+
+from django.db import transaction
+from openpyxl import load_workbook
+
+from cdv_api.models import Estacao, Transmissor, Receptor
+from cdv_api.servicos.cache_dashboard import marcar_estacoes_alteradas
+from cdv_api.servicos.exportacao import (
+    HEADERS_RX, HEADERS_TX, TITULO_ESTACAO, TITULO_RX, TITULO_TX, _data_hora, _norm_tipo,
+)
+from cdv_api.utils import relacao_para_float, safe_int
+
+TAMANHO_LOTE = 2000
+
+
+# =========================
+# CONVERSÃO DAS CÉLULAS
+# =========================
+
+def _vazia(valor):
+    return valor is None or (isinstance(valor, str) and valor.strip() in ("", "-"))
+
+
+def _numero(valor):
+    if _vazia(valor):
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    return float(str(valor).replace(",", ".").strip())
+
+
+def _texto(valor):
+    return "" if valor is None else str(valor).strip()
+
+
+def _tap(valor):
+    numero = _numero(valor)
+    if numero is None:
+        return ""
+    if not numero.is_integer():
+        raise ValueError
+    return str(int(numero))
+
+
+def _relacao(valor):
+    # a exportação grava a fração com formato 0.00%; texto digitado ("71,5%") já vem em %
+    if _vazia(valor):
+        return None
+    if isinstance(valor, str):
+        pct = relacao_para_float(valor)
+        if pct is None:
+            raise ValueError
+        return pct
+    return float(valor) * 100
+
+
+def _manutencao(valor):
+    tipo = _norm_tipo(_texto(valor))
+    if tipo is None:
+        raise ValueError
+    return tipo
+
+
+# campo -> (célula -> valor do banco, forma canônica para comparar com o que foi exportado)
+CAMPOS = {
+    "vout": (_numero, _numero),
+    "pout": (_numero, _numero),
+    "tap": (_tap, safe_int),
+    "tipo_transmissor": (_texto, _texto),
+    "iav": (_numero, _numero),
+    "ith": (_numero, _numero),
+    "relacao_pct": (_relacao, _numero),
+    "tipo_manutencao": (_manutencao, _texto),
+    "temp_celsius": (_numero, _numero),
+}
+
+# bloco -> (modelo, campo do número, cabeçalho, {campo editável: cabeçalho da coluna})
+BLOCOS = {
+    "TX": (Transmissor, "num_transmissor", HEADERS_TX, {
+        "vout": "VOUT", "pout": "POUT", "tap": "TAP", "tipo_transmissor": "Tipo TX",
+        "tipo_manutencao": "Tipo Manutenção", "temp_celsius": "Temp. (Celsius)",
+    }),
+    "RX": (Receptor, "num_receptor", HEADERS_RX, {
+        "iav": "IAV", "ith": "ITH", "relacao_pct": "Relação",
+        "tipo_manutencao": "Tipo Manutenção", "temp_celsius": "Temp. (Celsius)",
+    }),
+}
+
+
+def _igual(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def _data_celula(valor):
+    # a exportação grava texto; o Excel pode ter convertido para data ao editar
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.strftime("%d/%m/%Y")
+    return _texto(valor)
+
+
+def _hora_celula(valor):
+    if isinstance(valor, (datetime.time, datetime.datetime)):
+        return valor.strftime("%H:%M")
+    return _texto(valor) or "-"
+
+
+# =========================
+# LEITURA (read-only)
+# =========================
+
+def ler_abas(arquivo):
+    """
+    Percorre a pasta no layout de gerar_excel_estacao, uma aba por vez, em
+    streaming (openpyxl read-only).
+
+    Gera (aba, nome_estacao, linhas) com linhas = [(bloco, numero_linha, valores)];
+    nome_estacao é None quando a aba não começa com o cabeçalho "ESTAÇÃO:".
+    """
+    try:
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Não foi possível abrir a planilha: {e}")
+
+    try:
+        for ws in wb.worksheets:
+            nome_estacao = None
+            bloco = None
+            aguardando_cabecalho = None
+            linhas = []
+
+            for numero, valores in enumerate(ws.iter_rows(values_only=True), start=1):
+                primeira = valores[0] if valores else None
+
+                if numero == 1:
+                    if isinstance(primeira, str) and primeira.startswith(TITULO_ESTACAO):
+                        nome_estacao = primeira[len(TITULO_ESTACAO):].strip()
+                        continue
+                    break
+
+                if all(_vazia(v) for v in valores):
+                    continue
+
+                if primeira in (TITULO_TX, TITULO_RX):
+                    aguardando_cabecalho = "TX" if primeira == TITULO_TX else "RX"
+                    bloco = None
+                    continue
+
+                if aguardando_cabecalho:
+                    cabecalho = BLOCOS[aguardando_cabecalho][2]
+                    if [_texto(v) for v in valores[:len(cabecalho)]] != cabecalho:
+                        raise ValueError(
+                            f"Aba '{ws.title}', linha {numero}: cabeçalho do bloco "
+                            f"{aguardando_cabecalho} diferente do exportado."
+                        )
+                    bloco, aguardando_cabecalho = aguardando_cabecalho, None
+                    continue
+
+                if bloco:
+                    largura = len(BLOCOS[bloco][2])
+                    linhas.append((bloco, numero, tuple(valores[:largura]) + (None,) * (largura - len(valores))))
+
+            yield ws.title, nome_estacao, linhas
+    finally:
+        wb.close()
+
+
+# =========================
+# COMPARAÇÃO COM O BANCO
+# =========================
+
+def _chaves_do_banco(model, campo_num, estacao, campos, chaves, datas):
+    """
+    Leituras da estação indexadas pela mesma chave que a planilha mostra
+    (circuito, número, dd/mm/YYYY, HH:MM). Só guarda as chaves pedidas; chave
+    repetida no banco vira None (ambígua).
+    """
+    encontradas = {}
+    linhas = (
+        model.objects
+        .filter(estacao=estacao, data_coleta__range=(min(datas), max(datas)))
+        .values_list("id", "num_circuito", campo_num, "data_manutencao", "horario_coleta", *campos)
+        .iterator(chunk_size=TAMANHO_LOTE)
+    )
+    for pk, circuito, num, data_manutencao, horario_coleta, *valores in linhas:
+        chave = (circuito, safe_int(num), *_data_hora(data_manutencao, horario_coleta))
+        if chave not in chaves:
+            continue
+        encontradas[chave] = None if chave in encontradas else (pk, dict(zip(campos, valores)))
+    return encontradas
+
+
+def _comparar_bloco(aba, estacao, bloco, linhas, rejeitar, resultado, max_amostras):
+    model, campo_num, cabecalho, editaveis = BLOCOS[bloco]
+    colunas = {campo: cabecalho.index(titulo) for campo, titulo in editaveis.items()}
+    col_data = cabecalho.index("Data")
+    col_hora = cabecalho.index("Horário Coleta")
+    campos = list(editaveis) + (["relacao"] if bloco == "RX" else [])
+
+    por_chave = {}
+    datas = set()
+    for numero, valores in linhas:
+        circuito = _texto(valores[1])
+        data_txt = _data_celula(valores[col_data])
+        chave = (circuito, safe_int(valores[2]), data_txt, _hora_celula(valores[col_hora]))
+        try:
+            datas.add(datetime.datetime.strptime(data_txt, "%d/%m/%Y").date())
+        except ValueError:
+            rejeitar(aba, numero, bloco, "data fora do formato dd/mm/aaaa")
+            continue
+        if not circuito or chave[1] is None:
+            rejeitar(aba, numero, bloco, "linha sem circuito ou número")
+            continue
+        if chave in por_chave:
+            rejeitar(aba, numero, bloco, "leitura repetida na planilha")
+            continue
+        por_chave[chave] = (numero, valores)
+
+    if not por_chave:
+        return []
+
+    no_banco = _chaves_do_banco(model, campo_num, estacao, campos, por_chave, datas)
+    alterados = []
+
+    for chave, (numero, valores) in por_chave.items():
+        if chave not in no_banco:
+            rejeitar(aba, numero, bloco, "leitura não encontrada no banco")
+            continue
+        if no_banco[chave] is None:
+            rejeitar(aba, numero, bloco, "mais de uma leitura no banco com esta chave")
+            continue
+
+        pk, atuais = no_banco[chave]
+        novos = {}
+        try:
+            for campo, coluna in colunas.items():
+                ler, canonico = CAMPOS[campo]
+                valor = ler(valores[coluna])
+                if not _igual(canonico(valor), canonico(atuais[campo])):
+                    novos[campo] = valor
+        except ValueError:
+            rejeitar(aba, numero, bloco, f"valor inválido em '{cabecalho[coluna]}'")
+            continue
+
+        if bloco == "RX":
+            # IAV/ITH editados sem mexer na relação: recalcula como no formulário
+            iav = novos.get("iav", atuais["iav"])
+            ith = novos.get("ith", atuais["ith"])
+            if "relacao_pct" not in novos and ({"iav", "ith"} & novos.keys()) and iav and ith is not None:
+                novos["relacao_pct"] = round(ith / iav * 100, 2)
+            if "relacao_pct" in novos:
+                novos["relacao"] = f"{novos['relacao_pct']:.2f}%" if novos["relacao_pct"] is not None else None
+
+        if not novos:
+            resultado["inalteradas"] += 1
+            continue
+
+        if len(resultado["alteracoes"]) < max_amostras:
+            resultado["alteracoes"].append({
+                "aba": aba, "linha": numero, "tipo": bloco,
+                "campos": {campo: [atuais[campo], valor] for campo, valor in novos.items()},
+            })
+        alterados.append((model(pk=pk, estacao_id=estacao.id, **{**atuais, **novos}), novos.keys()))
+
+    return alterados
+
+
+# =========================
+# REIMPORTAÇÃO
+# =========================
+
+def reimportar_excel(arquivo, aplicar=True, max_amostras=50):
+    """
+    Reimporta uma pasta gerada por gerar_excel_estacao e editada fora do sistema.
+
+    As linhas são casadas com o banco pela chave exibida na planilha (estação,
+    circuito, TX/RX, data e horário); só os campos de medição e classificação
+    são comparados, e apenas as leituras com alguma diferença são gravadas, num
+    bulk_update por modelo dentro de uma transação. Com aplicar=False só compara.
+
+    Retorna as contagens, amostras das alterações e as rejeições
+    [{aba, linha, tipo, motivo}].
+    """
+    resultado = {
+        "abas": 0,
+        "linhas": 0,
+        "inalteradas": 0,
+        "transmissores": 0,
+        "receptores": 0,
+        "alteracoes": [],
+        "rejeicoes": [],
+    }
+
+    def rejeitar(aba, linha, tipo, motivo):
+        resultado["rejeicoes"].append({"aba": aba, "linha": linha, "tipo": tipo, "motivo": motivo})
+
+    estacoes = {e.nome: e for e in Estacao.objects.all()}
+    alterados = {"TX": [], "RX": []}
+
+    for aba, nome_estacao, linhas in ler_abas(arquivo):
+        if nome_estacao is None:
+            rejeitar(aba, 1, "aba", f"aba sem o cabeçalho '{TITULO_ESTACAO.strip()}'")
+            continue
+        estacao = estacoes.get(nome_estacao)
+        if estacao is None:
+            rejeitar(aba, 1, "aba", f"estação desconhecida: {nome_estacao}")
+            continue
+
+        resultado["abas"] += 1
+        resultado["linhas"] += len(linhas)
+        for bloco in BLOCOS:
+            do_bloco = [(numero, valores) for b, numero, valores in linhas if b == bloco]
+            alterados[bloco] += _comparar_bloco(aba, estacao, bloco, do_bloco, rejeitar, resultado, max_amostras)
+
+    resultado["transmissores"] = len(alterados["TX"])
+    resultado["receptores"] = len(alterados["RX"])
+    resultado["rejeicoes"].sort(key=lambda r: (r["aba"], r["linha"]))
+
+    if not aplicar or not (alterados["TX"] or alterados["RX"]):
+        return resultado
+
+    with transaction.atomic():
+        for bloco, itens in alterados.items():
+            if not itens:
+                continue
+            campos = sorted(set().union(*(novos for _, novos in itens)))
+            BLOCOS[bloco][0].objects.bulk_update(
+                [obj for obj, _ in itens], campos, batch_size=TAMANHO_LOTE
+            )
+
+        # chaves (datas/horários) não mudam: as leituras atuais continuam as
+        # mesmas, só os caches das estações precisam ser invalidados
+        marcar_estacoes_alteradas({obj.estacao_id for itens in alterados.values() for obj, _ in itens})
+
+    return resultado
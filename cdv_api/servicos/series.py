@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def lttb(x, y, max_pontos):
+    """
+    Largest-Triangle-Three-Buckets: escolhe até `max_pontos` índices que
+    preservam o formato da série (picos e vales), sempre com o primeiro e o último.
+
+    Divide os pontos internos em `max_pontos - 2` baldes e, em cada um, fica
+    com o ponto que forma o maior triângulo com o escolhido no balde anterior
+    e a média do balde seguinte. Retorna os índices em ordem crescente.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+
+    if max_pontos >= n or n <= 2:
+        return np.arange(n)
+    if max_pontos < 3:
+        return np.array([0, n - 1])[:max(max_pontos, 1)]
+
+    limites = np.linspace(1, n - 1, max_pontos - 1).astype(int)
+    indices = np.empty(max_pontos, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    anterior = 0
+    for i in range(max_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+
+        if i + 2 < len(limites):
+            prox_inicio, prox_fim = limites[i + 1], limites[i + 2]
+            media_x = x[prox_inicio:prox_fim].mean()
+            media_y = y[prox_inicio:prox_fim].mean()
+        else:
+            media_x, media_y = x[-1], y[-1]
+
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs(
+            (ax - media_x) * (y[inicio:fim] - ay)
+            - (ax - x[inicio:fim]) * (media_y - ay)
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+
+    return indices
@@ -0,0 +1,165 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from cdv_api.models import Estacao, ColetaSincronizada
+from cdv_api.servicos.ingestao import salvar_coleta_estacao
+
+logger = logging.getLogger(__name__)
+
+
+def _ler_linhas_ndjson(linhas):
+    """Decodifica NDJSON linha a linha, sem carregar o corpo inteiro na memória."""
+    for numero, linha in enumerate(linhas, start=1):
+        if isinstance(linha, bytes):
+            linha = linha.decode("utf-8")
+        linha = linha.strip()
+        if not linha:
+            continue
+
+        try:
+            yield numero, json.loads(linha), None
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
+
+
+def _em_blocos(iteravel, tamanho):
+    bloco = []
+    for item in iteravel:
+        bloco.append(item)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _id_cliente(item):
+    return str(item.get("id") or "").strip() if isinstance(item, dict) else ""
+
+
+def _validar_item(item, estacoes, hoje):
+    if not isinstance(item, dict):
+        raise ValueError("Item deve ser um objeto JSON.")
+
+    id_cliente = _id_cliente(item)
+    if not id_cliente:
+        raise ValueError("Item sem id.")
+
+    estacao_nome = item.get("estacao")
+    if not estacao_nome:
+        raise ValueError("Nome da estação não fornecido.")
+
+    estacao = estacoes.get(estacao_nome)
+    if estacao is None:
+        raise ValueError(f'Estação "{estacao_nome}" não encontrada.')
+
+    data_txt = item.get("data_coleta")
+    dia = parse_date(data_txt) if data_txt else hoje
+    if dia is None:
+        raise ValueError("Data inválida. Use o formato YYYY-MM-DD.")
+    if dia > hoje:
+        raise ValueError("Data da coleta no futuro.")
+
+    return id_cliente, estacao, dia
+
+
+def _aplicar_item(id_cliente, estacao, dia, item):
+    """
+    Grava a coleta e o registro do id no mesmo savepoint. O id é inserido
+    primeiro: se outra requisição já o gravou (unique), devolve None sem
+    aplicar nada.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                registro = ColetaSincronizada.objects.create(
+                    id_cliente=id_cliente, estacao=estacao, data_coleta=dia, resultado={},
+                )
+        except IntegrityError:
+            return None
+
+        contagem = salvar_coleta_estacao(
+            estacao,
+            item.get("transmissores") or [],
+            item.get("receptores") or [],
+            dia=dia,
+        )
+        registro.resultado = contagem
+        registro.save(update_fields=["resultado"])
+    return contagem
+
+
+def processar_lote_coletas(linhas, itens_por_transacao=None):
+    """
+    Aplica coletas enfileiradas offline (uma por linha NDJSON).
+
+    Cada item: {"id", "estacao", "data_coleta", "transmissores", "receptores"}.
+    Os itens são aplicados em transações de até `itens_por_transacao` itens,
+    cada um em seu próprio savepoint, e ids já recebidos são respondidos como
+    "duplicado" sem regravar nada (inclusive quando outra requisição simultânea
+    grava o mesmo id). Retorna um resultado por linha; itens
+    inválidos (JSON, estação, data, valores) voltam como "rejeitado" e não adianta
+    reenviá-los, falhas ao gravar voltam como "erro" e podem ser tentadas de novo.
+    """
+    itens_por_transacao = itens_por_transacao or settings.SINCRONIZACAO_ITENS_POR_TRANSACAO
+    estacoes = {e.nome: e for e in Estacao.objects.all()}
+    hoje = timezone.localdate()
+
+    resultados = []
+    vistos = set()
+
+    for bloco in _em_blocos(_ler_linhas_ndjson(linhas), itens_por_transacao):
+        ids_bloco = [_id_cliente(item) for _, item, _ in bloco]
+        ja_recebidos = dict(
+            ColetaSincronizada.objects
+            .filter(id_cliente__in=[i for i in ids_bloco if i])
+            .values_list("id_cliente", "resultado")
+        )
+
+        with transaction.atomic():
+            for numero, item, erro in bloco:
+                id_item = item.get("id") if isinstance(item, dict) else None
+
+                if erro:
+                    resultados.append({"linha": numero, "id": id_item, "status": "rejeitado", "mensagem": erro})
+                    continue
+
+                try:
+                    id_cliente, estacao, dia = _validar_item(item, estacoes, hoje)
+                except ValueError as e:
+                    resultados.append({"linha": numero, "id": id_item, "status": "rejeitado", "mensagem": str(e)})
+                    continue
+
+                if id_cliente in ja_recebidos or id_cliente in vistos:
+                    resultados.append({
+                        "linha": numero,
+                        "id": id_cliente,
+                        "status": "duplicado",
+                        **ja_recebidos.get(id_cliente, {}),
+                    })
+                    continue
+
+                try:
+                    contagem = _aplicar_item(id_cliente, estacao, dia, item)
+                except (ValueError, TypeError, ValidationError) as e:
+                    # payload que nunca vai gravar (ex.: horário inválido)
+                    resultados.append({"linha": numero, "id": id_cliente, "status": "rejeitado", "mensagem": str(e)})
+                    continue
+                except Exception as e:
+                    logger.exception("Erro ao sincronizar coleta %s", id_cliente)
+                    resultados.append({"linha": numero, "id": id_cliente, "status": "erro", "mensagem": str(e)})
+                    continue
+
+                vistos.add(id_cliente)
+                if contagem is None:
+                    resultados.append({"linha": numero, "id": id_cliente, "status": "duplicado"})
+                    continue
+                resultados.append({"linha": numero, "id": id_cliente, "status": "aplicado", **contagem})
+
+    return resultados
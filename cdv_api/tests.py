@@ -1,3 +1,1006 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from cdv_api.management.commands import importar_legacy_sqlite
+from cdv_api.models import (
+    ColetaSincronizada, Estacao, ExportacaoExcel, HashImportacaoLegacy, Transmissor, Receptor,
+    LeituraAtualReceptor, LeituraAtualTransmissor,
+)
+from cdv_api.servicos import clima
+from cdv_api.servicos.benchmark import executar_benchmark
+from cdv_api.servicos.degradacao import contar_degradacoes_por_estacao, detectar_degradacao_faixa
+from cdv_api.servicos.dados_sinteticos import carregar_circuitos_por_estacao, gerar_historico
+from cdv_api.servicos.exportacao import escrever_excel_estacoes, normalizar_filtros_exportacao
+from cdv_api.servicos.exportacao_jobs import processar_pendentes, solicitar_exportacao
+from cdv_api.servicos.importacao_legacy import campos_copiados, sincronizar_modelo
+from cdv_api.servicos.importacao_planilhas import importar_planilha
+from cdv_api.servicos.ingestao import salvar_coleta_estacao
+from cdv_api.servicos.leituras_atuais import (
+    atualizar_leituras_atuais, recalcular_leitura_atual, reconstruir_leituras_atuais,
+)
+from cdv_api.servicos.reimportacao_excel import reimportar_excel
+from cdv_api.servicos.sincronizacao import processar_lote_coletas
+from cdv_api.servicos.series import lttb
+from cdv_api.servicos import metricas
+
+
+# cache em memória, estáticos sem manifest e sem redirect HTTPS (Client em http)
+ambiente_de_teste = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+    SECURE_SSL_REDIRECT=False,
+)
+
+
+class OpenMeteoStub(BaseHTTPRequestHandler):
+    """Responde como o Open-Meteo: uma resposta por coordenada, na mesma ordem."""
+    requisicoes = []
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        self.requisicoes.append(params)
+
+        latitudes = params["latitude"][0].split(",")
+        hoje = timezone.localdate().isoformat()
+        respostas = [
+            {
+                "latitude": float(lat),
+                "current": {"temperature_2m": 20.0 + i, "relative_humidity_2m": 60},
+                "hourly": {
+                    "time": [f"{hoje}T{h:02d}:00" for h in range(24)],
+                    "temperature_2m": [10.0 + h for h in range(24)],
+                    "relative_humidity_2m": [50] * 24,
+                },
+            }
+            for i, lat in enumerate(latitudes)
+        ]
+        corpo = json.dumps(respostas if len(respostas) > 1 else respostas[0]).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ClimaLoteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = HTTPServer(("127.0.0.1", 0), OpenMeteoStub)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.servidor.server_port}/v1/forecast"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        OpenMeteoStub.requisicoes = []
+        cache.clear()
+        clima.limpar_cache_clima()
+        ajuste = override_settings(OPEN_METEO_URL=self.url)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_lote_busca_todas_as_estacoes_em_uma_requisicao(self):
+        resultado = clima.obter_clima_open_meteo_lote()
+
+        self.assertEqual(len(OpenMeteoStub.requisicoes), 1)
+        self.assertEqual(set(resultado), set(clima.COORDENADAS_NORMALIZADAS))
+        self.assertEqual(
+            len(OpenMeteoStub.requisicoes[0]["latitude"][0].split(",")),
+            len(clima.COORDENADAS_ESTACOES),
+        )
+        self.assertEqual(resultado["Capao Redondo"]["atual"]["temperatura"], 20.0)
+
+    def test_lote_com_uma_estacao(self):
+        resultado = clima.obter_clima_open_meteo_lote(["moema"])
+
+        self.assertEqual(list(resultado), ["Moema"])
+        self.assertEqual(resultado["Moema"]["atual"]["temperatura"], 20.0)
+
+    def test_comando_popula_cache_atual_e_horario(self):
+        saida = StringIO()
+        call_command("atualizar_clima", stdout=saida)
+        self.assertEqual(len(OpenMeteoStub.requisicoes), 1)
+
+        atual = clima.obter_temperatura_estacao("Moema")
+        horario = clima.obter_temperatura_open_meteo_horaria(
+            "Moema", timezone.localdate().isoformat(), "08:30"
+        )
+
+        self.assertEqual(len(OpenMeteoStub.requisicoes), 1)
+        self.assertEqual(atual["fonte"], "open-meteo")
+        self.assertEqual(horario["temperatura"], 18.0)
+        self.assertIn("17 estação(ões)", saida.getvalue())
+
+    def test_cache_vazio_busca_lote_e_serve_demais_estacoes(self):
+        clima.obter_temperatura_estacao("Moema")
+        clima.obter_temperatura_estacao("Brooklin")
+        chacara = clima.obter_temperatura_estacao("Chácara Klabin")
+
+        self.assertEqual(len(OpenMeteoStub.requisicoes), 1)
+        self.assertEqual(chacara["temperatura"], 36.0)
+
+
+@ambiente_de_teste
+class ClimaRevalidacaoTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        ajuste = override_settings(CLIMA_TRAVAS_DIR=diretorio.name, CLIMA_CACHE_TTL=600, CLIMA_CACHE_STALE=1800)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        clima.limpar_cache_clima()
+        self.addCleanup(clima.limpar_cache_clima)
+
+        self.agora = time.time()
+        self.buscas = []
+        self._mock(mock.patch("time.time", side_effect=lambda: self.agora))
+        self._mock(mock.patch.object(clima, "_buscar_clima_apis", side_effect=self._buscar))
+        self.threads = self._mock(mock.patch.object(clima.threading, "Thread"))
+
+    def _mock(self, patcher):
+        objeto = patcher.start()
+        self.addCleanup(patcher.stop)
+        return objeto
+
+    def _buscar(self, estacao_nome, erros):
+        self.buscas.append(estacao_nome)
+        return {"temperatura": 20.0 + len(self.buscas), "fonte": "open-meteo"}
+
+    def _temperatura(self, segundos):
+        self.agora += segundos
+        return clima.obter_temperatura_estacao("Moema")["temperatura"]
+
+    def _revalidar_pendente(self):
+        alvo = self.threads.call_args.kwargs
+        alvo["target"](*alvo["args"])
+
+    def test_fresco_vencido_e_expirado(self):
+        self.assertEqual(self._temperatura(0), 21.0)
+
+        # fresco: nem busca nem revalida
+        self.assertEqual(self._temperatura(500), 21.0)
+        self.assertEqual((len(self.buscas), self.threads.call_count), (1, 0))
+
+        # vencido: serve o valor antigo e agenda uma única revalidação
+        self.assertEqual(self._temperatura(200), 21.0)
+        self.assertEqual(self._temperatura(1), 21.0)
+        self.assertEqual((len(self.buscas), self.threads.call_count), (1, 1))
+
+        self._revalidar_pendente()
+        self.assertEqual(self._temperatura(1), 22.0)
+        self.assertEqual(os.listdir(settings.CLIMA_TRAVAS_DIR), [])
+
+        # além da janela de stale: busca na hora
+        self.assertEqual(self._temperatura(600 + 1800 + 1), 23.0)
+        self.assertEqual(self.threads.call_count, 1)
+
+    def test_trava_de_outro_worker_impede_revalidacao_ate_expirar(self):
+        self._temperatura(0)
+        self.agora += 601
+        trava = clima._trava_revalidacao(clima._chave_cache_clima("Moema"))
+        self.assertTrue(clima._adquirir_trava(trava))
+        os.utime(trava, (self.agora, self.agora))
+
+        self._temperatura(0)
+        self.assertEqual(self.threads.call_count, 0)
+
+        # worker que morreu com a trava: expira e a próxima requisição revalida
+        os.utime(trava, (self.agora - clima.TRAVA_REVALIDACAO_EXPIRADA - 1,) * 2)
+        self._temperatura(0)
+        self._temperatura(0)
+        self.assertEqual(self.threads.call_count, 1)
+
+
+@ambiente_de_teste
+class DadosSinteticosTests(TestCase):
+    def test_gera_historico_e_leituras_atuais(self):
+        circuitos = carregar_circuitos_por_estacao()["Moema"]
+
+        total = gerar_historico(dias=3, coletas_por_dia=2, estacoes=["Moema"], semente=1)
+
+        self.assertEqual(total, {"estacoes": 1, "transmissores": len(circuitos) * 6, "receptores": len(circuitos) * 12})
+        self.assertEqual(LeituraAtualReceptor.objects.count(), len(circuitos) * 2)
+        self.assertFalse(Receptor.objects.filter(relacao_pct__isnull=True).exists())
+        self.assertFalse(Receptor.objects.filter(temp_celsius__isnull=True).exists())
+        self.assertEqual(Estacao.objects.get(nome="Moema").geracao_dados, 1)
+
+    def test_benchmark_gera_relatorio(self):
+        relatorio = executar_benchmark([1, 2], repeticoes=1, semente=1, cenarios=["radar_saude", "historico_circuito"])
+
+        self.assertEqual([r["dias"] for r in relatorio["resultados"]], [1, 2])
+        for resultado in relatorio["resultados"]:
+            for medida in resultado["cenarios"].values():
+                self.assertEqual(medida["status"], 200)
+                self.assertGreater(medida["consultas"], 0)
+                self.assertGreater(medida["pico_memoria_kb"], 0)
+
+
+PLANILHA_CSV = """estacao;circuito;num_transmissor;num_receptor;data;horario;vout;pout;iav;ith;temperatura;tipo_manutencao
+Moema;1E01T;1;1;01/03/2024;08:00;12,1;5;10;7;24,5;Preventiva
+Moema;1E01T;1;2;01/03/2024;08:00;12,1;5;10;6,5;24,5;Preventiva
+Moema;1E02T;;1;01/03/2024;08:10;;;;;;Preventiva
+Estação X;1E03T;1;1;01/03/2024;08:20;12;5;10;7;;Preventiva
+Moema;1E04T;1;1;31/02/2024;08:30;12;5;10;7;;Preventiva
+"""
+
+
+@ambiente_de_teste
+class ImportacaoPlanilhaTests(TestCase):
+    def setUp(self):
+        Estacao.objects.create(nome="Moema")
+
+    def _importar(self, **kwargs):
+        return importar_planilha(BytesIO(PLANILHA_CSV.encode("utf-8")), "historico.csv", **kwargs)
+
+    def test_importa_validas_e_relata_rejeitadas(self):
+        resultado = self._importar()
+
+        self.assertEqual((resultado["transmissores"], resultado["receptores"]), (1, 2))
+        self.assertEqual([r["linha"] for r in resultado["rejeicoes"]], [4, 5, 6])
+        rx = Receptor.objects.get(num_circuito="1E01T", num_receptor="2")
+        self.assertEqual(float(rx.relacao_pct), 65.0)
+        self.assertEqual(rx.horario_coleta.strftime("%H:%M"), "08:00")
+        self.assertEqual(LeituraAtualReceptor.objects.count(), 2)
+        self.assertEqual(Estacao.objects.get(nome="Moema").geracao_dados, 1)
+
+    def test_reimportacao_e_dry_run_nao_gravam(self):
+        simulado = self._importar(aplicar=False)
+        self.assertEqual(simulado["receptores"], 2)
+        self.assertFalse(Receptor.objects.exists())
+
+        self._importar()
+        repetido = self._importar()
+
+        self.assertEqual((repetido["transmissores"], repetido["receptores"]), (0, 0))
+        self.assertEqual(Receptor.objects.count(), 2)
+
+
+@ambiente_de_teste
+class ReimportacaoExcelTests(TestCase):
+    def setUp(self):
+        self.estacao = Estacao.objects.create(nome="Moema")
+        momento = timezone.make_aware(timezone.datetime(2024, 3, 1, 8, 0))
+        Transmissor.objects.create(
+            estacao=self.estacao, num_circuito="1E01T", num_transmissor="1", vout=12.1, pout=5, tap="2",
+            tipo_transmissor="Padrão", tipo_manutencao="preventiva", data_manutencao=momento,
+            horario_coleta=momento.time(), temp_celsius=24.5,
+        )
+        for num, ith in (("1", 7), ("2", 6.5)):
+            Receptor.objects.create(
+                estacao=self.estacao, num_circuito="1E01T", num_receptor=num, iav=10, ith=ith,
+                relacao=f"{ith * 10:.2f}%", tipo_manutencao="preventiva", data_manutencao=momento,
+                horario_coleta=momento.time(), temp_celsius=24.5,
+            )
+
+    def _exportar(self):
+        destino = BytesIO()
+        escrever_excel_estacoes(Estacao.objects.all(), normalizar_filtros_exportacao({}), destino)
+        destino.seek(0)
+        return load_workbook(destino)
+
+    def _reimportar(self, wb, **kwargs):
+        arquivo = BytesIO()
+        wb.save(arquivo)
+        arquivo.seek(0)
+        return reimportar_excel(arquivo, **kwargs)
+
+    def test_planilha_sem_edicao_nao_altera_nada(self):
+        resultado = self._reimportar(self._exportar())
+
+        self.assertEqual((resultado["transmissores"], resultado["receptores"]), (0, 0))
+        self.assertEqual(resultado["inalteradas"], 3)
+        self.assertEqual(resultado["rejeicoes"], [])
+        self.assertEqual(Estacao.objects.get(pk=self.estacao.pk).geracao_dados, 0)
+
+    def test_grava_so_as_linhas_editadas(self):
+        wb = self._exportar()
+        ws = wb["Moema"]
+        ws["D5"] = 13.0       # VOUT do TX
+        ws["E10"] = 8         # ITH do RX 1, relação recalculada
+        ws["F11"] = 0.7       # relação do RX 2 digitada
+        ws.append(["Moema", "1E99T", 1, 10, 7, 0.7, "preventiva", "01/03/2024", "08:00", 24.5])
+
+        simulado = self._reimportar(wb, aplicar=False)
+        self.assertEqual((simulado["transmissores"], simulado["receptores"]), (1, 2))
+        self.assertEqual(Transmissor.objects.get().vout, 12.1)
+
+        resultado = self._reimportar(wb)
+
+        self.assertEqual([r["motivo"] for r in resultado["rejeicoes"]], ["leitura não encontrada no banco"])
+        self.assertEqual(Transmissor.objects.get().vout, 13.0)
+        rx1, rx2 = Receptor.objects.order_by("num_receptor")
+        self.assertEqual((rx1.ith, rx1.relacao, rx1.relacao_pct), (8, "80.00%", 80.0))
+        self.assertEqual((rx2.ith, rx2.relacao_pct), (6.5, 70.0))
+        self.assertEqual(Estacao.objects.get(pk=self.estacao.pk).geracao_dados, 1)
+
+
+def _rx_legado(pk, relacao="70.00%", ith=7):
+    return Receptor(
+        pk=pk, estacao_id=1, num_circuito="1E01T", num_receptor=str(pk), iav=10, ith=ith, relacao=relacao,
+        data_manutencao=timezone.make_aware(datetime.datetime(2024, 1, 1, 8, 0)) + datetime.timedelta(days=pk),
+        tipo_manutencao="preventiva",
+    )
+
+
+@ambiente_de_teste
+class ImportacaoLegacyTests(TestCase):
+    # "legacy" é um segundo SQLite em memória nos testes
+    databases = {"default", "legacy"}
+
+    def setUp(self):
+        Estacao.objects.using("legacy").create(pk=1, nome="Moema")
+        Estacao.objects.create(pk=1, nome="Moema")
+
+    def _legado(self, *objetos):
+        # bulk_create não passa por save(): relacao_pct/data_coleta ficam vazios como num banco antigo
+        Receptor.objects.using("legacy").bulk_create(objetos)
+
+    def _checkpoint(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        return os.path.join(diretorio.name, "checkpoint.json")
+
+    def _sincronizar(self, **kwargs):
+        return sincronizar_modelo(Receptor, campos_copiados(Receptor), **kwargs)
+
+    def _contagens(self, resultado):
+        return {
+            chave: resultado[chave]
+            for chave in ("inalteradas", "insercoes", "atualizacoes", "ja_sincronizadas", "conflitos")
+            if resultado[chave]
+        }
+
+    def test_insercao_e_reexecucao_inalterada(self):
+        self._legado(_rx_legado(1), _rx_legado(2))
+
+        self.assertEqual(self._contagens(self._sincronizar()), {"insercoes": 2})
+        self.assertEqual(Receptor.objects.get(pk=2).relacao_pct, 70.0)
+        self.assertEqual(HashImportacaoLegacy.objects.count(), 2)
+
+        repetida = self._sincronizar()
+        self.assertEqual(self._contagens(repetida), {"inalteradas": 2})
+        self.assertEqual(repetida["marca_dagua"], 2)
+
+    def test_atualizacao_so_no_legado(self):
+        self._legado(_rx_legado(1), _rx_legado(2))
+        self._sincronizar()
+        Receptor.objects.using("legacy").filter(pk=1).update(ith=8, relacao="80.00%")
+
+        resultado = self._sincronizar()
+
+        self.assertEqual(self._contagens(resultado), {"atualizacoes": 1, "inalteradas": 1})
+        self.assertEqual(resultado["estacao_ids"], {1})
+        self.assertEqual(Receptor.objects.get(pk=1).relacao_pct, 80.0)
+
+    def test_alterado_nos_dois_lados_e_conflito(self):
+        self._legado(_rx_legado(1))
+        self._sincronizar()
+        hash_sincronizado = HashImportacaoLegacy.objects.get().hash
+        Receptor.objects.using("legacy").filter(pk=1).update(ith=8)
+        Receptor.objects.filter(pk=1).update(ith=9)
+
+        resultado = self._sincronizar()
+
+        self.assertEqual(self._contagens(resultado), {"conflitos": 1})
+        self.assertEqual(resultado["amostras_conflitos"], [{"pk": 1, "motivo": "alterado no legado e no destino"}])
+        self.assertEqual(Receptor.objects.get(pk=1).ith, 9)
+        self.assertEqual(HashImportacaoLegacy.objects.get().hash, hash_sincronizado)
+
+    def test_destino_ja_igual_so_registra_hash(self):
+        self._legado(_rx_legado(1), _rx_legado(2))
+        Receptor.objects.bulk_create([_rx_legado(1), _rx_legado(2, ith=8)])
+
+        resultado = self._sincronizar()
+
+        # PK 2 existe no destino com outro conteúdo e sem hash: não é sobrescrita
+        self.assertEqual(self._contagens(resultado), {"ja_sincronizadas": 1, "conflitos": 1})
+        self.assertEqual(resultado["amostras_conflitos"][0]["motivo"], "PK já existe no destino com outro conteúdo")
+        self.assertEqual(list(HashImportacaoLegacy.objects.values_list("objeto_id", flat=True)), [1])
+        self.assertEqual(Receptor.objects.get(pk=2).ith, 8)
+
+    def test_acima_da_marca_dagua_nao_consulta_hashes(self):
+        self._legado(_rx_legado(1), _rx_legado(2))
+        self._sincronizar()
+        self._legado(_rx_legado(3), _rx_legado(4))
+
+        consultas = mock.patch.object(
+            HashImportacaoLegacy.objects, "filter", wraps=HashImportacaoLegacy.objects.filter,
+        )
+        with consultas as filtro:
+            resultado = self._sincronizar(lote=2)
+
+        self.assertEqual(self._contagens(resultado), {"inalteradas": 2, "insercoes": 2})
+        # marca d'água + o lote abaixo dela; o lote [3, 4] não consulta
+        self.assertEqual(filtro.call_count, 2)
+
+    def test_dry_run_nao_grava_nada(self):
+        self._legado(_rx_legado(1), _rx_legado(2))
+        self._sincronizar()
+        Receptor.objects.using("legacy").filter(pk=1).update(ith=8)
+        self._legado(_rx_legado(3))
+        hashes = list(HashImportacaoLegacy.objects.order_by("objeto_id").values_list("objeto_id", "hash"))
+
+        saida = StringIO()
+        call_command("importar_legacy_sqlite", "--incremental", "--dry-run", stdout=saida)
+
+        self.assertIn("1 inserção(ões), 1 atualização(ões)", saida.getvalue())
+        self.assertEqual(list(HashImportacaoLegacy.objects.order_by("objeto_id").values_list("objeto_id", "hash")), hashes)
+        self.assertEqual(list(Receptor.objects.order_by("pk").values_list("pk", "ith")), [(1, 7), (2, 7)])
+
+
+    def test_importacao_interrompida_retoma_do_checkpoint(self):
+        Estacao.objects.all().delete()
+        self._legado(*(_rx_legado(pk) for pk in range(1, 8)))
+        checkpoint = self._checkpoint()
+        opcoes = {"lote": 2, "checkpoint": checkpoint, "stdout": StringIO()}
+        gravar_lote = importar_legacy_sqlite.gravar_lote
+        lotes = []
+
+        def falhar_no_terceiro_lote_rx(Model, objetos):
+            if Model is Receptor:
+                lotes.append(objetos)
+                if len(lotes) == 3:
+                    raise RuntimeError("conexão perdida")
+            gravar_lote(Model, objetos)
+
+        with mock.patch.object(importar_legacy_sqlite, "gravar_lote", falhar_no_terceiro_lote_rx):
+            with self.assertRaises(RuntimeError):
+                call_command("importar_legacy_sqlite", **opcoes)
+
+        self.assertEqual(list(Receptor.objects.order_by("pk").values_list("pk", flat=True)), [1, 2, 3, 4])
+        with open(checkpoint, encoding="utf-8") as arquivo:
+            self.assertEqual(json.load(arquivo)["cdv_api.Receptor"], 4)
+
+        call_command("importar_legacy_sqlite", resume=True, **opcoes)
+
+        self.assertEqual(list(Receptor.objects.order_by("pk").values_list("pk", flat=True)), list(range(1, 8)))
+        rx = Receptor.objects.get(pk=5)
+        self.assertEqual((rx.relacao_pct, rx.data_coleta), (70.0, datetime.date(2024, 1, 6)))
+        self.assertEqual(LeituraAtualReceptor.objects.count(), 7)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_limpar_mantem_geracao_crescente(self):
+        Estacao.objects.filter(pk=1).update(geracao_dados=7)
+        self._legado(_rx_legado(1))
+
+        call_command("importar_legacy_sqlite", limpar=True, checkpoint=self._checkpoint(), stdout=StringIO())
+
+        self.assertEqual(Estacao.objects.get(pk=1).geracao_dados, 8)
+        self.assertEqual(Receptor.objects.get().relacao_pct, 70.0)
+
+
+@ambiente_de_teste
+class ExportacaoJobsTests(TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        ajuste = override_settings(EXPORTACOES_DIR=self.diretorio.name, EXPORTACAO_TIMEOUT_PROCESSANDO=600)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        estacao = Estacao.objects.create(nome="Moema")
+        Receptor.objects.create(
+            estacao=estacao, num_circuito="1E01T", num_receptor="1", iav=10, ith=7,
+            relacao="70.00%", tipo_manutencao="preventiva", temp_celsius=24.5,
+        )
+
+    def _travar(self, exportacao, minutos):
+        ExportacaoExcel.objects.filter(pk=exportacao.pk).update(
+            status="processando", iniciado_em=timezone.now() - datetime.timedelta(minutes=minutos),
+        )
+
+    def test_job_em_andamento_e_reaproveitado(self):
+        exportacao = solicitar_exportacao({})
+        self._travar(exportacao, 1)
+
+        self.assertEqual(solicitar_exportacao({}).pk, exportacao.pk)
+        self.assertEqual(ExportacaoExcel.objects.get(pk=exportacao.pk).status, "processando")
+
+    def test_job_travado_volta_para_fila_e_e_gerado(self):
+        exportacao = solicitar_exportacao({})
+        self._travar(exportacao, 11)
+
+        reaproveitada = solicitar_exportacao({})
+        self.assertEqual(reaproveitada.pk, exportacao.pk)
+        self.assertEqual(reaproveitada.status, "pendente")
+
+        self._travar(exportacao, 11)
+        self.assertEqual(processar_pendentes(), 1)
+
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, "concluido")
+        self.assertEqual(ExportacaoExcel.objects.count(), 1)
+
+
+def _tx(circuito, vout=12.0, horario="08:30"):
+    return {
+        "num_circuito": circuito, "num_transmissor": "1", "vout": vout, "pout": 5, "tap": "2",
+        "tipo_transmissor": "Padrão", "tipo_manutencao": "Preventiva", "horario_coleta": horario, "temp_celsius": 24,
+    }
+
+
+def _rx(circuito, num, ith=7, horario="08:30"):
+    return {
+        "num_circuito": circuito, "num_receptor": num, "iav": 10, "ith": ith,
+        "tipo_manutencao": "preventiva", "horario_coleta": horario, "temp_celsius": 24,
+    }
+
+
+@ambiente_de_teste
+class IngestaoTests(TestCase):
+    def setUp(self):
+        self.estacao = Estacao.objects.create(nome="Moema")
+
+    def test_grava_coleta_com_campos_derivados(self):
+        resultado = salvar_coleta_estacao(self.estacao, [_tx("1E01T")], [_rx("1E01T", "1"), _rx("1E01T", "2", ith=6.5)])
+
+        self.assertEqual(resultado, {"tx_criados": 1, "tx_atualizados": 0, "rx_criados": 2, "rx_atualizados": 0})
+        rx = Receptor.objects.get(num_receptor="2")
+        self.assertEqual((rx.relacao, rx.relacao_pct), ("65.00%", 65.0))
+        self.assertEqual(rx.data_coleta, timezone.localdate())
+        self.assertEqual(Transmissor.objects.get().tipo_manutencao, "preventiva")
+
+    def test_item_repetido_no_payload_grava_um_registro(self):
+        resultado = salvar_coleta_estacao(self.estacao, [_tx("1E01T", vout=12), _tx("1E01T", vout=13)], [])
+
+        self.assertEqual(resultado["tx_criados"], 1)
+        self.assertEqual(Transmissor.objects.get().vout, 13)
+
+    def test_reenvio_do_mesmo_dia_atualiza(self):
+        salvar_coleta_estacao(self.estacao, [_tx("1E01T")], [_rx("1E01T", "1")])
+        resultado = salvar_coleta_estacao(self.estacao, [_tx("1E01T", vout=14)], [_rx("1E01T", "1", ith=8)])
+
+        self.assertEqual(resultado, {"tx_criados": 0, "tx_atualizados": 1, "rx_criados": 0, "rx_atualizados": 1})
+        self.assertEqual(Transmissor.objects.get().vout, 14)
+        self.assertEqual(Receptor.objects.get().relacao_pct, 80.0)
+
+        # outro horário no mesmo dia é outra coleta
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1", horario="09:00")])
+        self.assertEqual(Receptor.objects.count(), 2)
+
+    def test_dia_anterior_usa_dia_e_horario_da_coleta(self):
+        dia = timezone.localdate() - datetime.timedelta(days=10)
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1")], dia=dia)
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1", ith=8)], dia=dia)
+
+        rx = Receptor.objects.get()
+        self.assertEqual(rx.data_coleta, dia)
+        self.assertEqual(timezone.localtime(rx.data_manutencao).replace(tzinfo=None),
+                         datetime.datetime.combine(dia, datetime.time(8, 30)))
+        self.assertEqual(rx.relacao_pct, 80.0)
+
+    def test_leitura_atual_e_geracao_apos_salvar(self):
+        salvar_coleta_estacao(self.estacao, [_tx("1E01T")], [_rx("1E01T", "1")])
+        self.assertEqual(Estacao.objects.get(pk=self.estacao.pk).geracao_dados, 1)
+
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1", ith=8, horario="09:00")])
+
+        self.assertEqual(Estacao.objects.get(pk=self.estacao.pk).geracao_dados, 2)
+        atual = LeituraAtualReceptor.objects.get()
+        self.assertEqual(atual.receptor.horario_coleta, datetime.time(9, 0))
+        self.assertEqual(atual.receptor.relacao_pct, 80.0)
+        self.assertEqual(LeituraAtualTransmissor.objects.get().transmissor, Transmissor.objects.get())
+
+        # uma coleta de dia anterior não passa a ser a leitura atual
+        dia = timezone.localdate() - datetime.timedelta(days=1)
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1", ith=6, horario="23:00")], dia=dia)
+        self.assertEqual(LeituraAtualReceptor.objects.get().receptor.horario_coleta, datetime.time(9, 0))
+
+    def test_sincronizacao_separa_recusas_definitivas(self):
+        self.client.force_login(get_user_model().objects.create_user("tecnico", password="x"))
+        itens = [
+            {"id": "a", "estacao": "Moema", "transmissores": [], "receptores": [_rx("1E01T", "1")]},
+            {"id": "b", "estacao": "Inexistente", "transmissores": [], "receptores": []},
+            {"id": "c", "estacao": "Moema", "transmissores": [], "receptores": [_rx("1E02T", "1", horario="25:99")]},
+        ]
+        corpo = "\n".join(json.dumps(item) for item in itens) + "\n{quebrado"
+
+        resposta = self.client.post("/sincronizar_coletas/", corpo, content_type="application/x-ndjson")
+
+        self.assertEqual(
+            [r["status"] for r in resposta.json()["resultados"]],
+            ["aplicado", "rejeitado", "rejeitado", "rejeitado"],
+        )
+        self.assertEqual(Receptor.objects.count(), 1)
+
+    def _sincronizar(self, *itens):
+        return processar_lote_coletas(json.dumps(item) for item in itens)
+
+    def test_sincronizacao_mesmo_id_duas_vezes_no_corpo(self):
+        item = {"id": "tablet-1", "estacao": "Moema", "transmissores": [], "receptores": [_rx("1E01T", "1")]}
+
+        resultados = self._sincronizar(item, {**item, "id": " tablet-1 "})
+
+        self.assertEqual([r["status"] for r in resultados], ["aplicado", "duplicado"])
+        self.assertEqual(ColetaSincronizada.objects.get().resultado["rx_criados"], 1)
+        self.assertEqual(Receptor.objects.count(), 1)
+
+    def test_sincronizacao_id_ja_recebido(self):
+        item = {"id": "tablet-1", "estacao": "Moema", "transmissores": [], "receptores": [_rx("1E01T", "1")]}
+        self._sincronizar(item)
+
+        resultados = self._sincronizar(
+            {**item, "id": "tablet-1 ", "receptores": [_rx("1E01T", "1", ith=8)]},
+            {**item, "id": "tablet-2"},
+        )
+
+        self.assertEqual([r["status"] for r in resultados], ["duplicado", "aplicado"])
+        self.assertEqual(resultados[0]["rx_criados"], 1)
+        self.assertEqual(Receptor.objects.get().relacao_pct, 70.0)
+
+    def test_sincronizacao_id_gravado_por_requisicao_simultanea(self):
+        # o outro request grava o id depois da consulta de ids já recebidos
+        item = {"id": "tablet-1", "estacao": "Moema", "transmissores": [], "receptores": [_rx("1E01T", "1")]}
+        ColetaSincronizada.objects.create(id_cliente="tablet-1", estacao=self.estacao, data_coleta=timezone.localdate())
+
+        with mock.patch.object(ColetaSincronizada.objects, "filter", return_value=ColetaSincronizada.objects.none()):
+            resultados = self._sincronizar(item, {**item, "id": "tablet-2"})
+
+        self.assertEqual([r["status"] for r in resultados], ["duplicado", "aplicado"])
+        self.assertEqual(ColetaSincronizada.objects.count(), 2)
+        self.assertEqual(Receptor.objects.count(), 1)
+
+    def test_view_salvar_dados_cdv(self):
+        self.client.force_login(get_user_model().objects.create_user("tecnico", password="x"))
+        payload = {"estacao": "Moema", "transmissores": [_tx("1E01T")], "receptores": [_rx("1E01T", "1")]}
+
+        resposta = self.client.post("/salvar_dados_cdv/", json.dumps(payload), content_type="application/json")
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(Receptor.objects.get().estacao, self.estacao)
+        self.assertEqual(LeituraAtualReceptor.objects.count(), 1)
+
+
+def _degradados_por_laco(leituras, janela=3):
+    """Regras de faixa aplicadas leitura a leitura, como antes da versão vetorizada."""
+    historico = {}
+    for circuito, _, relacao in sorted(leituras, key=lambda l: (l[0], -l[1].timestamp())):
+        valores = historico.setdefault(circuito.strip().upper(), [])
+        if len(valores) < janela:
+            valores.append(relacao)
+
+    degradados = {}
+    for circuito, valores in historico.items():
+        if len(valores) < janela:
+            continue
+        valores = valores[::-1]
+        pares = list(zip(valores, valores[1:]))
+        if all(a > b for a, b in pares) and valores[-1] < 60:
+            degradados[circuito] = "Negativa"
+        elif all(a < b for a, b in pares) and valores[-1] > 80:
+            degradados[circuito] = "Positiva"
+    return degradados
+
+
+@ambiente_de_teste
+class DegradacaoTests(TestCase):
+    def setUp(self):
+        self.estacao = Estacao.objects.create(nome="Moema")
+        self.inicio = timezone.make_aware(datetime.datetime(2024, 1, 1, 8, 0))
+
+    def _gravar(self, leituras):
+        Receptor.objects.bulk_create([
+            Receptor(
+                estacao=self.estacao, num_circuito=circuito, num_receptor="1", relacao=f"{relacao:.2f}%",
+                relacao_pct=relacao, data_manutencao=momento, tipo_manutencao="preventiva",
+            )
+            for circuito, momento, relacao in leituras
+        ])
+
+    def _serie(self, circuito, valores, inicio_dia=0):
+        return [(circuito, self.inicio + datetime.timedelta(days=inicio_dia + i), v) for i, v in enumerate(valores)]
+
+    def test_circuitos_degradados_em_conjunto_fixo(self):
+        self._gravar(
+            self._serie("1E01T", [75, 65, 55])                  # queda abaixo de 60
+            + self._serie("1E02T", [70, 78, 85])                # subida acima de 80
+            + self._serie("1E03T", [70, 50, 55])                # oscila
+            + self._serie("1E04T", [70, 50])                    # leituras insuficientes
+            + self._serie("1E05T", [50, 60, 78, 70, 59])        # só as 3 últimas contam
+            + self._serie("1E06T", [75, 65, 61])                # queda, mas ainda na faixa
+            + self._serie(" 1e07t ", [90, 85, 70])              # nome normalizado, queda na faixa
+        )
+
+        resultado = detectar_degradacao_faixa(Receptor.objects.all())
+
+        self.assertEqual(
+            [(d["circuito"], d["tipo_degradacao"], d["leituras"]) for d in resultado],
+            [("1E01T", "Negativa", [75, 65, 55]), ("1E05T", "Negativa", [78, 70, 59]), ("1E02T", "Positiva", [70, 78, 85])],
+        )
+        self.assertEqual(contar_degradacoes_por_estacao(Receptor.objects.all()), {self.estacao.id: 3})
+
+    def test_mesmo_resultado_da_deteccao_por_laco(self):
+        sorteio = random.Random(7)
+        leituras = []
+        for i in range(60):
+            nome = f"1E{i:02d}T" if i % 5 else f" 1e{i:02d}t"
+            leituras += self._serie(nome, [sorteio.uniform(40, 95) for _ in range(sorteio.randint(1, 6))])
+        self._gravar(leituras)
+
+        resultado = detectar_degradacao_faixa(Receptor.objects.all())
+
+        self.assertEqual({d["circuito"]: d["tipo_degradacao"] for d in resultado}, _degradados_por_laco(leituras))
+        self.assertTrue(resultado)
+
+
+@ambiente_de_teste
+class LeiturasAtuaisTests(TestCase):
+    def test_horario_nulo_e_o_mais_antigo_em_todos_os_caminhos(self):
+        estacao = Estacao.objects.create(nome="Moema")
+        momento = timezone.make_aware(datetime.datetime(2024, 3, 1, 8, 0))
+        com_horario, sem_horario = [
+            Receptor.objects.create(
+                estacao=estacao, num_circuito="1E01T", num_receptor="1", relacao="70.00%",
+                data_manutencao=momento, horario_coleta=horario, tipo_manutencao="preventiva",
+            )
+            for horario in (datetime.time(8, 0), None)
+        ]
+
+        atualizar_leituras_atuais(Receptor, estacao, [com_horario, sem_horario])
+        self.assertEqual(LeituraAtualReceptor.objects.get().receptor, com_horario)
+
+        reconstruir_leituras_atuais(Receptor)
+        self.assertEqual(LeituraAtualReceptor.objects.get().receptor, com_horario)
+
+        recalcular_leitura_atual(Receptor, estacao.id, "1E01T", "1")
+        self.assertEqual(LeituraAtualReceptor.objects.get().receptor, com_horario)
+
+
+@ambiente_de_teste
+class EstacaoAdminTests(TestCase):
+    def test_renomear_estacao_incrementa_geracao(self):
+        estacao = Estacao.objects.create(nome="Moema")
+        self.client.force_login(get_user_model().objects.create_superuser("admin", password="x"))
+
+        resposta = self.client.post(f"/admin/cdv_api/estacao/{estacao.pk}/change/", {"nome": "Moema Nova"})
+
+        self.assertEqual(resposta.status_code, 302)
+        estacao.refresh_from_db()
+        self.assertEqual((estacao.nome, estacao.geracao_dados), ("Moema Nova", 1))
+
+
+@ambiente_de_teste
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        self.estacao = Estacao.objects.create(nome="Moema")
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1")])
+        self.client.force_login(get_user_model().objects.create_user("tecnico", password="x"))
+
+    def _etag(self, url, **params):
+        resposta = self.client.get(url, params)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("private", resposta["Cache-Control"])
+        return resposta["ETag"]
+
+    def _status(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_json_repetido_devolve_304_ate_nova_gravacao(self):
+        url, params = "/historico_circuito/", {"circuito": "1E01T", "rx": "1", "estacao_id": self.estacao.id}
+        etag = self._etag(url, **params)
+
+        self.assertEqual(self._status(url, etag, **params), 304)
+
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1", ith=8, horario="09:00")])
+        self.assertEqual(self._status(url, etag, **params), 200)
+
+    def test_pagina_radar_invalida_com_gravacao_estacoes_e_csrf(self):
+        etag = self._etag("/radar-saude/")
+        self.assertEqual(self._status("/radar-saude/", etag), 304)
+
+        salvar_coleta_estacao(self.estacao, [], [_rx("1E01T", "1", ith=8, horario="09:00")])
+        self.assertEqual(self._status("/radar-saude/", etag), 200)
+
+        etag = self._etag("/radar-saude/")
+        Estacao.objects.create(nome="Brooklin")
+        self.assertEqual(self._status("/radar-saude/", etag), 200)
+
+        etag = self._etag("/radar-saude/")
+        self.client.cookies["csrftoken"] = "a" * 32
+        self.assertEqual(self._status("/radar-saude/", etag), 200)
+
+
+@ambiente_de_teste
+class RadarSaudeTests(TestCase):
+    def setUp(self):
+        self.moema = Estacao.objects.create(nome="Moema")
+        brooklin = Estacao.objects.create(nome="Brooklin")
+        salvar_coleta_estacao(self.moema, [], [_rx("1E01T", "1", ith=7), _rx("2E01T", "1", ith=9)])
+        salvar_coleta_estacao(brooklin, [], [_rx("1E02T", "1", ith=5), _rx("2E02T", "1", ith=7)])
+        self.client.force_login(get_user_model().objects.create_user("tecnico", password="x"))
+
+    def _radar(self, **params):
+        resposta = self.client.get("/radar-saude/", params)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.context
+
+    def _linhas(self, contexto):
+        return [(item["estacao"], item["circuito"]) for item in contexto["radar_saude"]]
+
+    def test_sem_filtro_ordena_do_pior_para_o_melhor(self):
+        contexto = self._radar()
+
+        self.assertEqual(contexto["total"], 4)
+        self.assertEqual([item["score"] for item in contexto["radar_saude"]], [20, 40, 100, 100])
+
+    def test_filtros_de_estacao_e_via(self):
+        self.assertEqual(
+            sorted(self._linhas(self._radar(estacao_id=self.moema.id))),
+            [("Moema", "1E01T"), ("Moema", "2E01T")],
+        )
+        self.assertEqual(sorted(self._linhas(self._radar(via="1"))), [("Brooklin", "1E02T"), ("Moema", "1E01T")])
+        self.assertEqual(self._linhas(self._radar(estacao_id=self.moema.id, via="2")), [("Moema", "2E01T")])
+
+    def test_estacao_id_nao_numerico_e_ignorado(self):
+        contexto = self._radar(estacao_id="abc")
+
+        self.assertEqual(contexto["total"], 4)
+        self.assertEqual(contexto["selected_estacao_id"], "")
+        self.assertEqual(contexto["filtros_query"], "")
+
+    def test_paginacao_mantem_filtros(self):
+        contexto = self._radar(via="1", por_pagina=1, pagina=2)
+
+        self.assertEqual((contexto["total"], contexto["pagina"].number), (2, 2))
+        self.assertEqual(len(contexto["radar_saude"]), 1)
+        self.assertEqual(contexto["filtros_query"], "via=1&por_pagina=1")
+
+        # página fora do intervalo vai para a última; por_pagina inválido usa o padrão
+        self.assertEqual(self._radar(por_pagina=3, pagina=99)["pagina"].number, 2)
+        self.assertEqual(len(self._radar(por_pagina="abc")["radar_saude"]), 4)
+
+
+@ambiente_de_teste
+class HistoricoCircuitoTests(TestCase):
+    def setUp(self):
+        self.estacao = Estacao.objects.create(nome="Moema")
+        self.client.force_login(get_user_model().objects.create_user("tecnico", password="x"))
+        self.inicio = timezone.make_aware(datetime.datetime(2024, 1, 1, 8, 0))
+
+    def _gravar(self, quantidade, repetir_a_cada=1):
+        # leituras com o mesmo instante exercitam o desempate por id do cursor
+        Receptor.objects.bulk_create([
+            Receptor(
+                estacao=self.estacao, num_circuito="1E01T", num_receptor="1", relacao=f"{i}%", relacao_pct=i,
+                data_manutencao=self.inicio + datetime.timedelta(hours=i // repetir_a_cada), tipo_manutencao="preventiva",
+            )
+            for i in range(quantidade)
+        ])
+
+    def _get(self, **params):
+        return self.client.get("/historico_circuito/", {"circuito": "1E01T", "rx": "1", **params})
+
+    def test_paginas_percorrem_intervalo_uma_vez_em_ordem(self):
+        self._gravar(95, repetir_a_cada=4)
+        params = {"inicio": "2024-01-01", "fim": "2024-01-01", "limite": 10}
+
+        relacoes, apos, paginas = [], None, 0
+        while True:
+            dados = self._get(**params, **({"apos": apos} if apos else {})).json()
+            relacoes += dados["relacao"]
+            paginas += 1
+            apos = dados["proximo"]
+            if apos is None:
+                break
+
+        # fim é inclusivo no dia: 2024-01-01 08:00 até 23:59 -> 16 horas x 4 leituras
+        self.assertEqual(relacoes, list(range(64)))
+        self.assertEqual(paginas, 7)
+
+    def test_max_pontos_limita_e_mantem_extremos(self):
+        self._gravar(500)
+
+        dados = self._get(inicio="2024-01-01", max_pontos=50).json()
+
+        self.assertEqual(dados["leituras"], 500)
+        self.assertEqual(len(dados["t"]), 50)
+        self.assertEqual((dados["relacao"][0], dados["relacao"][-1]), (0, 499))
+        self.assertEqual(dados["t"], sorted(dados["t"]))
+
+    def test_t_segue_ordem_de_gravacao_mesmo_com_horario_digitado_fora_de_ordem(self):
+        # coletas do mesmo dia: gravadas em ordem, horários digitados em ordem inversa
+        Receptor.objects.bulk_create([
+            Receptor(
+                estacao=self.estacao, num_circuito="1E01T", num_receptor="1", relacao=f"{i}%", relacao_pct=i,
+                data_manutencao=self.inicio + datetime.timedelta(minutes=i),
+                horario_coleta=datetime.time(23 - i // 60, 59 - i % 60), tipo_manutencao="preventiva",
+            )
+            for i in range(300)
+        ])
+
+        for params in ({}, {"inicio": "2024-01-01", "max_pontos": 20}):
+            with self.subTest(params=params):
+                dados = self._get(**params).json()
+                self.assertEqual(dados["t"], sorted(dados["t"]))
+                self.assertEqual(dados["t"][-1], int((self.inicio + datetime.timedelta(minutes=299)).timestamp()))
+                self.assertEqual(dados["relacao"][-1], 299)
+
+    def test_lttb_preserva_pico(self):
+        y = [1.0] * 1000
+        y[437] = 50.0
+
+        indices = lttb(range(1000), y, 20)
+
+        self.assertEqual(len(indices), 20)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertIn(437, indices)
+
+    def test_parametros_invalidos_devolvem_400(self):
+        for params in (
+            {"inicio": "ontem"},
+            {"fim": "2024-02-30"},
+            {"apos": "sem-separador"},
+            {"apos": "abc_1"},
+            {"apos": f"{10 ** 20}_1"},
+            {"fim": "9999-12-31"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self._get(**params).status_code, 400)
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+        ajuste = override_settings(METRICAS_DIR=self.diretorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        metricas.limpar_metricas()
+        self.addCleanup(metricas.limpar_metricas)
+
+    def _contagem(self, total):
+        # buckets + Inf (a última posição é a soma dos valores)
+        return sum(total[("cdv_requisicao_duracao_segundos", "radar_saude")][:-1])
+
+    def test_snapshots_de_processos_encerrados_viram_totais(self):
+        metricas.registrar_requisicao("radar_saude", 0.1, 3, 0.01)
+        metricas.gravar_snapshot(forcar=True)
+
+        # dois workers que já terminaram (um deles com o mesmo snapshot do atual)
+        encerrado = subprocess.Popen([sys.executable, "-c", "pass"])
+        encerrado.wait()
+        atual = metricas._ler_snapshot(metricas._arquivo_processo())
+        for sufixo in ("a", "b"):
+            metricas._gravar_json(os.path.join(self.diretorio, f"{encerrado.pid}-{sufixo}.json"), atual)
+
+        total = metricas.agregar()
+
+        self.assertEqual(self._contagem(total), 3)
+        self.assertEqual(
+            sorted(n for n in os.listdir(self.diretorio) if n.endswith(".json")),
+            sorted([metricas.ARQUIVO_TOTAIS, os.path.basename(metricas._arquivo_processo())]),
+        )
+        self.assertEqual(self._contagem(metricas.agregar()), 3)
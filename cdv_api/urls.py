@@ -11,12 +11,20 @@ urlpatterns = [
     
     
     path('salvar_dados_cdv/', views.salvar_dados_cdv, name='salvar_dados_cdv'),
+    path('sincronizar_coletas/', views.sincronizar_coletas, name='sincronizar_coletas'),
     path('registrar_cdv/', views.registrar_cdv, name='registrar_cdv'),
     path('gerar_relatorio_excel/', views.gerar_relatorio_excel_page, name='gerar_relatorio_excel_page'),
     path('gerar_excel/', views.gerar_excel_estacao, name='gerar_excel_estacao'),
+    path('exportacoes/', views.solicitar_exportacao_excel, name='solicitar_exportacao_excel'),
+    path('exportacoes/<int:exportacao_id>/', views.status_exportacao_excel, name='status_exportacao_excel'),
+    path('exportacoes/<int:exportacao_id>/baixar/', views.baixar_exportacao_excel, name='baixar_exportacao_excel'),
     path('dashboard/', views.dashboard_manutencao, name='dashboard_manutencao'),
+    path('dashboard/painel/<str:secao>/', views.dashboard_painel, name='dashboard_painel'),
     path("historico_circuito/", views.historico_circuito, name="historico_circuito"),
     path('listar_rxs_circuito/', views.listar_rxs_circuito, name='listar_rxs_circuito'),
     path("radar-saude/", views.radar_saude, name="radar_saude"),
     path("buscar-temperatura-estacao/", views.buscar_temperatura_estacao, name="buscar_temperatura_estacao"),
+    path("metrics", views.metricas, name="metricas"),
+    path("importar_planilha/", views.importar_planilha_historico, name="importar_planilha_historico"),
+    path("reimportar_excel/", views.reimportar_excel_estacao, name="reimportar_excel_estacao"),
 ]
@@ -0,0 +1,49 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# CONVERSÕES DE PAYLOAD
+# =========================
+
+def safe_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _norm_manutencao(valor):
+    if not valor:
+        return "preventiva"
+
+    v = str(valor).strip().lower()
+    mapa = {
+        "preventiva": "preventiva",
+        "corretiva": "corretiva",
+        "check-list": "checklist",
+        "checklist": "checklist",
+    }
+    return mapa.get(v, "preventiva")
+
+def _pick_temp(d):
+    bruto = d.get("temp_celsius") or d.get("temperatura_local")
+    valor = safe_float(bruto)
+    logger.debug("Temperatura bruta=%r convertida=%s", bruto, valor)
+    return valor
+
+def relacao_para_float(relacao_str):
+    if not relacao_str:
+        return None
+
+    try:
+        return float(str(relacao_str).replace("%", "").replace(",", ".").strip())
+    except (ValueError, TypeError):
+        return None
@@ -1,77 +1,63 @@
 import json
 import logging
 import datetime
+import tempfile
 from collections import defaultdict
+from urllib.parse import urlencode
 
 from cdv_api.servicos.clima import obter_temperatura_estacao
-import openpyxl
+from cdv_api.servicos.cache_dashboard import obter_ou_calcular, geracoes_estacoes, versao_dados
+from cdv_api.servicos.consultas import ORDEM_MAIS_RECENTE, ultima_por_grupo
+from cdv_api.servicos.degradacao import detectar_degradacao_faixa, contar_degradacoes_por_estacao, series_tendencia
+from cdv_api.servicos.ingestao import salvar_coleta_estacao
+from cdv_api.servicos.sincronizacao import processar_lote_coletas
+from cdv_api.servicos.series import lttb
+from cdv_api.servicos.importacao_planilhas import importar_planilha
+from cdv_api.servicos.reimportacao_excel import reimportar_excel
+from cdv_api.servicos.metricas import agregar, formatar_prometheus, gravar_snapshot
+from cdv_api.servicos.exportacao import (
+    normalizar_filtros_exportacao,
+    estacoes_da_exportacao,
+    nome_arquivo_exportacao,
+    escrever_excel_estacoes,
+)
+from cdv_api.servicos.exportacao_jobs import solicitar_exportacao, caminho_arquivo
+
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Count
-from django.db.models.functions import TruncDate
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest, Trim
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.template import TemplateDoesNotExist
 from django.utils import timezone
-from openpyxl.formatting.rule import CellIsRule, FormulaRule
-from openpyxl.styles import PatternFill, Font
-from openpyxl.utils import get_column_letter
-from .models import Estacao, Transmissor, Receptor
+from django.utils.dateparse import parse_date, parse_datetime
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import Estacao, Transmissor, Receptor, LeituraAtualReceptor, ExportacaoExcel
 import unicodedata
 logger = logging.getLogger(__name__)
 
+RADAR_POR_PAGINA = 50
+
+HISTORICO_ULTIMAS = 15
+HISTORICO_MAX_PONTOS = 1000
+HISTORICO_LIMITE_PAGINA = 50000
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
 
 # =========================
 # UTILITÁRIOS
 # =========================
 
-def safe_float(value):
-    try:
-        return float(value) if value is not None else None
-    except (ValueError, TypeError):
-        return None
-
-
-def safe_int(value):
-    try:
-        return int(value) if value is not None else None
-    except (ValueError, TypeError):
-        return None
-
-
-def _norm_manutencao(valor):
-    if not valor:
-        return "preventiva"
-
-    v = str(valor).strip().lower()
-    mapa = {
-        "preventiva": "preventiva",
-        "corretiva": "corretiva",
-        "check-list": "checklist",
-        "checklist": "checklist",
-    }
-    return mapa.get(v, "preventiva")
-
-def _pick_temp(d):
-    bruto = d.get("temp_celsius") or d.get("temperatura_local")
-    print("TEMP BRUTA:", repr(bruto))
-    valor = safe_float(bruto)
-    print("TEMP CONVERTIDA:", valor)
-    return valor
-
-def relacao_para_float(relacao_str):
-    if not relacao_str:
-        return None
-
-    try:
-        return float(str(relacao_str).replace("%", "").replace(",", ".").strip())
-    except (ValueError, TypeError):
-        return None
-
-
 def ordenar_estacoes_linha(estacoes_qs):
     ordem_linha = [
         "Capão Redondo",
@@ -100,75 +86,17 @@ def ordenar_estacoes_linha(estacoes_qs):
     return estacoes
 
 
-def detectar_degradacao_faixa(receptores_queryset, qtd_leituras=3):
+def obter_receptores_atuais(receptores_queryset, leitura_atual=None):
     """
-    Detecta degradação quando a tendência sai da faixa normal (60% a 80%).
+    Último registro de cada RX (estação, circuito, RX) dentro do queryset.
 
-    Regras:
-    - usa as últimas 3 leituras por circuito
-    - se estiver em queda contínua e a última < 60 -> degradação negativa
-    - se estiver em subida contínua e a última > 80 -> degradação positiva
+    Sem filtros de data/tipo, o chamador passa o queryset equivalente de
+    LeituraAtualReceptor e a consulta lê O(circuitos) linhas em vez do histórico.
     """
-    historico_por_circuito = defaultdict(list)
+    if leitura_atual is not None:
+        return Receptor.objects.filter(id__in=leitura_atual.values("receptor_id"))
 
-    receptores_ordenados = receptores_queryset.order_by("num_circuito", "-data_manutencao", "-id")
-
-    for r in receptores_ordenados:
-        valor = relacao_para_float(r.relacao)
-        if valor is None:
-            continue
-
-        circuito = (r.num_circuito or "").strip().upper()
-
-        if len(historico_por_circuito[circuito]) < qtd_leituras:
-            historico_por_circuito[circuito].append({
-                "data": r.data_manutencao,
-                "relacao": valor,
-            })
-
-    circuitos_degradados = []
-
-    for circuito, leituras in historico_por_circuito.items():
-        if len(leituras) < qtd_leituras:
-            continue
-
-        leituras = list(reversed(leituras))  # mais antiga -> mais recente
-        valores = [item["relacao"] for item in leituras]
-
-        em_queda = all(valores[i] > valores[i + 1] for i in range(len(valores) - 1))
-        em_subida = all(valores[i] < valores[i + 1] for i in range(len(valores) - 1))
-
-        ultima = valores[-1]
-        primeira = valores[0]
-
-        if em_queda and ultima < 60:
-            circuitos_degradados.append({
-                "circuito": circuito,
-                "leituras": [round(v, 2) for v in valores],
-                "variacao_total": round(ultima - primeira, 2),
-                "ultima_relacao": round(ultima, 2),
-                "tipo_degradacao": "Negativa",
-                "status": "Abaixo de 60%",
-            })
-
-        elif em_subida and ultima > 80:
-            circuitos_degradados.append({
-                "circuito": circuito,
-                "leituras": [round(v, 2) for v in valores],
-                "variacao_total": round(ultima - primeira, 2),
-                "ultima_relacao": round(ultima, 2),
-                "tipo_degradacao": "Positiva",
-                "status": "Acima de 80%",
-            })
-
-    circuitos_degradados.sort(
-        key=lambda x: (
-            x["tipo_degradacao"] != "Negativa",
-            x["ultima_relacao"]
-        )
-    )
-
-    return circuitos_degradados
+    return ultima_por_grupo(receptores_queryset, ["estacao_id", "num_circuito", "num_receptor"])
 
 
 def classificar_relacao(valor):
@@ -264,6 +192,43 @@ def obter_sigla_estacao(nome):
 
     return SIGLAS_ESTACOES.get(nome, nome[:3].upper())
 
+def etag_leituras(request, *args, **kwargs):
+    """
+    ETag das consultas de leitura (GET condicional): parâmetros da requisição +
+    geração de dados da estação filtrada (ou de todas). Uma consulta indexada
+    decide o 304, sem montar a resposta.
+    """
+    return versao_dados(_filtros_etag(request), _geracoes_etag(request))
+
+
+def etag_pagina_leituras(request, *args, **kwargs):
+    """
+    ETag de páginas HTML com dados de leitura: além do etag_leituras, entra o
+    segredo CSRF (o token embutido na página muda a cada login) e a lista de
+    estações do menu (nomes e inclusões/remoções).
+    """
+    get_token(request)
+    filtros = {
+        **_filtros_etag(request),
+        "csrf": request.META.get("CSRF_COOKIE"),
+        "estacoes": list(Estacao.objects.order_by("id").values_list("id", "nome")),
+    }
+    return versao_dados(filtros, _geracoes_etag(request))
+
+
+def _filtros_etag(request):
+    return {
+        "view": request.path,
+        "params": sorted(request.GET.lists()),
+        "usuario": request.user.pk,
+    }
+
+
+def _geracoes_etag(request):
+    estacao_id = request.GET.get("estacao_id") or ""
+    return geracoes_estacoes([int(estacao_id)] if estacao_id.isdigit() else None)
+
+
 # =========================
 # PÁGINAS PRINCIPAIS
 # =========================
@@ -379,34 +344,72 @@ def gerar_relatorio_excel_page(request):
         },
     )
 
+def score_radar_expressao():
+    """Mesmo score de calcular_radar_saude, calculado no banco (permite ordenar e paginar lá)."""
+    base = Case(
+        When(relacao_pct__isnull=True, then=Value(0)),
+        When(relacao_pct__gte=100, then=Value(0)),
+        When(relacao_pct__gt=80, then=Value(40)),
+        When(relacao_pct__gte=60, then=Value(100)),
+        default=Value(20),
+    )
+    ajuste_temperatura = Case(
+        When(relacao_pct__isnull=True, then=Value(0)),
+        When(temp_celsius__gt=50, then=Value(-10)),
+        When(temp_celsius__lt=10, then=Value(-5)),
+        default=Value(0),
+    )
+    return Greatest(base + ajuste_temperatura, Value(0), output_field=IntegerField())
+
+
 @login_required
+@cache_control(private=True)
+@condition(etag_func=etag_pagina_leituras)
 def radar_saude(request):
-    receptores = Receptor.objects.all().order_by("num_circuito", "-data_manutencao")
+    estacao_id = request.GET.get("estacao_id") or ""
+    via = request.GET.get("via") or ""
+
+    # mesmo critério do _geracoes_etag: id não numérico é ignorado (todas as estações)
+    if not estacao_id.isdigit():
+        estacao_id = ""
+
+    leitura_atual = LeituraAtualReceptor.objects.all()
+    if estacao_id:
+        leitura_atual = leitura_atual.filter(estacao_id=estacao_id)
+    if via in ("1", "2"):
+        leitura_atual = (
+            leitura_atual
+            .annotate(circuito_limpo=Trim("num_circuito"))
+            .filter(circuito_limpo__startswith=via)
+        )
 
-    # Último registro por circuito
-    ultimo_por_circuito = {}
+    # Último registro por (estação, circuito, RX), via tabela de leituras atuais;
+    # ordenado pior → melhor no banco, só a página atual é carregada
+    atuais = (
+        obter_receptores_atuais(Receptor.objects.all(), leitura_atual)
+        .select_related("estacao")
+        .annotate(score_radar=score_radar_expressao())
+        .order_by("score_radar", "num_circuito", "num_receptor", "estacao_id")
+    )
+
+    try:
+        por_pagina = min(max(int(request.GET.get("por_pagina", RADAR_POR_PAGINA)), 1), 500)
+    except ValueError:
+        por_pagina = RADAR_POR_PAGINA
 
-    for r in receptores:
-        chave = r.num_circuito
-        if chave not in ultimo_por_circuito:
-            ultimo_por_circuito[chave] = r
+    pagina = Paginator(atuais, por_pagina).get_page(request.GET.get("pagina"))
 
     radar_lista = []
 
-    for circuito, r in ultimo_por_circuito.items():
-        rel = None
-        if r.relacao:
-            try:
-                rel = float(r.relacao.replace("%", "").replace(",", "."))
-            except:
-                pass
+    for r in pagina:
+        rel = r.relacao_pct
 
         # calcula o radar para este receptor
         radar = calcular_radar_saude(rel, r.temp_celsius)
 
         radar_lista.append({
-            "estacao": r.estacao.nome if r.estacao else "-",
-            "circuito": circuito,
+            "estacao": r.estacao.nome,
+            "circuito": r.num_circuito,
             "rx": r.num_receptor,
             "relacao": rel,
             "temperatura": r.temp_celsius,
@@ -416,20 +419,18 @@ def radar_saude(request):
             "tipo": radar["tipo"],
         })
 
-    # ordenar pior → melhor
-    radar_lista.sort(key=lambda x: x["score"])
-
-    context = {
-        "radar_saude": radar_lista
-    }
-
-    return render(request, "cdv_api/radar_saude.html", context)
-
-    # ordenar pior → melhor
-    radar_lista.sort(key=lambda x: x["score"])
+    filtros = {"estacao_id": estacao_id, "via": via}
+    if por_pagina != RADAR_POR_PAGINA:
+        filtros["por_pagina"] = por_pagina
 
     context = {
-        "radar_saude": radar_lista
+        "radar_saude": radar_lista,
+        "pagina": pagina,
+        "total": pagina.paginator.count,
+        "lista_de_estacoes": ordenar_estacoes_linha(Estacao.objects.all()),
+        "selected_estacao_id": estacao_id,
+        "via": via,
+        "filtros_query": urlencode({k: v for k, v in filtros.items() if v}),
     }
 
     return render(request, "cdv_api/radar_saude.html", context)
@@ -479,99 +480,8 @@ def salvar_dados_cdv(request):
                 status=404,
             )
 
-        hoje = timezone.localdate()
-
         with transaction.atomic():
-            # ---------- TX ----------
-            for tx in transmissores_data:
-                num_circ = tx.get("num_circuito")
-                num_tx = tx.get("num_transmissor")
-                hora = tx.get("horario_coleta")
-                temp = _pick_temp(tx)
-
-                qs = (
-                    Transmissor.objects.filter(
-                        estacao=estacao,
-                        num_circuito=num_circ,
-                        num_transmissor=num_tx,
-                        horario_coleta=hora,
-                    )
-                    .annotate(dia=TruncDate("data_manutencao"))
-                    .filter(dia=hoje)
-                )
-
-                if qs.exists():
-                    obj = qs.latest("id")
-                    if temp is not None:
-                        obj.temp_celsius = temp
-                    obj.vout = safe_float(tx.get("vout"))
-                    obj.pout = safe_float(tx.get("pout"))
-                    obj.tap = tx.get("tap")
-                    obj.tipo_transmissor = tx.get("tipo_transmissor")
-                    obj.tipo_manutencao = _norm_manutencao(tx.get("tipo_manutencao"))
-                    obj.save()
-                else:
-                    Transmissor.objects.create(
-                        estacao=estacao,
-                        num_circuito=num_circ,
-                        num_transmissor=num_tx,
-                        vout=safe_float(tx.get("vout")),
-                        pout=safe_float(tx.get("pout")),
-                        tap=tx.get("tap"),
-                        tipo_transmissor=tx.get("tipo_transmissor"),
-                        tipo_manutencao=_norm_manutencao(tx.get("tipo_manutencao")),
-                        horario_coleta=hora,
-                        temp_celsius=temp,
-                    )
-
-            # ---------- RX ----------
-            for rx in receptores_data:
-                num_circ = rx.get("num_circuito")
-                num_rx = rx.get("num_receptor")
-                hora = rx.get("horario_coleta")
-                temp = _pick_temp(rx)
-
-                iav = safe_float(rx.get("iav"))
-                ith = safe_float(rx.get("ith"))
-
-                if iav and ith and iav != 0:
-                    rel_str = f"{(ith / iav) * 100:.2f}%"
-                else:
-                    rel = safe_float(rx.get("relacao"))
-                    rel_str = f"{rel:.2f}%" if rel is not None else None
-
-                qs = (
-                    Receptor.objects.filter(
-                        estacao=estacao,
-                        num_circuito=num_circ,
-                        num_receptor=num_rx,
-                        horario_coleta=hora,
-                    )
-                    .annotate(dia=TruncDate("data_manutencao"))
-                    .filter(dia=hoje)
-                )
-
-                if qs.exists():
-                    obj = qs.latest("id")
-                    if temp is not None:
-                        obj.temp_celsius = temp
-                    obj.iav = iav
-                    obj.ith = ith
-                    obj.relacao = rel_str
-                    obj.tipo_manutencao = _norm_manutencao(rx.get("tipo_manutencao"))
-                    obj.save()
-                else:
-                    Receptor.objects.create(
-                        estacao=estacao,
-                        num_circuito=num_circ,
-                        num_receptor=num_rx,
-                        iav=iav,
-                        ith=ith,
-                        relacao=rel_str,
-                        tipo_manutencao=_norm_manutencao(rx.get("tipo_manutencao")),
-                        horario_coleta=hora,
-                        temp_celsius=temp,
-                    )
+            salvar_coleta_estacao(estacao, transmissores_data, receptores_data)
 
         return JsonResponse({"status": "success", "message": "Dados salvos com sucesso!"})
 
@@ -584,6 +494,43 @@ def salvar_dados_cdv(request):
 
 
 @login_required
+def sincronizar_coletas(request):
+    """
+    Recebe em uma única requisição as coletas enfileiradas offline pelo tablet.
+
+    Corpo em NDJSON (uma coleta por linha, cada uma com id gerado no cliente),
+    lido em streaming. Responde o resultado de cada item para o cliente
+    remover da fila o que foi aplicado ou já estava no servidor.
+    """
+    if request.method != "POST":
+        return JsonResponse(
+            {"status": "error", "message": "Método não permitido."},
+            status=405,
+        )
+
+    try:
+        resultados = processar_lote_coletas(request)
+    except Exception as e:
+        logger.exception("Erro inesperado na view sincronizar_coletas")
+        return JsonResponse(
+            {"status": "error", "message": f"Ocorreu um erro inesperado no servidor: {str(e)}"},
+            status=500,
+        )
+
+    totais = defaultdict(int)
+    for item in resultados:
+        totais[item["status"]] += 1
+
+    return JsonResponse({
+        "status": "success",
+        "totais": dict(totais),
+        "resultados": resultados,
+    })
+
+
+@login_required
+@cache_control(private=True)
+@condition(etag_func=etag_leituras)
 def listar_rxs_circuito(request):
     circuito = request.GET.get("circuito")
     estacao_id = request.GET.get("estacao_id")
@@ -610,8 +557,52 @@ def listar_rxs_circuito(request):
     })
 
 
+def _momento_param(valor, fim_do_dia=False):
+    """Aceita data (YYYY-MM-DD) ou data/hora ISO; data pura em `fim` inclui o dia todo."""
+    if not valor:
+        return None
+
+    # data pura primeiro: parse_datetime também aceita "YYYY-MM-DD" (meia-noite)
+    dia = parse_date(valor)
+    if dia is not None:
+        if fim_do_dia:
+            dia += datetime.timedelta(days=1)
+        momento = datetime.datetime.combine(dia, datetime.time.min)
+    else:
+        momento = parse_datetime(valor)
+        if momento is None:
+            raise ValueError(valor)
+
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def _epoch_us(momento):
+    return (momento - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _cursor_historico(momento, pk):
+    return f"{_epoch_us(momento)}_{pk}"
+
+
+def _ler_cursor_historico(cursor):
+    micros, pk = cursor.split("_")
+    return EPOCH + datetime.timedelta(microseconds=int(micros)), int(pk)
+
+
 @login_required
+@cache_control(private=True)
+@condition(etag_func=etag_leituras)
 def historico_circuito(request):
+    """
+    Série de relação/temperatura de um circuito (e RX), em colunas.
+
+    Sem `inicio`/`fim`/`apos` devolve as últimas HISTORICO_ULTIMAS leituras.
+    Com intervalo, percorre o histórico em ordem crescente por páginas de até
+    `limite` linhas (keyset: `apos` = cursor `proximo` da página anterior) e
+    reduz cada página a `max_pontos` pontos com LTTB.
+    """
     circuito = request.GET.get("circuito")
     rx = request.GET.get("rx")
     estacao_id = request.GET.get("estacao_id")
@@ -632,31 +623,61 @@ def historico_circuito(request):
         except ValueError:
             return JsonResponse({"erro": "RX inválido"}, status=400)
 
-    receptores = receptores.order_by("-data_manutencao", "-id")[:15]
-    receptores = list(reversed(receptores))
-
-    datas = []
-    relacoes = []
-    temperaturas = []
+    try:
+        inicio = _momento_param(request.GET.get("inicio"))
+        fim = _momento_param(request.GET.get("fim"), fim_do_dia=True)
+        apos = request.GET.get("apos")
+        apos = _ler_cursor_historico(apos) if apos else None
+        max_pontos = int(request.GET.get("max_pontos") or HISTORICO_MAX_PONTOS)
+        limite = int(request.GET.get("limite") or HISTORICO_LIMITE_PAGINA)
+    except (ValueError, OverflowError):
+        return JsonResponse({"erro": "Parâmetros de intervalo inválidos"}, status=400)
+
+    max_pontos = min(max(max_pontos, 2), HISTORICO_MAX_PONTOS)
+    limite = min(max(limite, 1), HISTORICO_LIMITE_PAGINA)
+
+    receptores = receptores.filter(relacao_pct__isnull=False)
+    campos = ("id", "data_manutencao", "relacao_pct", "temp_celsius")
+    proximo = None
+
+    if inicio is None and fim is None and apos is None:
+        linhas = list(receptores.order_by("-data_manutencao", "-id").values_list(*campos)[:HISTORICO_ULTIMAS])
+        linhas.reverse()
+    else:
+        if inicio is not None:
+            receptores = receptores.filter(data_manutencao__gte=inicio)
+        if fim is not None:
+            receptores = receptores.filter(data_manutencao__lt=fim)
+        if apos is not None:
+            momento, pk = apos
+            receptores = receptores.filter(
+                Q(data_manutencao__gt=momento) | Q(data_manutencao=momento, id__gt=pk)
+            )
 
-    for r in receptores:
-        valor_relacao = relacao_para_float(r.relacao)
-        if valor_relacao is None:
-            continue
+        linhas = list(receptores.order_by("data_manutencao", "id").values_list(*campos)[:limite + 1])
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo = _cursor_historico(linhas[-1][1], linhas[-1][0])
 
-        data_txt = r.data_manutencao.strftime("%d/%m/%Y")
-        hora_txt = r.horario_coleta.strftime("%H:%M") if r.horario_coleta else "--:--"
+    # `t` vem do mesmo campo da ordenação: o eixo x do LTTB precisa ser crescente
+    instantes = [int(data.timestamp()) for _, data, _, _ in linhas]
+    relacoes = [relacao for _, _, relacao, _ in linhas]
+    temperaturas = [temp for _, _, _, temp in linhas]
 
-        datas.append(f"{data_txt} {hora_txt}")
-        relacoes.append(valor_relacao)
-        temperaturas.append(float(r.temp_celsius) if r.temp_celsius is not None else None)
+    if len(linhas) > max_pontos:
+        indices = lttb(instantes, relacoes, max_pontos)
+        instantes = [instantes[i] for i in indices]
+        relacoes = [relacoes[i] for i in indices]
+        temperaturas = [temperaturas[i] for i in indices]
 
     return JsonResponse({
-        "datas": datas,
-        "relacoes": relacoes,
-        "temperaturas": temperaturas,
         "circuito": circuito,
         "rx": rx_num,
+        "t": instantes,
+        "relacao": relacoes,
+        "temperatura": temperaturas,
+        "leituras": len(linhas),
+        "proximo": proximo,
     })
 
 
@@ -666,278 +687,115 @@ def historico_circuito(request):
 
 @login_required
 def gerar_excel_estacao(request):
-    estacao_id = request.GET.get("estacao_id")
-    circuito_filtro = request.GET.get("circuito_filtro")
-    data_inicio_str = request.GET.get("data_inicio")
-    data_fim_str = request.GET.get("data_fim")
-    tipo_manutencao_raw = request.GET.get("tipo_manutencao")
-
-    def norm_tipo(val):
-        if not val:
-            return None
-        v = val.strip().lower()
-        if v.startswith("prevent"):
-            return "preventiva"
-        if v.startswith("corret"):
-            return "corretiva"
-        if v.startswith("check"):
-            return "checklist"
-        return None
+    filtros = normalizar_filtros_exportacao(request.GET)
+    estacoes = estacoes_da_exportacao(filtros)
 
-    def _parse_date(s):
-        try:
-            return timezone.datetime.strptime(s, "%Y-%m-%d").date()
-        except Exception:
-            return None
-
-    def sanitize_sheet_title(title):
-        invalid = ['\\', '/', '*', '?', ':', '[', ']']
-        for ch in invalid:
-            title = title.replace(ch, "-")
-        return title[:31]
-
-    def aplicar_largura_colunas(ws):
-        for col in ws.columns:
-            max_len = 0
-            col_letter = get_column_letter(col[0].column)
-            for cell in col:
-                v = cell.value
-                l = len(str(v)) if v is not None else 0
-                max_len = max(max_len, l)
-            ws.column_dimensions[col_letter].width = min(max_len + 2, 30)
-
-    def aplicar_formatacao_relacao(ws, linha_inicio, linha_fim, col_idx=6):
-        if linha_fim < linha_inicio:
-            return
-
-        col_rel = get_column_letter(col_idx)
-
-        for row in range(linha_inicio, linha_fim + 1):
-            ws[f"{col_rel}{row}"].number_format = "0.00%"
-
-        intervalo = f"{col_rel}{linha_inicio}:{col_rel}{linha_fim}"
-        fill_red = PatternFill(start_color="FFFFC7CE", end_color="FFFFC7CE", fill_type="solid")
-        font_red = Font(color="FF9C0006")
-        fill_green = PatternFill(start_color="FFC6EFCE", end_color="FFC6EFCE", fill_type="solid")
-        font_green = Font(color="FF006100")
-
-        ws.conditional_formatting.add(
-            intervalo,
-            CellIsRule(operator="lessThan", formula=["0.6"], fill=fill_red, font=font_red)
-        )
-        ws.conditional_formatting.add(
-            intervalo,
-            CellIsRule(operator="greaterThan", formula=["0.8"], fill=fill_red, font=font_red)
-        )
-        ws.conditional_formatting.add(
-            intervalo,
-            FormulaRule(
-                formula=[f"AND({col_rel}{linha_inicio}>=0.6,{col_rel}{linha_inicio}<=0.8)"],
-                fill=fill_green,
-                font=font_green,
-            )
-        )
+    if not estacoes.exists():
+        if filtros["estacao_id"] or filtros["estacao_invalida"]:
+            messages.error(request, "Estação selecionada não foi encontrada.")
+        else:
+            messages.error(request, "Nenhuma estação cadastrada foi encontrada.")
+        return redirect("gerar_relatorio_excel_page")
 
-    def aplicar_formatacao_temperatura(ws, col_idx, linha_inicio, linha_fim):
-        if linha_fim < linha_inicio:
-            return
+    nome_arquivo = nome_arquivo_exportacao(filtros, estacoes)
 
-        col_letter = get_column_letter(col_idx)
-        for row in range(linha_inicio, linha_fim + 1):
-            ws[f"{col_letter}{row}"].number_format = "0.0"
+    # Workbook write-only gravado em arquivo temporário e enviado em streaming:
+    # a memória do worker não cresce com o número de linhas.
+    arquivo = tempfile.SpooledTemporaryFile(max_size=settings.EXPORTACAO_SPOOL_MAX_BYTES)
+    total_abas_criadas = escrever_excel_estacoes(estacoes, filtros, arquivo)
 
-    tipo_manutencao = norm_tipo(tipo_manutencao_raw)
-    data_inicio = _parse_date(data_inicio_str) if data_inicio_str else None
-    data_fim = _parse_date(data_fim_str) if data_fim_str else None
+    if total_abas_criadas == 0:
+        arquivo.close()
+        messages.error(request, "Nenhum dado encontrado para os filtros selecionados.")
+        return redirect("gerar_relatorio_excel_page")
 
-    if estacao_id:
-        estacoes = Estacao.objects.filter(id=estacao_id).order_by("nome")
-        if not estacoes.exists():
-            messages.error(request, "Estação selecionada não foi encontrada.")
-            return redirect("gerar_relatorio_excel_page")
-        nome_arquivo = f"dados_estacao_{estacoes.first().nome}.xlsx"
-    else:
-        estacoes = Estacao.objects.all().order_by("nome")
-        nome_arquivo = "dados_todas_estacoes.xlsx"
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=nome_arquivo,
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
 
-    if not estacoes.exists():
-        messages.error(request, "Nenhuma estação cadastrada foi encontrada.")
-        return redirect("gerar_relatorio_excel_page")
 
-    wb = openpyxl.Workbook()
-    ws_default = wb.active
-    wb.remove(ws_default)
+def _exportacao_json(exportacao):
+    dados = {
+        "id": exportacao.id,
+        "status": exportacao.status,
+        "progresso": exportacao.progresso,
+        "linhas_total": exportacao.linhas_total,
+        "linhas_escritas": exportacao.linhas_escritas,
+        "nome_arquivo": exportacao.nome_arquivo,
+    }
+    if exportacao.status == "concluido":
+        dados["url_download"] = reverse("baixar_exportacao_excel", args=[exportacao.id])
+    if exportacao.status == "erro":
+        dados["erro"] = exportacao.erro
+    return dados
 
-    total_abas_criadas = 0
 
-    for estacao in estacoes:
-        transmissores = Transmissor.objects.filter(estacao=estacao)
-        receptores = Receptor.objects.filter(estacao=estacao)
+@login_required
+def solicitar_exportacao_excel(request):
+    """Enfileira a exportação para o worker (ou devolve o job/arquivo já existente para os mesmos filtros)."""
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "Método não permitido."}, status=405)
 
-        if circuito_filtro:
-            transmissores = transmissores.filter(num_circuito__icontains=circuito_filtro)
-            receptores = receptores.filter(num_circuito__icontains=circuito_filtro)
-
-        if tipo_manutencao in {"preventiva", "corretiva", "checklist"}:
-            transmissores = transmissores.filter(tipo_manutencao=tipo_manutencao)
-            receptores = receptores.filter(tipo_manutencao=tipo_manutencao)
-
-        if data_inicio and data_fim:
-            data_fim_ajustada = data_fim + timezone.timedelta(days=1)
-            transmissores = transmissores.filter(
-                data_manutencao__date__gte=data_inicio,
-                data_manutencao__date__lt=data_fim_ajustada,
-            )
-            receptores = receptores.filter(
-                data_manutencao__date__gte=data_inicio,
-                data_manutencao__date__lt=data_fim_ajustada,
-            )
-        elif data_inicio:
-            transmissores = transmissores.filter(data_manutencao__date__gte=data_inicio)
-            receptores = receptores.filter(data_manutencao__date__gte=data_inicio)
-        elif data_fim:
-            data_fim_ajustada = data_fim + timezone.timedelta(days=1)
-            transmissores = transmissores.filter(data_manutencao__date__lt=data_fim_ajustada)
-            receptores = receptores.filter(data_manutencao__date__lt=data_fim_ajustada)
-
-        transmissores = list(
-            transmissores.exclude(temp_celsius__isnull=True).order_by(
-                "data_manutencao", "horario_coleta", "id"
-            )
-        )
-        receptores = list(
-            receptores.exclude(temp_celsius__isnull=True).order_by(
-                "data_manutencao", "horario_coleta", "id"
-            )
-        )
+    try:
+        exportacao = solicitar_exportacao(request.POST, request.user)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
 
-        if not transmissores and not receptores:
-            continue
+    return JsonResponse(_exportacao_json(exportacao))
 
-        ws = wb.create_sheet(title=sanitize_sheet_title(estacao.nome))
-        total_abas_criadas += 1
-
-        ws["A1"] = f"ESTAÇÃO: {estacao.nome}"
-        linha_atual = 3
-
-        if transmissores:
-            ws.cell(row=linha_atual, column=1, value="TRANSMISSORES (TX)")
-            linha_atual += 1
-
-            headers_tx = [
-                "Estação", "Circuito", "TX", "VOUT", "POUT", "TAP", "Tipo TX",
-                "Tipo Manutenção", "Data", "Horário Coleta", "Temp. (Celsius)"
-            ]
-            for col_idx, header in enumerate(headers_tx, start=1):
-                ws.cell(row=linha_atual, column=col_idx, value=header)
-
-            linha_inicio_tx = linha_atual + 1
-            linha_atual += 1
-
-            for t in transmissores:
-                dt = timezone.localtime(t.data_manutencao) if t.data_manutencao else None
-                data_fmt = dt.strftime("%d/%m/%Y") if dt else "-"
-                hora_fmt = t.horario_coleta.strftime("%H:%M") if t.horario_coleta else "-"
-
-                ws.append([
-                    estacao.nome,
-                    t.num_circuito,
-                    safe_int(t.num_transmissor),
-                    t.vout,
-                    t.pout,
-                    safe_int(t.tap),
-                    t.tipo_transmissor,
-                    t.tipo_manutencao,
-                    data_fmt,
-                    hora_fmt,
-                    t.temp_celsius,
-                ])
-                linha_atual += 1
-
-            linha_fim_tx = linha_atual - 1
-            aplicar_formatacao_temperatura(ws, 11, linha_inicio_tx, linha_fim_tx)
-            linha_atual += 2
-
-        if receptores:
-            ws.cell(row=linha_atual, column=1, value="RECEPTORES (RX)")
-            linha_atual += 1
-
-            headers_rx = [
-                "Estação", "Circuito", "RX", "IAV", "ITH", "Relação", "Tipo Manutenção",
-                "Data", "Horário Coleta", "Temp. (Celsius)"
-            ]
-            for col_idx, header in enumerate(headers_rx, start=1):
-                ws.cell(row=linha_atual, column=col_idx, value=header)
-
-            linha_inicio_rx = linha_atual + 1
-            linha_atual += 1
-
-            for r in receptores:
-                dt = timezone.localtime(r.data_manutencao) if r.data_manutencao else None
-                data_fmt = dt.strftime("%d/%m/%Y") if dt else "-"
-                hora_fmt = r.horario_coleta.strftime("%H:%M") if r.horario_coleta else "-"
-
-                rel_excel = None
-                if r.relacao and str(r.relacao).replace("%", "").strip():
-                    try:
-                        rel_excel = float(str(r.relacao).replace("%", "")) / 100.0
-                    except ValueError:
-                        rel_excel = None
-
-                ws.append([
-                    estacao.nome,
-                    r.num_circuito,
-                    safe_int(r.num_receptor),
-                    r.iav,
-                    r.ith,
-                    rel_excel,
-                    r.tipo_manutencao,
-                    data_fmt,
-                    hora_fmt,
-                    r.temp_celsius,
-                ])
-                linha_atual += 1
-
-            linha_fim_rx = linha_atual - 1
-            aplicar_formatacao_relacao(ws, linha_inicio_rx, linha_fim_rx, col_idx=6)
-            aplicar_formatacao_temperatura(ws, 10, linha_inicio_rx, linha_fim_rx)
-
-        aplicar_largura_colunas(ws)
 
-    if total_abas_criadas == 0:
-        messages.error(request, "Nenhum dado encontrado para os filtros selecionados.")
+@login_required
+def status_exportacao_excel(request, exportacao_id):
+    exportacao = get_object_or_404(ExportacaoExcel, id=exportacao_id)
+    return JsonResponse(_exportacao_json(exportacao))
+
+
+@login_required
+def baixar_exportacao_excel(request, exportacao_id):
+    exportacao = get_object_or_404(ExportacaoExcel, id=exportacao_id, status="concluido")
+    caminho = caminho_arquivo(exportacao)
+
+    if not caminho or not caminho.exists():
+        messages.error(request, "Arquivo da exportação não está mais disponível. Gere novamente.")
         return redirect("gerar_relatorio_excel_page")
 
-    resp = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return FileResponse(
+        open(caminho, "rb"),
+        as_attachment=True,
+        filename=exportacao.nome_arquivo,
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
-    resp["Content-Disposition"] = f'attachment; filename="{nome_arquivo}"'
-    wb.save(resp)
-    return resp
 
 
 # =========================
 # DASHBOARD
 # =========================
-@login_required
-def dashboard_manutencao(request):
-    estacao_id = request.GET.get("estacao_id")
-    circuito_filtro = request.GET.get("circuito_filtro")
-    data_inicio = request.GET.get("data_inicio")
-    data_fim = request.GET.get("data_fim")
-    tipo_manutencao = request.GET.get("tipo_manutencao")
+def filtros_dashboard(params):
+    return {
+        "estacao_id": params.get("estacao_id") or "",
+        "circuito_filtro": params.get("circuito_filtro") or "",
+        "data_inicio": params.get("data_inicio") or "",
+        "data_fim": params.get("data_fim") or "",
+        "tipo_manutencao": params.get("tipo_manutencao") or "",
+    }
 
-    lista_de_estacoes = ordenar_estacoes_linha(Estacao.objects.all())
+
+def _querysets_dashboard(estacao, filtros):
+    """TX, RX (histórico filtrado) e último registro de cada RX para os filtros do painel."""
+    circuito_filtro = filtros["circuito_filtro"]
+    data_inicio = filtros["data_inicio"]
+    data_fim = filtros["data_fim"]
+    tipo_manutencao = filtros["tipo_manutencao"]
 
     transmissores = Transmissor.objects.all()
     receptores = Receptor.objects.all()
 
-    estacao_nome = None
-
     # FILTROS
-    if estacao_id:
-        estacao = get_object_or_404(Estacao, id=estacao_id)
-        estacao_nome = estacao.nome
+    if estacao:
         transmissores = transmissores.filter(estacao=estacao)
         receptores = receptores.filter(estacao=estacao)
 
@@ -950,29 +808,31 @@ def dashboard_manutencao(request):
         receptores = receptores.filter(tipo_manutencao=tipo_manutencao)
 
     if data_inicio:
-        transmissores = transmissores.filter(data_manutencao__date__gte=data_inicio)
-        receptores = receptores.filter(data_manutencao__date__gte=data_inicio)
+        transmissores = transmissores.filter(data_coleta__gte=data_inicio)
+        receptores = receptores.filter(data_coleta__gte=data_inicio)
 
     if data_fim:
-        transmissores = transmissores.filter(data_manutencao__date__lte=data_fim)
-        receptores = receptores.filter(data_manutencao__date__lte=data_fim)
+        transmissores = transmissores.filter(data_coleta__lte=data_fim)
+        receptores = receptores.filter(data_coleta__lte=data_fim)
 
     # ÚLTIMO REGISTRO DE CADA RX
-    receptores_atuais_ids = list(
-        receptores
-        .order_by(
-            "estacao_id",
-            "num_circuito",
-            "num_receptor",
-            "-data_manutencao",
-            "-horario_coleta",
-            "-id",
-        )
-        .distinct("estacao_id", "num_circuito", "num_receptor")
-        .values_list("id", flat=True)
-    )
+    filtro_historico = bool(data_inicio or data_fim or tipo_manutencao)
+
+    leitura_atual = None
+    if not filtro_historico:
+        leitura_atual = LeituraAtualReceptor.objects.all()
+        if estacao:
+            leitura_atual = leitura_atual.filter(estacao=estacao)
+        if circuito_filtro:
+            leitura_atual = leitura_atual.filter(num_circuito__icontains=circuito_filtro)
+
+    receptores_atuais = obter_receptores_atuais(receptores, leitura_atual)
+
+    return transmissores, receptores, receptores_atuais
+
 
-    receptores_atuais = Receptor.objects.filter(id__in=receptores_atuais_ids)
+def _painel_contagens(estacao, filtros):
+    transmissores, receptores, receptores_atuais = _querysets_dashboard(estacao, filtros)
 
     # TOTAIS
     total_tx = transmissores.count()
@@ -1015,28 +875,20 @@ def dashboard_manutencao(request):
             tipo_labels.append(tipo)
             tipo_data.append(total)
 
-    # ÚLTIMOS RX / TX
-    ultimos_tx = transmissores.order_by("-data_manutencao", "-id")[:10]
-
-    ultimos_rx_qs = receptores_atuais.order_by("-data_manutencao", "-horario_coleta", "-id")[:10]
-    ultimos_rx = []
-
-    for item in ultimos_rx_qs:
-        valor_relacao = relacao_para_float(item.relacao)
+    return {
+        "total_tx": total_tx,
+        "total_rx": total_rx,
+        "tx_labels": [x["num_circuito"] for x in tx_por_circuito],
+        "tx_data": [x["total"] for x in tx_por_circuito],
+        "rx_labels": [x["num_circuito"] for x in rx_por_circuito],
+        "rx_data": [x["total"] for x in rx_por_circuito],
+        "tipo_labels": tipo_labels,
+        "tipo_data": tipo_data,
+    }
 
-        if valor_relacao is None:
-            classe_relacao = ""
-        elif valor_relacao < 60:
-            classe_relacao = "relacao-baixa"
-        elif valor_relacao > 80:
-            classe_relacao = "relacao-alta"
-        else:
-            classe_relacao = "relacao-normal"
 
-        ultimos_rx.append({
-            "obj": item,
-            "classe_relacao": classe_relacao,
-        })
+def _painel_relacao(estacao, filtros):
+    _, _, receptores_atuais = _querysets_dashboard(estacao, filtros)
 
     # CONTAGEM POR CIRCUITO (PIOR RX ATUAL)
     relacoes_por_circuito = {}
@@ -1044,18 +896,19 @@ def dashboard_manutencao(request):
     contagem_entre_60_80 = 0
     contagem_acima_80 = 0
 
-    receptores_ordenados = receptores_atuais.order_by("num_circuito", "num_receptor")
+    receptores_ordenados = (
+        receptores_atuais
+        .filter(relacao_pct__isnull=False)
+        .order_by("num_circuito", "num_receptor")
+    )
     agrupamento_circuitos = defaultdict(list)
 
     for r in receptores_ordenados:
         circuito = (r.num_circuito or "").strip().upper()
-        valor = relacao_para_float(r.relacao)
-
-        if valor is not None:
-            agrupamento_circuitos[circuito].append({
-                "obj": r,
-                "relacao": valor,
-            })
+        agrupamento_circuitos[circuito].append({
+            "obj": r,
+            "relacao": r.relacao_pct,
+        })
 
     for circuito, itens in agrupamento_circuitos.items():
         if not itens:
@@ -1109,13 +962,10 @@ def dashboard_manutencao(request):
 
     ultimo_rx_por_circuito = {}
 
-    for r in receptores_atuais:
+    for r in receptores_atuais.filter(relacao_pct__isnull=False):
         circuito = (r.num_circuito or "").strip().upper()
         rx = r.num_receptor
-        valor = relacao_para_float(r.relacao)
-
-        if valor is None:
-            continue
+        valor = r.relacao_pct
 
         ultimo_rx_por_circuito[(circuito, rx)] = {
             "circuito": circuito,
@@ -1148,6 +998,31 @@ def dashboard_manutencao(request):
             relacao_circuitos_v2.append(item["circuito"])
             relacao_rxs_v2.append(item["rx"])
 
+    return {
+        "contagem_abaixo_60": contagem_abaixo_60,
+        "contagem_entre_60_80": contagem_entre_60_80,
+        "contagem_acima_80": contagem_acima_80,
+        "circuitos": lista_relacoes,
+        "via1": {
+            "labels": relacao_labels_v1,
+            "data": relacao_data_v1,
+            "cores": relacao_cores_v1,
+            "circuitos": relacao_circuitos_v1,
+            "rxs": relacao_rxs_v1,
+        },
+        "via2": {
+            "labels": relacao_labels_v2,
+            "data": relacao_data_v2,
+            "cores": relacao_cores_v2,
+            "circuitos": relacao_circuitos_v2,
+            "rxs": relacao_rxs_v2,
+        },
+    }
+
+
+def _painel_degradacao(estacao, filtros):
+    _, receptores, _ = _querysets_dashboard(estacao, filtros)
+
     # DEGRADAÇÃO GRADUAL (mantém histórico completo)
     circuitos_em_degradacao = detectar_degradacao_faixa(receptores)
 
@@ -1161,90 +1036,21 @@ def dashboard_manutencao(request):
         if item["tipo_degradacao"] == "Positiva"
     )
 
-    # MAPA DAS ESTAÇÕES
-    estacoes_mapa = []
-    todas_estacoes = ordenar_estacoes_linha(Estacao.objects.all())
-
-    for est in todas_estacoes:
-        rx_est = Receptor.objects.filter(estacao=est)
-
-        if data_inicio:
-            rx_est = rx_est.filter(data_manutencao__date__gte=data_inicio)
-
-        if data_fim:
-            rx_est = rx_est.filter(data_manutencao__date__lte=data_fim)
-
-        if tipo_manutencao:
-            rx_est = rx_est.filter(tipo_manutencao=tipo_manutencao)
-
-        if circuito_filtro:
-            rx_est = rx_est.filter(num_circuito__icontains=circuito_filtro)
-
-        rx_est_atuais_ids = list(
-            rx_est
-            .order_by(
-                "estacao_id",
-                "num_circuito",
-                "num_receptor",
-                "-data_manutencao",
-                "-horario_coleta",
-                "-id",
-            )
-            .distinct("estacao_id", "num_circuito", "num_receptor")
-            .values_list("id", flat=True)
-        )
-
-        rx_est_atuais = Receptor.objects.filter(id__in=rx_est_atuais_ids)
-
-        relacoes_est = []
-        for r in rx_est_atuais:
-            valor = relacao_para_float(r.relacao)
-            if valor is not None:
-                relacoes_est.append(valor)
-
-        degradacoes_est = detectar_degradacao_faixa(rx_est)
-        qtd_criticos = sum(1 for v in relacoes_est if v < 60 or v > 80)
-
-        if qtd_criticos > 0:
-            status = "critico"
-        elif len(degradacoes_est) > 0:
-            status = "atencao"
-        else:
-            status = "normal"
-
-        estacoes_mapa.append({
-            "id": est.id,
-            "nome": est.nome,
-            "sigla": obter_sigla_estacao(est.nome),
-            "status": status,
-            "qtd_criticos": qtd_criticos,
-            "qtd_degradacoes": len(degradacoes_est),
-        })
-
-    # GRÁFICO DE TENDÊNCIA DE DEGRADAÇÃO
+    # GRÁFICO DE TENDÊNCIA DE DEGRADAÇÃO (uma consulta, últimos pontos de cada circuito)
     degradacao_datasets = []
+    series = series_tendencia(receptores, [item["circuito"] for item in circuitos_em_degradacao])
 
     for item in circuitos_em_degradacao:
         circuito = (item.get("circuito") or "").strip()
 
-        qs = (
-            receptores
-            .filter(num_circuito__iexact=circuito)
-            .order_by("data_manutencao", "horario_coleta", "id")
-        )
-
         labels = []
         values = []
 
-        for r in qs:
-            valor = relacao_para_float(r.relacao)
-            if valor is None:
-                continue
-
-            if r.horario_coleta:
-                tempo = f"{r.data_manutencao.strftime('%d/%m/%Y')} {r.horario_coleta.strftime('%H:%M')}"
+        for data_manutencao, horario_coleta, valor in series.get(circuito, []):
+            if horario_coleta:
+                tempo = f"{data_manutencao.strftime('%d/%m/%Y')} {horario_coleta.strftime('%H:%M')}"
             else:
-                tempo = r.data_manutencao.strftime('%d/%m/%Y')
+                tempo = data_manutencao.strftime('%d/%m/%Y')
 
             labels.append(tempo)
             values.append(round(valor, 2))
@@ -1266,57 +1072,172 @@ def dashboard_manutencao(request):
             "tension": 0.35,
         })
 
-    context = {
-        "lista_de_estacoes": lista_de_estacoes,
-        "selected_estacao_id": str(estacao_id) if estacao_id else "",
-        "estacao_nome": estacao_nome,
-        "estacoes_mapa": estacoes_mapa,
+    return {
+        "circuitos": circuitos_em_degradacao,
+        "total_degradacao_gradual": len(circuitos_em_degradacao),
+        "total_degradacao_negativa": total_degradacao_negativa,
+        "total_degradacao_positiva": total_degradacao_positiva,
+        "datasets": degradacao_datasets,
+    }
 
-        "circuito_filtro": circuito_filtro or "",
-        "tipo_manutencao": tipo_manutencao or "",
-        "data_inicio": data_inicio or "",
-        "data_fim": data_fim or "",
 
-        "total_tx": total_tx,
-        "total_rx": total_rx,
+def _painel_ultimos(estacao, filtros):
+    transmissores, _, receptores_atuais = _querysets_dashboard(estacao, filtros)
 
-        "tx_labels": json.dumps([x["num_circuito"] for x in tx_por_circuito]),
-        "tx_data": json.dumps([x["total"] for x in tx_por_circuito]),
+    ultimos_tx = [
+        {
+            "circuito": tx.num_circuito,
+            "tx": tx.num_transmissor,
+            "data": timezone.localtime(tx.data_manutencao).strftime("%d/%m/%Y %H:%M"),
+            "vout": tx.vout,
+            "pout": tx.pout,
+        }
+        for tx in transmissores.order_by("-data_manutencao", "-id")[:10]
+    ]
 
-        "rx_labels": json.dumps([x["num_circuito"] for x in rx_por_circuito]),
-        "rx_data": json.dumps([x["total"] for x in rx_por_circuito]),
+    ultimos_rx = []
 
-        "tipo_labels": json.dumps(tipo_labels),
-        "tipo_data": json.dumps(tipo_data),
+    for item in receptores_atuais.order_by(*ORDEM_MAIS_RECENTE)[:10]:
+        _, classe_relacao = classificar_relacao(item.relacao_pct)
 
-        "relacao_labels_v1": json.dumps(relacao_labels_v1),
-        "relacao_data_v1": json.dumps(relacao_data_v1),
-        "relacao_cores_v1": json.dumps(relacao_cores_v1),
-        "relacao_circuitos_v1": json.dumps(relacao_circuitos_v1),
-        "relacao_rxs_v1": json.dumps(relacao_rxs_v1),
+        ultimos_rx.append({
+            "circuito": item.num_circuito,
+            "rx": item.num_receptor,
+            "data": timezone.localtime(item.data_manutencao).strftime("%d/%m/%Y %H:%M"),
+            "relacao": item.relacao_pct,
+            "classe_relacao": classe_relacao,
+        })
 
-        "relacao_labels_v2": json.dumps(relacao_labels_v2),
-        "relacao_data_v2": json.dumps(relacao_data_v2),
-        "relacao_cores_v2": json.dumps(relacao_cores_v2),
-        "relacao_circuitos_v2": json.dumps(relacao_circuitos_v2),
-        "relacao_rxs_v2": json.dumps(relacao_rxs_v2),
+    return {"tx": ultimos_tx, "rx": ultimos_rx}
 
-        "contagem_abaixo_60": contagem_abaixo_60,
-        "contagem_entre_60_80": contagem_entre_60_80,
-        "contagem_acima_80": contagem_acima_80,
 
-        "circuitos_em_degradacao": circuitos_em_degradacao,
-        "total_degradacao_gradual": len(circuitos_em_degradacao),
-        "total_degradacao_negativa": total_degradacao_negativa,
-        "total_degradacao_positiva": total_degradacao_positiva,
+def _mapa_estacoes(estacoes, filtros):
+    """Status de todas as estações, com os mesmos filtros do painel exceto a estação."""
+    circuito_filtro = filtros["circuito_filtro"]
+    data_inicio = filtros["data_inicio"]
+    data_fim = filtros["data_fim"]
+    tipo_manutencao = filtros["tipo_manutencao"]
+    filtro_historico = bool(data_inicio or data_fim or tipo_manutencao)
+
+    rx_mapa = Receptor.objects.all()
+
+    if data_inicio:
+        rx_mapa = rx_mapa.filter(data_coleta__gte=data_inicio)
 
-        "degradacao_datasets": json.dumps(degradacao_datasets),
+    if data_fim:
+        rx_mapa = rx_mapa.filter(data_coleta__lte=data_fim)
+
+    if tipo_manutencao:
+        rx_mapa = rx_mapa.filter(tipo_manutencao=tipo_manutencao)
+
+    if circuito_filtro:
+        rx_mapa = rx_mapa.filter(num_circuito__icontains=circuito_filtro)
 
-        "ultimos_tx": ultimos_tx,
-        "ultimos_rx": ultimos_rx,
+    leitura_atual_mapa = None
+    if not filtro_historico:
+        leitura_atual_mapa = LeituraAtualReceptor.objects.all()
+        if circuito_filtro:
+            leitura_atual_mapa = leitura_atual_mapa.filter(num_circuito__icontains=circuito_filtro)
+
+    criticos_por_estacao = dict(
+        obter_receptores_atuais(rx_mapa, leitura_atual_mapa)
+        .filter(Q(relacao_pct__lt=60) | Q(relacao_pct__gt=80))
+        .values("estacao_id")
+        .annotate(total=Count("id"))
+        .values_list("estacao_id", "total")
+    )
+    degradacoes_por_estacao = contar_degradacoes_por_estacao(rx_mapa)
+
+    estacoes_mapa = []
+
+    for est in estacoes:
+        qtd_criticos = criticos_por_estacao.get(est.id, 0)
+        qtd_degradacoes = degradacoes_por_estacao.get(est.id, 0)
+
+        if qtd_criticos > 0:
+            status = "critico"
+        elif qtd_degradacoes > 0:
+            status = "atencao"
+        else:
+            status = "normal"
+
+        estacoes_mapa.append({
+            "id": est.id,
+            "nome": est.nome,
+            "sigla": obter_sigla_estacao(est.nome),
+            "status": status,
+            "qtd_criticos": qtd_criticos,
+            "qtd_degradacoes": qtd_degradacoes,
+        })
+
+    return {"estacoes": estacoes_mapa}
+
+
+# seção -> (função, depende só da estação selecionada?)
+PAINEIS_DASHBOARD = {
+    "mapa": (_mapa_estacoes, False),
+    "contagens": (_painel_contagens, True),
+    "relacao": (_painel_relacao, True),
+    "degradacao": (_painel_degradacao, True),
+    "ultimos": (_painel_ultimos, True),
+}
+
+
+@login_required
+def dashboard_manutencao(request):
+    # Só o esqueleto da página; cada painel é buscado em paralelo por dashboard_painel
+    filtros = filtros_dashboard(request.GET)
+
+    lista_de_estacoes = ordenar_estacoes_linha(Estacao.objects.all())
+
+    estacao = None
+    if filtros["estacao_id"]:
+        estacao = get_object_or_404(Estacao, id=filtros["estacao_id"])
+
+    context = {
+        "lista_de_estacoes": lista_de_estacoes,
+        "selected_estacao_id": str(estacao.id) if estacao else "",
+        "estacao_nome": estacao.nome if estacao else None,
+
+        "circuito_filtro": filtros["circuito_filtro"],
+        "tipo_manutencao": filtros["tipo_manutencao"],
+        "data_inicio": filtros["data_inicio"],
+        "data_fim": filtros["data_fim"],
     }
 
     return render(request, "cdv_api/dashboard_manutencao.html", context)
+
+
+@login_required
+def dashboard_painel(request, secao):
+    if secao not in PAINEIS_DASHBOARD:
+        return JsonResponse({"erro": "Painel inexistente."}, status=404)
+
+    calcular, por_estacao = PAINEIS_DASHBOARD[secao]
+    filtros = filtros_dashboard(request.GET)
+
+    estacao = None
+    if filtros["estacao_id"]:
+        try:
+            estacao = Estacao.objects.get(id=int(filtros["estacao_id"]))
+        except (ValueError, Estacao.DoesNotExist):
+            return JsonResponse({"erro": "Estação não encontrada."}, status=404)
+        filtros["estacao_id"] = estacao.id
+
+    # cada seção só é recalculada quando mudam os dados das estações de que depende
+    if por_estacao:
+        dados = obter_ou_calcular(
+            secao, filtros, [estacao.id] if estacao else None,
+            lambda: calcular(estacao, filtros),
+        )
+    else:
+        filtros_mapa = {**filtros, "estacao_id": ""}
+        dados = obter_ou_calcular(
+            secao, filtros_mapa, None,
+            lambda: calcular(ordenar_estacoes_linha(Estacao.objects.all()), filtros_mapa),
+        )
+
+    return JsonResponse(dados)
         
 @login_required
 def buscar_temperatura_estacao(request):
@@ -1354,4 +1275,71 @@ def buscar_temperatura_estacao(request):
         return JsonResponse({
             "ok": False,
             "erro": str(e),
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+# =========================
+# MÉTRICAS
+# =========================
+
+@staff_member_required
+def metricas(request):
+    """Histogramas por view de todos os workers, no formato texto do Prometheus."""
+    gravar_snapshot(forcar=True)
+    return HttpResponse(
+        formatar_prometheus(agregar()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@staff_member_required
+def importar_planilha_historico(request):
+    """Upload de planilha histórica (CSV/XLSX/Parquet) de TX/RX; ?dry_run=1 só valida."""
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "Método não permitido."}, status=405)
+
+    arquivo = request.FILES.get("arquivo")
+    if arquivo is None:
+        return JsonResponse({"status": "error", "message": "Envie a planilha no campo 'arquivo'."}, status=400)
+
+    aplicar = request.POST.get("dry_run", request.GET.get("dry_run")) not in ("1", "true")
+    try:
+        resultado = importar_planilha(arquivo, arquivo.name, aplicar=aplicar)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    rejeicoes = resultado["rejeicoes"]
+    return JsonResponse({
+        "status": "success",
+        "aplicado": aplicar,
+        "transmissores": resultado["transmissores"],
+        "receptores": resultado["receptores"],
+        "total_rejeicoes": len(rejeicoes),
+        "rejeicoes": rejeicoes[:100],
+    })
+
+
+@staff_member_required
+def reimportar_excel_estacao(request):
+    """Upload de uma planilha de gerar_excel_estacao corrigida; grava só as leituras alteradas (?dry_run=1 só compara)."""
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "Método não permitido."}, status=405)
+
+    arquivo = request.FILES.get("arquivo")
+    if arquivo is None:
+        return JsonResponse({"status": "error", "message": "Envie a planilha no campo 'arquivo'."}, status=400)
+
+    aplicar = request.POST.get("dry_run", request.GET.get("dry_run")) not in ("1", "true")
+    try:
+        resultado = reimportar_excel(arquivo, aplicar=aplicar)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    rejeicoes = resultado.pop("rejeicoes")
+    return JsonResponse({
+        "status": "success",
+        "aplicado": aplicar,
+        **resultado,
+        "total_rejeicoes": len(rejeicoes),
+        "rejeicoes": rejeicoes[:100],
+    })